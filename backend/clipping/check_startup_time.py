@@ -0,0 +1,109 @@
+"""
+Measures what the project costs to import (settings, app registry, models, views and urls) with
+`python -X importtime`, and checks it against a budget. Every gunicorn worker, `manage.py` invocation
+and script such as `create_guest_user.py` pays this before doing any work.
+
+Usage:
+    python check_startup_time.py [--budget-ms 800] [--runs 3] [--top 15]
+
+Exits with status 1 when the budget is exceeded or an SDK that should be loaded lazily is imported eagerly.
+"""
+import argparse
+import os
+import re
+import subprocess
+import sys
+
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+STARTUP_SNIPPET = (
+    "import django; django.setup(); "
+    "import clipping.urls, file.models, file.serializers, file.views, ums.views"
+)
+
+# SDKs and configs that the project's own modules must only load on first use. Imports made by
+# third-party packages (e.g. omegaconf and rest_framework.compat importing yaml) are not ours to defer.
+LAZY_MODULES = ['boto3', 'botocore', 'openai', 'yaml', 'av', 'numpy', 'PIL']
+
+# Top-level packages of the project, next to this script
+PROJECT_PACKAGES = {
+    os.path.splitext(name)[0] for name in os.listdir(PROJECT_DIR)
+    if not name.startswith('_')
+    and (name.endswith('.py') or os.path.isfile(os.path.join(PROJECT_DIR, name, '__init__.py')))
+}
+
+DEFAULT_BUDGET_MS = float(os.environ.get('STARTUP_BUDGET_MS', 800))
+
+# e.g. "import time:       412 |       1034 |   django.utils.functional"
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)')
+
+
+def measure_once():
+    """
+    Runs the startup snippet in a fresh interpreter.
+
+    Returns:
+    tuple: Total import time in ms, the top-level imports as (module, cumulative ms) and the modules imported
+    by a project module, mapped to the first such importer.
+    """
+    env = dict(os.environ)
+    env.setdefault('DJANGO_SETTINGS_MODULE', 'clipping.settings')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', STARTUP_SNIPPET],
+        cwd=PROJECT_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Startup snippet failed:\n{result.stderr[-2000:]}")
+
+    total_us = 0
+    top_level = []
+    imported_by_project = {}
+    # Nested imports are printed before their importer, one indent level deeper: pending[level] holds the
+    # modules waiting for their importer at that level
+    pending = {}
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, module = int(match[1]), int(match[2]), match[3], match[4]
+        total_us += self_us
+        level = len(indent)
+        if level <= 1:
+            top_level.append((module, cumulative_us / 1000))
+
+        children = pending.pop(level + 2, [])
+        if module.split('.')[0] in PROJECT_PACKAGES:
+            for child in children:
+                imported_by_project.setdefault(child, module)
+        pending.setdefault(level, []).append(module)
+
+    top_level.sort(key=lambda item: item[1], reverse=True)
+    return total_us / 1000, top_level, imported_by_project
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check the project startup import time against a budget.")
+    parser.add_argument('--budget-ms', type=float, default=DEFAULT_BUDGET_MS, help="Maximum total import time.")
+    parser.add_argument('--runs', type=int, default=3, help="Number of measurements, the fastest is kept.")
+    parser.add_argument('--top', type=int, default=15, help="Number of slowest top-level imports to print.")
+    args = parser.parse_args()
+
+    runs = [measure_once() for _ in range(max(1, args.runs))]
+    total_ms, top_level, imported = min(runs, key=lambda run: run[0])
+
+    print(f"Startup import time: {total_ms:.1f} ms (budget {args.budget_ms:.0f} ms, best of {len(runs)} runs)")
+    for module, cumulative_ms in top_level[:args.top]:
+        print(f"  {cumulative_ms:9.1f} ms  {module}")
+
+    eager = [f'{module} (by {imported[module]})' for module in LAZY_MODULES if module in imported]
+    if eager:
+        print(f"Imported eagerly by the project but should be lazy: {', '.join(eager)}")
+
+    if total_ms > args.budget_ms or eager:
+        print("FAILED")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
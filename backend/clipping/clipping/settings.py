@@ -12,19 +12,23 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 import os
 
 from pathlib import Path
+import json
 from datetime import timedelta
 from decouple import config
 
 
 
-# Retrieve environment variables
-TOKEN_VALUE = config('TOKEN_VALUE')
-ACCESS_KEY_ID = config('ACCESS_KEY_ID')
-SECRET_ACCESS_KEY = config('SECRET_ACCESS_KEY')
+# Object storage: 'r2', or 'local' to keep objects on disk and serve them from the API (no network needed)
+STORAGE_BACKEND = config('STORAGE_BACKEND', default='r2')
+
+# Retrieve environment variables (the R2 credentials are only required with the R2 backend)
+TOKEN_VALUE = config('TOKEN_VALUE', default='')
+ACCESS_KEY_ID = config('ACCESS_KEY_ID', default='')
+SECRET_ACCESS_KEY = config('SECRET_ACCESS_KEY', default='')
 GPT_API_KEY = config('GPT_API_KEY')
 
 # Ensure that variables are available
-if not TOKEN_VALUE or not ACCESS_KEY_ID or not SECRET_ACCESS_KEY:
+if STORAGE_BACKEND == 'r2' and (not TOKEN_VALUE or not ACCESS_KEY_ID or not SECRET_ACCESS_KEY):
     raise ValueError(
         "One or more environment variables are missing. Please set TOKEN_VALUE, ACCESS_KEY_ID, and SECRET_ACCESS_KEY.")
 
@@ -37,24 +41,34 @@ ACCOUNT_ID = 'f56837f054997f21174c350c33df8c1a'
 ENDPOINT_URL = f'https://{ACCOUNT_ID}.r2.cloudflarestorage.com'
 BUCKET_NAME = 'clipping'
 
+# Storage targets: bucket name -> endpoint and credentials. Buckets that are not listed live in the default
+# account above. More targets (e.g. other accounts) can be given as JSON in the STORAGE_TARGETS variable.
+STORAGE_TARGETS = {
+    BUCKET_NAME: {'endpoint_url': ENDPOINT_URL, 'access_key_id': ACCESS_KEY_ID, 'secret_access_key': SECRET_ACCESS_KEY},
+    **config('STORAGE_TARGETS', default='{}', cast=json.loads),
+}
+# Bucket receiving new uploads, first match wins: per user id, per file type ('image' / 'video'), then spread
+# over the shard buckets by a hash of the object key. Without a match uploads go to BUCKET_NAME.
+STORAGE_ROUTING = {
+    'users': {},
+    'file_types': {},
+    'shards': [],
+}
+# Connections kept per storage client (one client per endpoint and credentials, shared by all threads)
+STORAGE_MAX_POOL_CONNECTIONS = 32
+
 # Define the path to your .pg_service.conf file
 PGSERVICEFILE_PATH = str(Path.home() / "AppData" / "postgresql" / ".pg_service.conf")
 
 # Set the PGSERVICEFILE environment variable
 os.environ["PGSERVICEFILE"] = PGSERVICEFILE_PATH
 
-# Optional: Print for debugging (remove this in production)
-print(f"PGSERVICEFILE is set to: {os.environ.get('PGSERVICEFILE')}")
-
 # Define the path to the .my_pgpass file
 PGPASSFILE_PATH = str(Path.home() / "AppData" / "postgresql" / ".my_pgpass")
 
 # Set the PGPASSFILE environment variable
 os.environ["PGPASSFILE"] = PGPASSFILE_PATH
 
-# Debugging: Print to verify
-print(f"PGPASSFILE is set to: {os.environ.get('PGPASSFILE')}")
-
 
 
 
@@ -90,6 +104,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.middleware.RequestIdMiddleware',  # First, so every log record of the request carries its ID
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
@@ -120,6 +135,9 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'clipping.wsgi.application'
 
+# Served by uvicorn in production (see README.md); the file event stream requires it
+ASGI_APPLICATION = 'clipping.asgi.application'
+
 
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
@@ -201,38 +219,93 @@ SIMPLE_JWT = {
 # CORS
 CORS_ALLOW_CREDENTIALS = True
 CORS_ORIGIN_ALLOW_ALL = True
+# Multipart uploads read the ETag of each uploaded part (local storage backend)
+CORS_EXPOSE_HEADERS = ['ETag']
 ALLOWED_HOSTS = ['*']  # TODO: purchase a domain name, and only allow that domain from accessing the backend for security consideration
 # CORS_ALLOWED_ORIGINS = [
 #     "http://101.181.135.253:7777"
 # ]
 
 
-# add logger for testing
+# Cache of hot responses (file list pages, unique tags). Per-process memory by default; set REDIS_URL to
+# share it between workers (requires the redis package).
+REDIS_URL = config('REDIS_URL', default='')
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': REDIS_URL,
+    } if REDIS_URL else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'clipping',
+    }
+}
+
+# Local storage backend: objects live under LOCAL_STORAGE_ROOT/<bucket>/ and presigned URLs point to the
+# storage view under LOCAL_STORAGE_URL, signed with LOCAL_STORAGE_SECRET
+LOCAL_STORAGE_ROOT = config('LOCAL_STORAGE_ROOT', default=str(BASE_DIR / 'storage'))
+LOCAL_STORAGE_URL = config('LOCAL_STORAGE_URL', default='http://localhost:8000/api/v1/storage/')
+LOCAL_STORAGE_SECRET = config('LOCAL_STORAGE_SECRET', default=SECRET_KEY)
+
+# Largest file accepted by multipart upload sessions, in bytes
+MAX_UPLOAD_SIZE = config('MAX_UPLOAD_SIZE', default=10 * 1024 ** 3, cast=int)
+
+# Trending feed: interactions add their weight to a file's score, which halves every half-life
+TRENDING_HALF_LIFE_HOURS = config('TRENDING_HALF_LIFE_HOURS', default=24, cast=float)
+TRENDING_WEIGHTS = {'like': 1.0, 'comment': 2.0}
+
+# Partitioning of the file and file_interaction tables by created_datetime month (Postgres only), applied
+# with `create_partitions --convert`. Run `create_partitions` daily (e.g. from cron) to keep the partitions
+# of the coming PARTITION_MONTHS_AHEAD months created.
+PARTITION_MONTHS_AHEAD = config('PARTITION_MONTHS_AHEAD', default=3, cast=int)
+
+# Logging: records are handed to a queue and written by a listener thread, so request threads never block
+# on log I/O. Records are emitted as JSON lines carrying the request ID (see utils.log / utils.middleware).
+LOG_LEVEL = config('LOG_LEVEL', default='INFO')
+LOG_FORMAT = config('LOG_FORMAT', default='json')  # 'json' or 'verbose'
+# Fraction of the DEBUG records of `my_logger` that are kept
+LOG_DEBUG_SAMPLE_RATE = config('LOG_DEBUG_SAMPLE_RATE', default=0.1, cast=float)
+
 LOGGING = {
     'version': 1,
     'disable_existing_loggers': False,
 
+    'filters': {
+        'request_id': {
+            '()': 'utils.log.RequestIdFilter',
+        },
+        'debug_sampling': {
+            '()': 'utils.log.SamplingFilter',
+            'rate': LOG_DEBUG_SAMPLE_RATE,
+        },
+    },
+
     'formatters': {
         # Verbose format for detailed logs
         'verbose': {
-            'format': '[{asctime}] {levelname} {name} {message}',
+            'format': '[{asctime}] {levelname} {name} [{request_id}] {message}',
             'style': '{',
         },
+        # One JSON object per line
+        'json': {
+            '()': 'utils.log.JsonFormatter',
+        },
     },
 
     'handlers': {
-        # Console handler to print logs to the terminal
+        # Non-blocking console handler, writes from a QueueListener thread
         'console': {
-            'class': 'logging.StreamHandler',
-            'formatter': 'verbose',
+            '()': 'utils.log.NonBlockingStreamHandler',
+            'formatter': LOG_FORMAT,
+            'filters': ['request_id'],
         },
     },
 
     'loggers': {
-        # Custom application logger
+        # Custom application logger, high-volume DEBUG events are sampled
         'my_logger': {
             'handlers': ['console'],
             'level': 'DEBUG',
+            'filters': ['debug_sampling'],
             'propagate': False,  # Prevent duplicate logs
         },
 
@@ -253,6 +326,6 @@ LOGGING = {
 
     'root': {
         'handlers': ['console'],
-        'level': 'DEBUG',  # Catch-all logger, useful for debugging
+        'level': LOG_LEVEL,  # Catch-all logger
     },
-}
\ No newline at end of file
+}
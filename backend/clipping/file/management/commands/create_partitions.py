@@ -0,0 +1,55 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from file.services.partition_service import (
+    PARTITIONED_TABLES, create_future_partitions, is_partitioned, partition_table, unpartition_table
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the monthly partitions of the file and file_interaction tables for the current and coming "
+        "months, so new rows never land in the default partition. Run periodically, e.g. daily from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=settings.PARTITION_MONTHS_AHEAD,
+                            help="Months after the current one to create partitions for.")
+        parser.add_argument('--convert', action='store_true',
+                            help="First partition the tables that are not partitioned yet. Their rows are "
+                                 "copied while the tables are locked.")
+        parser.add_argument('--drop-constraints', action='store_true',
+                            help="Let --convert drop the unique constraints of the tables and the foreign keys "
+                                 "referencing them, which partitioned tables cannot keep. --unpartition restores "
+                                 "them.")
+        parser.add_argument('--unpartition', action='store_true',
+                            help="Convert the partitioned tables back into plain tables instead, e.g. before "
+                                 "migrations changing their constraints.")
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError("Table partitioning requires PostgreSQL.")
+
+        if options['unpartition']:
+            # In the reverse order of partitioning, as migration 0021 does
+            for table in reversed(list(PARTITIONED_TABLES)):
+                if is_partitioned(table):
+                    unpartition_table(table)
+                    self.stdout.write(self.style.SUCCESS(f"Unpartitioned {table}."))
+            return
+
+        for table in PARTITIONED_TABLES:
+            if not is_partitioned(table):
+                if not options['convert']:
+                    self.stdout.write(f"{table} is not partitioned, skipped (use --convert to partition it).")
+                    continue
+                try:
+                    partition_table(table, options['months_ahead'], options['drop_constraints'])
+                except ValueError as e:
+                    raise CommandError(f"{e}. Use --drop-constraints to accept it.")
+                self.stdout.write(f"Partitioned {table} by month.")
+            created = create_future_partitions(table, options['months_ahead'])
+            self.stdout.write(self.style.SUCCESS(
+                f"Created {len(created)} partition(s) of {table}{': ' + ', '.join(created) if created else '.'}"
+            ))
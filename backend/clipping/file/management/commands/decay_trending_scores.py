@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from file.services.score_service import decay_scores, rebuild_scores
+
+
+class Command(BaseCommand):
+    help = (
+        "Decay the trending scores of files by the time elapsed since their last decay (run it periodically, "
+        "e.g. hourly from cron). With --rebuild, recompute every score from the interactions instead."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild', action='store_true',
+                            help="Recompute the scores from scratch, e.g. after the initial deployment.")
+
+    def handle(self, *args, **options):
+        if options['rebuild']:
+            count = rebuild_scores()
+            self.stdout.write(self.style.SUCCESS(f"Rebuilt the trending scores of {count} file(s)."))
+            return
+
+        decayed, dropped = decay_scores()
+        self.stdout.write(self.style.SUCCESS(f"Decayed {decayed} trending score(s), dropped {dropped}."))
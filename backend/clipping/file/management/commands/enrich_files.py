@@ -0,0 +1,83 @@
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from file.models import ENRICHED_FIELDS, File, merge_tags
+from file.services.cache_service import bump_collection_version
+from file.services.event_service import FILE_ENRICHED, publish
+
+UPDATED_FIELDS = [*sorted(ENRICHED_FIELDS), 'last_updated_datetime']
+
+
+def enrich(file):
+    file.enrich()
+    return file
+
+
+def write_back(files):
+    """
+    Save the enrichment of files loaded before it ran. The rows are re-read under a row lock, so that edits
+    made meanwhile (e.g. with the bulk PATCH endpoint) survive: only the generated tags are merged into the
+    current ones, and a caption set meanwhile is kept. Returns the files written, leaving out deleted ones.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        current = {
+            file_id: (tags, caption) for file_id, tags, caption in File.objects.select_for_update().filter(
+                file_id__in=[file.file_id for file in files]
+            ).order_by('file_id').values_list('file_id', 'tags', 'file_caption')
+        }
+        written = []
+        for file in files:
+            if file.file_id not in current:
+                continue
+            tags, caption = current[file.file_id]
+            generated = [tag for tag in file.tags if tag not in file._loaded_values['tags']]
+            file.tags = merge_tags(tags, generated)
+            file.file_caption = caption or file.file_caption
+            file.last_updated_datetime = now
+            written.append(file)
+        File.objects.bulk_update(written, UPDATED_FIELDS)
+        bump_collection_version()
+    return written
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate captions and tags for files queued for enrichment (new videos, files added by import_media, "
+        "or failed earlier and due for a retry). "
+        "GPT calls run in a thread pool; results are written back in bulk."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4, help="Files enriched concurrently.")
+        parser.add_argument('--batch-size', type=int, default=50, help="Files written back per update.")
+        parser.add_argument('--limit', type=int, help="Stop after this many files.")
+
+    def handle(self, *args, **options):
+        queue = File.objects.filter(
+            Q(next_enrichment_datetime__isnull=True) | Q(next_enrichment_datetime__lte=timezone.now()),
+            needs_enrichment=True
+        ).order_by('file_id')
+        if options['limit']:
+            queue = queue[:options['limit']]
+
+        total = 0
+        # Materialize the ids first: rows leave the queue as they are written back
+        file_ids = list(queue.values_list('file_id', flat=True))
+        iterator = iter(file_ids)
+        with ThreadPoolExecutor(options['workers']) as pool:
+            while batch_ids := list(islice(iterator, options['batch_size'])):
+                files = write_back(list(pool.map(
+                    enrich, File.objects.filter(file_id__in=batch_ids).order_by('file_id')
+                )))
+                for file in files:
+                    publish(FILE_ENRICHED, file_id=file.file_id, tags=file.tags)
+                total += len(files)
+                self.stdout.write(f"Enriched {total}/{len(file_ids)} file(s).")
+
+        self.stdout.write(self.style.SUCCESS(f"Enriched {total} file(s)."))
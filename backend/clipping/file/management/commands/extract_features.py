@@ -0,0 +1,46 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+
+from file.models import File
+from file.services.feature_service import DOWNLOAD_WORKERS, extract_file_features
+
+
+class Command(BaseCommand):
+    help = (
+        "Extract the EXIF data (capture time, camera, GPS presence) and the dominant colors of images, "
+        "decoding them in a process pool. Only images not processed yet are handled, unless --all is given."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Images processed and updated per batch.")
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 2, help="Processes decoding images.")
+        parser.add_argument('--download-workers', type=int, default=DOWNLOAD_WORKERS,
+                            help="Objects downloaded concurrently.")
+        parser.add_argument('--limit', type=int, help="Stop after this many images.")
+        parser.add_argument('--all', action='store_true', help="Also process images processed before.")
+
+    def handle(self, *args, **options):
+        images = File.objects.filter(file_type=File.FileType.IMAGE).order_by('file_id')
+        if not options['all']:
+            images = images.filter(features_extracted_datetime__isnull=True)
+
+        last_id, scanned, updated = 0, 0, 0
+        with ProcessPoolExecutor(options['workers']) as pool:
+            while options['limit'] is None or scanned < options['limit']:
+                batch_size = options['batch_size']
+                if options['limit'] is not None:
+                    batch_size = min(batch_size, options['limit'] - scanned)
+                batch = list(images.filter(file_id__gt=last_id)[:batch_size])
+                if not batch:
+                    break
+                last_id = batch[-1].file_id
+                scanned += len(batch)
+                updated += len(extract_file_features(batch, pool, options['download_workers']))
+                self.stdout.write(f"Processed {scanned} image(s), {updated} updated.")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Processed {scanned} image(s), extracted the features of {updated}; "
+            f"{scanned - updated} failed and are left for a later run."
+        ))
@@ -0,0 +1,141 @@
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from file.models import File
+from file.services.cache_service import bump_collection_version
+from file.services.event_service import FILE_CREATED, publish
+from file.services.feature_service import apply_features
+from file.services.import_service import ImportStats, build_object_key, iter_media_paths, probe_local_file
+from file.services.r2_service import R2Service
+from file.services.stats_service import apply_file_deltas
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a local directory tree of images and videos: hash files (and extract the EXIF data and dominant "
+        "colors of images) in a process pool, skip content already "
+        "in the catalog, upload the rest concurrently and insert File rows in bulk. Enrichment is queued for the "
+        "enrich_files command instead of running inline."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Root directory to import.")
+        parser.add_argument('--user', required=True, help="Username owning the imported files.")
+        parser.add_argument('--bucket', default=settings.BUCKET_NAME, help="Bucket to upload to.")
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help="Files hashed, uploaded and inserted per batch.")
+        parser.add_argument('--hash-workers', type=int, default=os.cpu_count() or 2,
+                            help="Processes hashing files and extracting image features.")
+        parser.add_argument('--upload-workers', type=int, default=8,
+                            help="Files uploaded concurrently (large files also upload their parts concurrently).")
+        parser.add_argument('--dry-run', action='store_true', help="Hash and report without uploading.")
+
+    def handle(self, *args, **options):
+        root = options['directory']
+        if not os.path.isdir(root):
+            raise CommandError(f"{root} is not a directory.")
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']} does not exist.")
+
+        stats = ImportStats()
+        seen = set()  # Hashes already handled in this run
+
+        with ProcessPoolExecutor(options['hash_workers']) as hash_pool, \
+                ThreadPoolExecutor(options['upload_workers']) as upload_pool:
+            batches = chunked(iter_media_paths(root), options['batch_size'])
+
+            def submit_hashing():
+                batch = next(batches, None)
+                return [hash_pool.submit(probe_local_file, path) for path in batch] if batch else None
+
+            # Hash the next batch while the current one uploads
+            pending = submit_hashing()
+            while pending:
+                probes = [future.result() for future in pending]
+                pending = submit_hashing()
+                self.import_batch(probes, user, options, upload_pool, stats, seen)
+                self.stdout.write(stats.report())
+
+        self.stdout.write(self.style.SUCCESS(f"Import finished: {stats.report()}"))
+
+    def import_batch(self, probes, user, options, upload_pool, stats, seen):
+        stats.scanned += len(probes)
+        readable = [probe for probe in probes if probe is not None]
+        stats.failed += len(probes) - len(readable)
+
+        # Skip content the user already stores (one query per batch) or met earlier in this run
+        known = set(
+            File.objects.filter(user=user, content_sha256__in={probe['sha256'] for probe in readable})
+            .values_list('content_sha256', flat=True)
+        )
+        new = []
+        for probe in readable:
+            if probe['sha256'] in known or probe['sha256'] in seen:
+                stats.skipped += 1
+                continue
+            seen.add(probe['sha256'])
+            probe['object_key'] = build_object_key(probe['path'], probe['sha256'], user.pk)
+            new.append(probe)
+
+        if options['dry_run'] or not new:
+            return
+
+        futures = {
+            upload_pool.submit(R2Service.upload_large_file, probe['path'], probe['object_key'],
+                               probe['content_type'], options['bucket']): probe
+            for probe in new
+        }
+        wait(futures)
+
+        uploaded = []
+        for future, probe in futures.items():
+            if future.exception() is not None:
+                stats.failed += 1
+                self.stderr.write(f"Failed to upload {probe['path']}: {future.exception()}")
+                continue
+            stats.bytes_uploaded += probe['size']
+            uploaded.append(probe)
+
+        # Objects uploaded without a row (e.g. the insert fails) are found by reconcile_storage
+        now = timezone.now()
+        files = []
+        for probe in uploaded:
+            file = File(
+                bucket_name=options['bucket'],
+                object_key=probe['object_key'],
+                file_type=File.FileType.IMAGE if probe['file_type'] == 'image' else File.FileType.VIDEO,
+                width=probe['width'],
+                height=probe['height'],
+                content_sha256=probe['sha256'],
+                size_bytes=probe['size'],
+                needs_enrichment=True,
+                user=user,
+                created_datetime=now,
+                last_updated_datetime=now,
+            )
+            if probe['file_type'] == 'image':
+                apply_features(file, probe['features'], now)
+            files.append(file)
+        with transaction.atomic():
+            created = File.objects.bulk_create(files, batch_size=options['batch_size'])
+            # bulk_create sends no post_save signals
+            apply_file_deltas(created)
+            bump_collection_version()
+            for file in created:
+                publish(FILE_CREATED, file_id=file.file_id, user_id=file.user_id)
+        stats.imported += len(uploaded)
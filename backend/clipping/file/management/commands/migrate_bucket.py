@@ -0,0 +1,77 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from file.models import File
+from file.services.cache_service import bump_collection_version
+from file.services.r2_service import R2Service
+from file.services.storage_router import known_buckets, same_target
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the objects of the files stored in one bucket to another, copying objects in parallel "
+        "(server-side within one account) and repointing File.bucket_name batch by batch. Interrupted runs "
+        "can be resumed: only rows still in the source bucket are moved."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help="Bucket to move files from.")
+        parser.add_argument('destination', help="Bucket to move files to.")
+        parser.add_argument('--workers', type=int, default=16, help="Objects copied concurrently.")
+        parser.add_argument('--batch-size', type=int, default=200, help="Files repointed per update.")
+        parser.add_argument('--delete-source', action='store_true',
+                            help="Delete the source objects once their rows point to the destination.")
+
+    def handle(self, *args, **options):
+        source, destination = options['source'], options['destination']
+        if source == destination:
+            raise CommandError("Source and destination buckets are the same.")
+        if destination not in known_buckets():
+            raise CommandError(f"Unknown bucket {destination}, add it to STORAGE_TARGETS or STORAGE_ROUTING.")
+        self.stdout.write(f"Copying {'server-side' if same_target(source, destination) else 'across accounts'}.")
+
+        moved = failed = 0
+        last_id = 0
+        with ThreadPoolExecutor(options['workers']) as pool:
+            while True:
+                batch = list(
+                    File.objects.filter(bucket_name=source, file_id__gt=last_id).order_by('file_id')
+                    .values_list('file_id', 'object_key', 'preview_frame_keys')[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1][0]
+
+                def copy(row):
+                    file_id, object_key, derivative_keys = row
+                    try:
+                        for key in [object_key, *derivative_keys]:
+                            R2Service.copy_object(key, source, destination)
+                        return True
+                    except Exception as e:
+                        self.stderr.write(f"Failed to copy file {file_id} ({object_key}): {e}")
+                        return False
+
+                copied = [row for row, ok in zip(batch, pool.map(copy, batch)) if ok]
+                failed += len(batch) - len(copied)
+                if not copied:
+                    continue
+
+                with transaction.atomic():
+                    File.objects.filter(file_id__in=[row[0] for row in copied], bucket_name=source) \
+                        .update(bucket_name=destination)
+                    # Cached pages hold URLs signed for the old bucket
+                    bump_collection_version()
+                moved += len(copied)
+
+                if options['delete_source']:
+                    keys = [key for _, object_key, derivative_keys in copied for key in [object_key, *derivative_keys]]
+                    _, errors = R2Service.delete_objects(keys, source)
+                    for error in errors:
+                        self.stderr.write(f"Failed to delete {error['Key']} from {source}: {error['Message']}")
+                self.stdout.write(f"Moved {moved} file(s), {failed} failure(s).")
+
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} file(s) from {source} to {destination}, "
+                                             f"{failed} failure(s)."))
@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from file.models import File
+from file.services.probe_service import PROBE_WORKERS, probe_files
+
+
+class Command(BaseCommand):
+    help = (
+        "Backfill the width and height of files missing them by parsing the header of the stored object "
+        "(JPEG, PNG, GIF, WebP, MP4), fetched with small Range GETs."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help="Files probed and updated per batch.")
+        parser.add_argument('--workers', type=int, default=PROBE_WORKERS, help="Objects probed concurrently.")
+        parser.add_argument('--limit', type=int, help="Stop after this many files.")
+
+    def handle(self, *args, **options):
+        missing = File.objects.filter(Q(width__isnull=True) | Q(height__isnull=True)).order_by('file_id')
+        last_id, scanned, updated = 0, 0, 0
+        while options['limit'] is None or scanned < options['limit']:
+            batch_size = options['batch_size']
+            if options['limit'] is not None:
+                batch_size = min(batch_size, options['limit'] - scanned)
+            batch = list(missing.filter(file_id__gt=last_id)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1].file_id
+            scanned += len(batch)
+            updated += len(probe_files(batch, workers=options['workers']))
+            self.stdout.write(f"Probed {scanned} file(s), {updated} updated.")
+
+        self.stdout.write(self.style.SUCCESS(f"Probed {scanned} file(s), filled in the dimensions of {updated}."))
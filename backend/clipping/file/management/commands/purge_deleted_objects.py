@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from file.models import PendingObjectDeletion
+from file.services.deletion_service import evict_finished_jobs, purge_objects_from_storage
+
+
+class Command(BaseCommand):
+    help = (
+        "Retry removing the objects of deleted files that a deletion could not purge from storage, and remove "
+        "old deletion jobs. Run periodically, e.g. hourly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Objects purged per request.")
+        parser.add_argument('--older-than-minutes', type=float, default=10,
+                            help="Only retry objects recorded at least this long ago, leaving running "
+                                 "deletions to purge their own.")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(minutes=options['older_than_minutes'])
+        purged = failed = 0
+        last_id = 0
+        while True:
+            entries = list(PendingObjectDeletion.objects.filter(
+                pending_id__gt=last_id, created_datetime__lte=cutoff
+            ).order_by('pending_id')[:options['batch_size']])
+            if not entries:
+                break
+            last_id = entries[-1].pending_id
+
+            batch_purged, batch_failed = purge_objects_from_storage(entries)
+            purged += batch_purged
+            failed += batch_failed
+
+        removed = evict_finished_jobs()
+        self.stdout.write(self.style.SUCCESS(
+            f"Purged {purged} object(s), {failed} failure(s), removed {removed} finished deletion job(s)."
+        ))
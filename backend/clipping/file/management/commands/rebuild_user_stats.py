@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from file.services.stats_service import rebuild_user_stats
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute the per-user gallery counters (file count, storage bytes, likes received) from the file and "
+        "interaction tables, e.g. after paths that bypass the incremental updates."
+    )
+
+    def handle(self, *args, **options):
+        count = rebuild_user_stats()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the file stats of {count} user(s)."))
@@ -0,0 +1,119 @@
+import json
+from datetime import timedelta
+from typing import List, Set
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from file.services.deletion_service import DeletionService
+from file.services.r2_service import R2Service
+from file.models import File
+from file.services.reconciliation_service import reconcile, ORPHAN_OBJECT, MISSING_OBJECT, MISSING_DERIVATIVE
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the objects of a bucket with the File rows referencing it, report orphan objects and rows "
+        "pointing at missing objects, and optionally delete them. Preview frames are checked against the rows "
+        "referencing them. Both sides are streamed in sorted order."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bucket', default=settings.BUCKET_NAME, help="Bucket to reconcile.")
+        parser.add_argument('--prefix', default='', help="Only reconcile keys starting with this prefix.")
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help="Size of the listing/cursor pages and of the deletion batches.")
+        parser.add_argument('--min-age-hours', type=float, default=24,
+                            help="Ignore orphan objects younger than this, they may be uploads in progress.")
+        parser.add_argument('--delete-orphan-objects', action='store_true',
+                            help="Delete objects that no File row references.")
+        parser.add_argument('--delete-missing-rows', action='store_true',
+                            help="Delete File rows (and their interactions) whose object is missing.")
+        parser.add_argument('--requeue-missing-derivatives', action='store_true',
+                            help="Queue files with missing preview frames for enrichment, which extracts them "
+                                 "again (see enrich_files).")
+        parser.add_argument('--output', help="Write every finding as an NDJSON line to this file for review.")
+
+    def handle(self, *args, **options):
+        bucket = options['bucket']
+        batch_size = options['batch_size']
+        cutoff = timezone.now() - timedelta(hours=options['min_age_hours'])
+
+        stats = {'orphan_objects': 0, 'orphan_bytes': 0, 'recent_objects_skipped': 0, 'missing_objects': 0,
+                 'missing_derivatives': 0, 'objects_deleted': 0, 'rows_deleted': 0, 'files_requeued': 0}
+        orphan_keys: List[str] = []
+        missing_ids: List[int] = []
+        requeue_ids: Set[int] = set()
+        output = open(options['output'], 'w', encoding='utf-8') if options['output'] else None
+
+        def flush_orphans():
+            if options['delete_orphan_objects'] and orphan_keys:
+                deleted, errors = R2Service.delete_objects(orphan_keys, bucket)
+                stats['objects_deleted'] += deleted
+                for error in errors:
+                    self.stderr.write(f"Failed to delete {error['Key']}: {error.get('Message')}")
+            orphan_keys.clear()
+
+        def flush_missing():
+            if options['delete_missing_rows'] and missing_ids:
+                job = DeletionService.delete_files(missing_ids, purge_objects=False)
+                stats['rows_deleted'] += job.files_deleted
+            missing_ids.clear()
+
+        def flush_requeue():
+            if options['requeue_missing_derivatives'] and requeue_ids:
+                stats['files_requeued'] += File.objects.filter(file_id__in=requeue_ids).update(
+                    needs_enrichment=True, enrichment_attempts=0, next_enrichment_datetime=None
+                )
+            requeue_ids.clear()
+
+        try:
+            for kind, entry in reconcile(bucket, prefix=options['prefix'], chunk_size=batch_size):
+                if kind == ORPHAN_OBJECT:
+                    if entry['LastModified'] > cutoff:
+                        stats['recent_objects_skipped'] += 1
+                        continue
+                    stats['orphan_objects'] += 1
+                    stats['orphan_bytes'] += entry['Size']
+                    self.stdout.write(f"orphan object  {entry['Key']} ({entry['Size']} bytes)")
+                    if output:
+                        output.write(json.dumps({'kind': kind, 'key': entry['Key'], 'size': entry['Size']}) + '\n')
+                    orphan_keys.append(entry['Key'])
+                    if len(orphan_keys) >= batch_size:
+                        flush_orphans()
+
+                elif kind == MISSING_OBJECT:
+                    stats['missing_objects'] += 1
+                    self.stdout.write(f"missing object {entry['Key']} (file_id={entry['file_id']})")
+                    if output:
+                        output.write(json.dumps({'kind': kind, 'key': entry['Key'], 'file_id': entry['file_id']}) + '\n')
+                    missing_ids.append(entry['file_id'])
+                    if len(missing_ids) >= batch_size:
+                        flush_missing()
+
+                elif kind == MISSING_DERIVATIVE:
+                    stats['missing_derivatives'] += 1
+                    self.stdout.write(f"missing frame  {entry['Key']} (file_id={entry['file_id']})")
+                    if output:
+                        output.write(json.dumps({'kind': kind, 'key': entry['Key'], 'file_id': entry['file_id']}) + '\n')
+                    # A video has several frames, queue it once
+                    requeue_ids.add(entry['file_id'])
+                    if len(requeue_ids) >= batch_size:
+                        flush_requeue()
+
+            flush_orphans()
+            flush_missing()
+            flush_requeue()
+        finally:
+            if output:
+                output.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Bucket {bucket}: {stats['orphan_objects']} orphan object(s) ({stats['orphan_bytes']} bytes), "
+            f"{stats['missing_objects']} row(s) with a missing object, "
+            f"{stats['missing_derivatives']} missing preview frame(s), "
+            f"{stats['recent_objects_skipped']} recent object(s) skipped. "
+            f"Deleted {stats['objects_deleted']} object(s) and {stats['rows_deleted']} row(s), "
+            f"requeued {stats['files_requeued']} file(s)."
+        ))
@@ -0,0 +1,68 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from file.models import UploadSession
+from file.services.r2_service import R2Service
+from file.services.storage_router import known_buckets
+
+
+class Command(BaseCommand):
+    help = (
+        "Abort multipart upload sessions that expired without being completed, releasing their parts in R2. "
+        "Run periodically, e.g. hourly from cron."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Sessions processed per query.")
+        parser.add_argument('--untracked-older-than-hours', type=float,
+                            help="Also abort multipart uploads in the known buckets that have no session "
+                                 "and were started more than this many hours ago.")
+
+    def handle(self, *args, **options):
+        aborted = failed = 0
+        last_id = 0
+        while True:
+            sessions = list(UploadSession.objects.filter(
+                session_id__gt=last_id,
+                status=UploadSession.Status.OPEN,
+                expires_datetime__lte=timezone.now()
+            ).order_by('session_id')[:options['batch_size']])
+            if not sessions:
+                break
+            last_id = sessions[-1].session_id
+
+            for session in sessions:
+                try:
+                    R2Service.abort_multipart_upload(session.object_key, session.upload_id, session.bucket_name)
+                except Exception as e:
+                    # NoSuchUpload: already completed or aborted in R2, the session can be closed anyway
+                    if 'NoSuchUpload' not in str(e):
+                        self.stderr.write(f"Failed to abort session {session.session_id}: {e}")
+                        failed += 1
+                        continue
+                session.status = UploadSession.Status.EXPIRED
+                session.save(update_fields=['status'])
+                aborted += 1
+
+        untracked = 0
+        if options['untracked_older_than_hours'] is not None:
+            cutoff = timezone.now() - timedelta(hours=options['untracked_older_than_hours'])
+            for bucket_name in known_buckets():
+                for upload in R2Service.iter_multipart_uploads(bucket_name):
+                    if upload['Initiated'] > cutoff:
+                        continue
+                    if UploadSession.objects.filter(upload_id=upload['UploadId'],
+                                                    status=UploadSession.Status.OPEN).exists():
+                        continue
+                    try:
+                        R2Service.abort_multipart_upload(upload['Key'], upload['UploadId'], bucket_name)
+                        untracked += 1
+                    except Exception as e:
+                        self.stderr.write(f"Failed to abort untracked upload of {upload['Key']}: {e}")
+                        failed += 1
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Expired {aborted} session(s), aborted {untracked} untracked upload(s), {failed} failure(s)."
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.2 on 2026-10-19 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0011_file_file_caption'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='fileinteraction',
+            index=models.Index(fields=['file', 'created_datetime'], name='file_inter_file_created_idx'),
+        ),
+    ]
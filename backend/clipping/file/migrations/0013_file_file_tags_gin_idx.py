@@ -0,0 +1,29 @@
+# Generated by Django 5.1.2 on 2026-10-19 10:05
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0012_fileinteraction_file_inter_file_created_idx'),
+    ]
+
+    operations = [
+        # Drop duplicate tags (keeping the first occurrence) before building the index
+        migrations.RunSQL(
+            sql="""
+                UPDATE file SET tags = ARRAY(
+                    SELECT t.tag FROM unnest(file.tags) WITH ORDINALITY AS t(tag, position)
+                    GROUP BY t.tag ORDER BY min(t.position)
+                )
+                WHERE cardinality(tags) <> (SELECT count(DISTINCT tag) FROM unnest(file.tags) AS tag);
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='file_tags_gin_idx'),
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.2 on 2026-10-19 10:48
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0013_file_file_tags_gin_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='preview_frame_keys',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=255), blank=True, default=list, size=None),
+        ),
+    ]
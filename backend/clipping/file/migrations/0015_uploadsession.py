@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-19 11:36
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0014_file_preview_frame_keys'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('session_id', models.AutoField(primary_key=True, serialize=False)),
+                ('upload_id', models.CharField(max_length=1024)),
+                ('bucket_name', models.CharField(default='clipping', max_length=100)),
+                ('object_key', models.CharField(max_length=255)),
+                ('content_type', models.CharField(max_length=100)),
+                ('size', models.BigIntegerField()),
+                ('part_size', models.BigIntegerField()),
+                ('part_count', models.IntegerField()),
+                ('status', models.CharField(choices=[('open', 'Open'), ('completed', 'Completed'), ('aborted', 'Aborted'), ('expired', 'Expired')], default='open', max_length=10)),
+                ('created_datetime', models.DateTimeField(default=django.utils.timezone.now)),
+                ('expires_datetime', models.DateTimeField()),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'upload_session',
+                'indexes': [models.Index(fields=['status', 'expires_datetime'], name='upload_session_status_exp_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-19 20:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0015_uploadsession'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='content_sha256',
+            field=models.CharField(blank=True, db_index=True, max_length=64, null=True),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='needs_enrichment',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(condition=models.Q(('needs_enrichment', True)), fields=['file_id'], name='file_needs_enrichment_idx'),
+        ),
+    ]
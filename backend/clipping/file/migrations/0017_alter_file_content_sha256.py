@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-19 20:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0016_file_content_sha256_file_needs_enrichment_and_more'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='file',
+            name='content_sha256',
+            field=models.CharField(blank=True, max_length=64, null=True, unique=True),
+        ),
+    ]
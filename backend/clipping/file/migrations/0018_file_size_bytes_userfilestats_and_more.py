@@ -0,0 +1,53 @@
+# Generated by Django 5.1.2 on 2026-10-19 21:10
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0017_alter_file_content_sha256'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='size_bytes',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='UserFileStats',
+            fields=[
+                ('user', models.OneToOneField(db_column='user_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='file_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('file_count', models.IntegerField(default=0)),
+                ('storage_bytes', models.BigIntegerField(default=0)),
+                ('likes_received', models.IntegerField(default=0)),
+                ('updated_datetime', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'user_file_stats',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['user', 'created_datetime'], name='file_user_created_idx'),
+        ),
+        # Seed the counters from the existing rows; they are maintained incrementally from here on
+        migrations.RunSQL(
+            sql=(
+                "INSERT INTO user_file_stats (user_id, file_count, storage_bytes, likes_received, updated_datetime) "
+                "SELECT f.user_id, COUNT(*), COALESCE(SUM(f.size_bytes), 0), COALESCE(SUM(l.likes), 0), now() "
+                "FROM file f "
+                "LEFT JOIN (SELECT file_id, COUNT(*) AS likes FROM file_interaction "
+                "           WHERE interaction_type = 'like' GROUP BY file_id) l "
+                "ON l.file_id = f.file_id "
+                "WHERE f.user_id IS NOT NULL "
+                "GROUP BY f.user_id"
+            ),
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
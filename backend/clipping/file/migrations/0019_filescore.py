@@ -0,0 +1,27 @@
+# Generated by Django 5.1.2 on 2026-10-19 21:45
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0018_file_size_bytes_userfilestats_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FileScore',
+            fields=[
+                ('file', models.OneToOneField(db_column='file_id', on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='file.file')),
+                ('score', models.FloatField(default=0)),
+                ('decayed_datetime', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'file_score',
+                'indexes': [models.Index(fields=['score', 'file'], name='file_score_score_idx')],
+            },
+        ),
+    ]
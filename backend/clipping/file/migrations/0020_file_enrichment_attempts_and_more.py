@@ -0,0 +1,23 @@
+# Generated by Django 5.1.2 on 2026-10-19 22:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0019_filescore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='enrichment_attempts',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='next_enrichment_datetime',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
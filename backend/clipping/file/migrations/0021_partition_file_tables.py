@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-19 22:40
+
+from django.db import migrations
+
+
+# Copied from the tables partitioned by create_partitions: migrations do not import application code
+PARTITIONED_TABLES = ['file', 'file_interaction']
+
+
+def check_unpartitioned(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT relname FROM pg_class WHERE relkind = 'p' "
+            "AND oid IN (SELECT to_regclass(name) FROM unnest(%s::text[]) AS name)",
+            [PARTITIONED_TABLES]
+        )
+        partitioned = [row[0] for row in cursor.fetchall()]
+    if partitioned:
+        raise RuntimeError(
+            f"{', '.join(partitioned)} still partitioned: run `manage.py create_partitions --unpartition` "
+            f"before rolling back."
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0020_file_enrichment_attempts_and_more'),
+    ]
+
+    operations = [
+        # Tables are partitioned by `create_partitions --convert`, never implicitly by migrating, and converted
+        # back by `create_partitions --unpartition`. Rolling back only checks that this was done. The models
+        # are the same whether or not the tables are partitioned.
+        migrations.RunPython(migrations.RunPython.noop, check_unpartitioned),
+    ]
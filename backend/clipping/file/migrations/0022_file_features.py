@@ -0,0 +1,57 @@
+# Generated by Django 5.1.2 on 2026-10-19 23:05
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.indexes
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0021_partition_file_tables'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='file',
+            name='taken_datetime',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='camera',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='has_gps',
+            field=models.BooleanField(null=True),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='dominant_colors',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=10), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='color_palette',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=7), blank=True, default=list, size=None),
+        ),
+        migrations.AddField(
+            model_name='file',
+            name='features_extracted_datetime',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['dominant_colors'], name='file_colors_gin_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(fields=['taken_datetime'], name='file_taken_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='file',
+            index=models.Index(condition=models.Q(('features_extracted_datetime__isnull', True), ('file_type', 1)), fields=['file_id'], name='file_needs_features_idx'),
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.1.2 on 2026-10-19 23:20
+
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0022_file_features'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DeletionJob',
+            fields=[
+                ('job_id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('status', models.CharField(choices=[('running', 'Running'), ('completed', 'Completed'), ('failed', 'Failed')], default='running', max_length=10)),
+                ('files_deleted', models.IntegerField(default=0)),
+                ('rows_cascaded', models.IntegerField(default=0)),
+                ('objects_queued', models.IntegerField(default=0)),
+                ('objects_purged', models.IntegerField(default=0)),
+                ('objects_failed', models.IntegerField(default=0)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('created_datetime', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_datetime', models.DateTimeField(default=django.utils.timezone.now)),
+                ('finished_datetime', models.DateTimeField(blank=True, db_index=True, null=True)),
+            ],
+            options={
+                'db_table': 'deletion_job',
+            },
+        ),
+        migrations.CreateModel(
+            name='PendingObjectDeletion',
+            fields=[
+                ('pending_id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('bucket_name', models.CharField(max_length=100)),
+                ('object_key', models.CharField(max_length=255)),
+                ('attempts', models.IntegerField(default=0)),
+                ('last_error', models.TextField(blank=True, null=True)),
+                ('created_datetime', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('job', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pending_objects', to='file.deletionjob')),
+            ],
+            options={
+                'db_table': 'pending_object_deletion',
+            },
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.1.2 on 2026-10-19 23:35
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def check_not_partitioned(apps, schema_editor):
+    # A partitioned table only keeps the old unique constraint as a plain index, which AlterField cannot drop
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    from file.services.partition_service import is_partitioned
+    if is_partitioned('file'):
+        raise RuntimeError("The file table is partitioned: run `create_partitions --unpartition` first, "
+                           "then migrate and partition it again.")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('file', '0023_deletionjob_pendingobjectdeletion'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_not_partitioned, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='file',
+            name='content_sha256',
+            field=models.CharField(blank=True, max_length=64, null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='file',
+            constraint=models.UniqueConstraint(fields=('user', 'content_sha256'), name='file_user_content_sha256_uniq'),
+        ),
+    ]
@@ -1,13 +1,18 @@
+import copy
 import json
 import logging
+import uuid
+from contextlib import ExitStack
+from datetime import timedelta
 
 from django.db import models
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.utils import timezone
 from django.contrib.postgres.fields import ArrayField  # Import ArrayField
+from django.contrib.postgres.indexes import GinIndex
 from .services.r2_service import R2Service
-from .services.generative_service import GPTService
+from .services.generative_service import get_gpt_service
 
 
 # Define the custom logger
@@ -22,17 +27,65 @@ def safe_gpt_generate(gpt_service, prompt_key, return_format, media_object):
             media_object=media_object
         )
         if 'error' in result:
-            logger.error(f"GPTService error: {result['error']} for {media_object}")
+            logger.error("GPTService error: %s for %s", result['error'], media_object)
             return None
         return result['content']
     except Exception as e:
-        logger.error(f"Unexpected GPTService exception: {e}", exc_info=True)
+        logger.error("Unexpected GPTService exception: %s", e, exc_info=True)
         return None
 
 
+def merge_tags(*tag_lists):
+    """Concatenate tag lists, dropping empty and duplicate tags while keeping the first occurrence order."""
+    merged = []
+    seen = set()
+    for tags in tag_lists:
+        for tag in tags or []:
+            if tag and tag not in seen:
+                seen.add(tag)
+                merged.append(tag)
+    return merged
+
+
+# Fields locating the stored media: enrichment is redone when they change
+MEDIA_FIELDS = frozenset({'bucket_name', 'object_key', 'file_type'})
+
+# Fields written by enrichment
+ENRICHED_FIELDS = frozenset({'file_caption', 'tags', 'preview_frame_keys', 'needs_enrichment',
+                             'enrichment_attempts', 'next_enrichment_datetime'})
+
+# Failed enrichments are retried (by enrich_files) after 15 min, 30 min, 1 h, ..., then given up
+MAX_ENRICHMENT_ATTEMPTS = 5
+ENRICHMENT_RETRY_DELAY = timedelta(minutes=15)
+
+
+def is_sha256_hex(value):
+    """Whether the value is a lower-case hex SHA-256 digest."""
+    return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+
 class File(models.Model):
     class Meta:
         db_table = 'file'  # Custom table name if wanted, otherwise remove this line
+        # Optionally partitioned by created_datetime month, see services.partition_service
+        indexes = [
+            # Serves the `@>` / `&&` containment queries of the tag filter
+            GinIndex(fields=['tags'], name='file_tags_gin_idx'),
+            # Serves per-user galleries: WHERE user_id = ? ORDER BY created_datetime DESC
+            models.Index(fields=['user', 'created_datetime'], name='file_user_created_idx'),
+            # Small partial index over the enrichment queue
+            models.Index(fields=['file_id'], name='file_needs_enrichment_idx', condition=models.Q(needs_enrichment=True)),
+            # Serve the `?color=` and `?taken_between=` filters
+            GinIndex(fields=['dominant_colors'], name='file_colors_gin_idx'),
+            models.Index(fields=['taken_datetime'], name='file_taken_idx'),
+            # Small partial index over the images waiting for feature extraction
+            models.Index(fields=['file_id'], name='file_needs_features_idx',
+                         condition=models.Q(file_type=1, features_extracted_datetime__isnull=True)),
+        ]
+        constraints = [
+            # Deduplication is per user: users never learn about each other's content
+            models.UniqueConstraint(fields=['user', 'content_sha256'], name='file_user_content_sha256_uniq'),
+        ]
 
     class FileType(models.IntegerChoices):
         IMAGE = 1, 'Image'
@@ -50,59 +103,165 @@ class File(models.Model):
     last_updated_datetime = models.DateTimeField(default=timezone.now)
     description = models.TextField(null=True, blank=True)
     file_caption = models.TextField(null=True, blank=True)
+    # Object keys of the keyframes extracted from videos, used for scrubbing previews
+    preview_frame_keys = ArrayField(models.CharField(max_length=255), default=list, blank=True)
+    # Hex SHA-256 of the object content, used to skip re-uploads of content the user already stores.
+    # Only set from digests verified by the storage (see services.content_token) or computed by import_media.
+    content_sha256 = models.CharField(max_length=64, null=True, blank=True)
+    # Size of the object in bytes, reported by the uploader
+    size_bytes = models.BigIntegerField(null=True, blank=True)
+    # Set on rows inserted in bulk (which bypass save()) and on failed enrichments; consumed by enrich_files
+    needs_enrichment = models.BooleanField(default=False)
+    # Consecutive failed enrichments, and when the next one may be tried
+    enrichment_attempts = models.PositiveSmallIntegerField(default=0)
+    next_enrichment_datetime = models.DateTimeField(null=True, blank=True)
+    # Computed locally from images by the feature extraction stage (see services.feature_service)
+    taken_datetime = models.DateTimeField(null=True, blank=True)  # EXIF capture time
+    camera = models.CharField(max_length=100, null=True, blank=True)
+    has_gps = models.BooleanField(null=True)
+    dominant_colors = ArrayField(models.CharField(max_length=10), default=list, blank=True)  # Color names
+    color_palette = ArrayField(models.CharField(max_length=7), default=list, blank=True)  # Hex colors
+    features_extracted_datetime = models.DateTimeField(null=True, blank=True)
     user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, db_column='user_id')
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_values = dict(zip(field_names, map(copy.copy, values)))
+        return instance
+
+    def get_dirty_fields(self):
+        """Attribute names of the fields changed since the row was loaded (every field for unsaved rows)."""
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return {field.attname for field in self._meta.concrete_fields}
+        return {name for name, value in loaded.items() if self.__dict__.get(name, value) != value}
+
     def get_url(self):
         # Construct the URL for accessing the file
-        url = R2Service.generate_public_url(self.object_key)
+        url = R2Service.generate_public_url(self.object_key, bucket_name=self.bucket_name)
         return url
 
+    def generate_tags_and_caption(self, media_object):
+        """
+        Fill in the caption (if missing) and merge generated tags using GPT on the given media.
+        Returns whether both succeeded.
+        """
+        succeeded = True
+        try:
+            gpt_service = get_gpt_service()
+
+            # Generate the caption if missing
+            if not self.file_caption:
+                caption_content = safe_gpt_generate(gpt_service, "generate_file_caption", "text", media_object)
+                if caption_content:
+                    self.file_caption = caption_content
+                    logger.info("Generated caption for %s (%d characters)", self.object_key, len(self.file_caption))
+                    logger.debug("Caption of %s: %s", self.object_key, self.file_caption)
+                else:
+                    succeeded = False
+
+            # Generate the tags if missing
+            tags_content = safe_gpt_generate(gpt_service, "generate_tags", "list", media_object)
+            if tags_content:
+                try:
+                    generated_tags = json.loads(tags_content)
+                    logger.debug("Parsed generated tags: %s", generated_tags)
+                except json.JSONDecodeError:
+                    logger.error("Error decoding tags response for %s", self.object_key)
+                    generated_tags = []
+                    succeeded = False
+
+                self.tags = merge_tags(self.tags, generated_tags)
+            else:
+                succeeded = False
+        except Exception as e:
+            # The caption is left empty so that a retry can fill it in
+            logger.exception("Error processing media object '%s': %s", self.object_key, e)
+            succeeded = False
+        return succeeded
+
+    def enrich(self, media_object=None):
+        """
+        Generate the caption and tags of the file (and the preview frames of videos) without saving it.
+        `media_object` defaults to the public URL of the file.
+        """
+        media_object = media_object or self.get_url()
+        with ExitStack() as stack:
+            if self.file_type == self.FileType.VIDEO:
+                # Vision models take images: send a contact sheet of the video's keyframes instead of its URL.
+                # Imported here to keep NumPy, Pillow and PyAV out of the import path of every process.
+                from .services.video_service import video_contact_sheet
+
+                try:
+                    media_object, self.preview_frame_keys = stack.enter_context(
+                        video_contact_sheet(self.object_key, self.bucket_name)
+                    )
+                except Exception as e:
+                    logger.error("Failed to extract keyframes of video %s: %s", self.object_key, e)
+                    media_object = None
+
+            succeeded = bool(media_object) and self.generate_tags_and_caption(media_object)
+        self.record_enrichment(succeeded)
+
+    def record_enrichment(self, succeeded):
+        """Clear the enrichment queue flag, or schedule a retry with exponential backoff after a failure."""
+        if succeeded:
+            self.enrichment_attempts = 0
+            self.needs_enrichment = False
+            self.next_enrichment_datetime = None
+            return
+
+        self.enrichment_attempts += 1
+        if self.enrichment_attempts >= MAX_ENRICHMENT_ATTEMPTS:
+            logger.warning("Giving up enrichment of %s after %d attempts", self.object_key, self.enrichment_attempts)
+            self.needs_enrichment = False
+            self.next_enrichment_datetime = None
+        else:
+            self.needs_enrichment = True
+            self.next_enrichment_datetime = (
+                timezone.now() + ENRICHMENT_RETRY_DELAY * 2 ** (self.enrichment_attempts - 1)
+            )
+
     # To update the 'last_updated_datetime' on model save
-    def save(self, *args, **kwargs):
+    def save(self, *args, enrich=False, **kwargs):
+        """
+        Save the file. Enrichment (GPT calls, and keyframe extraction for videos) only runs for new files,
+        when the stored media changed, or when requested with `enrich=True`; edits of tags or descriptions
+        do not trigger it. Videos are only queued for the enrich_files command unless `enrich=True`, since
+        their keyframe extraction is too slow for a request. Failed enrichments are retried by enrich_files.
+        """
         # Check if this is a new object (creation)
-        is_new = self.pk is None
+        is_new = self._state.adding
 
         self.last_updated_datetime = timezone.now()
 
-        # Construct the media object URL
-        media_object = self.get_url()
-
-        # Decide when to run GPT logic:
-        # Trigger for new objects OR objects missing captions/tags
-        should_generate_tags_and_captions = is_new or (
-                self.file_type == self.FileType.IMAGE and (not self.file_caption))
-        logger.info(f'should_generate_tags_and_captions: {should_generate_tags_and_captions}')
-
-        if should_generate_tags_and_captions:
-            try:
-                gpt_service = GPTService()
-                logger.debug(f"GPTService initialized for media object: {media_object}")
-
-                # Generate the caption if missing
-                if not self.file_caption:
-                    caption_content = safe_gpt_generate(gpt_service, "generate_file_caption", "text", media_object)
-                    if caption_content:
-                        self.file_caption = caption_content
-                        logger.info(f"Generated caption for {media_object}: {self.file_caption}")
-
-                # Generate the tags if missing
-                tags_content = safe_gpt_generate(gpt_service, "generate_tags", "list", media_object)
-                if tags_content:
-                    try:
-                        generated_tags = json.loads(tags_content)
-                        logger.debug(f"Parsed generated tags: {generated_tags}")
-                    except json.JSONDecodeError:
-                        logger.error(f"Error decoding tags response for {media_object}")
-                        generated_tags = []
-
-                    self.tags = self.tags + generated_tags
-            except Exception as e:
-                logger.exception(f"Error processing media object '{media_object}': {e}")
-                self.file_caption = "Error generating caption."
+        media_changed = not is_new and bool(self.get_dirty_fields() & MEDIA_FIELDS)
+        logger.debug('enrich: %s (new: %s, media changed: %s)', enrich or is_new or media_changed, is_new,
+                     media_changed)
+
+        update_fields = kwargs.get('update_fields')
+        if enrich or is_new or media_changed:
+            if media_changed:
+                self.enrichment_attempts = 0
+            if self.file_type == self.FileType.VIDEO and not enrich:
+                self.needs_enrichment = True
+                self.next_enrichment_datetime = None
+            else:
+                self.enrich()
+            if update_fields is not None:
+                kwargs['update_fields'] = set(update_fields) | ENRICHED_FIELDS
+
+        # Keep the tag arrays free of duplicates so the GIN index does not bloat
+        self.tags = merge_tags(self.tags)
 
         # Save the object to the database
         super().save(*args, **kwargs)
 
+        # Later saves compare against the saved state
+        self._loaded_values = {field.attname: copy.copy(self.__dict__[field.attname])
+                               for field in self._meta.concrete_fields if field.attname in self.__dict__}
+
     def __repr__(self):
         return f'<File {self.object_key}>'
 
@@ -112,6 +271,11 @@ class File(models.Model):
 class FileInteraction(models.Model):
     class Meta:
         db_table = 'file_interaction'
+        # Optionally partitioned by created_datetime month, see services.partition_service
+        indexes = [
+            # Serves keyset pagination of a file's interactions on (created_datetime, interaction_id)
+            models.Index(fields=['file', 'created_datetime'], name='file_inter_file_created_idx'),
+        ]
 
     class InteractionType(models.TextChoices):
         LIKE = 'like', 'Like'
@@ -129,3 +293,162 @@ class FileInteraction(models.Model):
 
     def __str__(self):
         return self.__repr__()
+
+
+class UserFileStats(models.Model):
+    """
+    Per-user gallery aggregates, maintained incrementally (see services/stats_service.py) instead of
+    counted on read. `rebuild_user_stats` recomputes them from scratch.
+    """
+    class Meta:
+        db_table = 'user_file_stats'
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, db_column='user_id',
+                                related_name='file_stats')
+    file_count = models.IntegerField(default=0)
+    storage_bytes = models.BigIntegerField(default=0)
+    likes_received = models.IntegerField(default=0)
+    updated_datetime = models.DateTimeField(default=timezone.now)
+
+    def __repr__(self):
+        return f'<UserFileStats user={self.user_id} files={self.file_count}>'
+
+    def __str__(self):
+        return self.__repr__()
+
+
+class FileScore(models.Model):
+    """
+    Time-decayed popularity of a file behind the trending feed. Interactions add their weight as they arrive,
+    `decay_trending_scores` periodically scales every score down (see services/score_service.py).
+    Only files with interactions have a row.
+    """
+    class Meta:
+        db_table = 'file_score'
+        indexes = [
+            # Serves ORDER BY score DESC, file_id DESC keyset pages (scanned backwards)
+            models.Index(fields=['score', 'file'], name='file_score_score_idx'),
+        ]
+
+    file = models.OneToOneField('File', on_delete=models.CASCADE, primary_key=True, db_column='file_id',
+                                related_name='score')
+    score = models.FloatField(default=0)
+    # When the score was last decayed: weights added since then are undecayed
+    decayed_datetime = models.DateTimeField(default=timezone.now)
+
+    def __repr__(self):
+        return f'<FileScore file={self.file_id} score={self.score:.3f}>'
+
+    def __str__(self):
+        return self.__repr__()
+
+
+class UploadSession(models.Model):
+    """
+    A multipart upload started by a user. Tracks the R2 upload ID so that sessions which are never
+    completed can be aborted by the sweeper once they expire.
+    """
+    class Meta:
+        db_table = 'upload_session'
+        indexes = [
+            models.Index(fields=['status', 'expires_datetime'], name='upload_session_status_exp_idx'),
+        ]
+
+    class Status(models.TextChoices):
+        OPEN = 'open', 'Open'
+        COMPLETED = 'completed', 'Completed'
+        ABORTED = 'aborted', 'Aborted'
+        EXPIRED = 'expired', 'Expired'
+
+    session_id = models.AutoField(primary_key=True)
+    upload_id = models.CharField(max_length=1024)
+    bucket_name = models.CharField(max_length=100, default=settings.BUCKET_NAME)
+    object_key = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100)
+    size = models.BigIntegerField()
+    part_size = models.BigIntegerField()
+    part_count = models.IntegerField()
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.OPEN)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    created_datetime = models.DateTimeField(default=timezone.now)
+    expires_datetime = models.DateTimeField()
+
+    def __repr__(self):
+        return f'<UploadSession {self.object_key} status={self.status}>'
+
+    def __str__(self):
+        return self.__repr__()
+
+
+class DeletionJob(models.Model):
+    """
+    Progress of a deletion started by DeletionService. Kept in the database so that any worker can report it;
+    finished jobs are removed after DELETION_JOB_RETENTION.
+    """
+    class Meta:
+        db_table = 'deletion_job'
+
+    class Status(models.TextChoices):
+        RUNNING = 'running', 'Running'
+        COMPLETED = 'completed', 'Completed'
+        FAILED = 'failed', 'Failed'
+
+    job_id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    status = models.CharField(max_length=10, choices=Status.choices, default=Status.RUNNING)
+    files_deleted = models.IntegerField(default=0)
+    rows_cascaded = models.IntegerField(default=0)
+    objects_queued = models.IntegerField(default=0)
+    objects_purged = models.IntegerField(default=0)
+    objects_failed = models.IntegerField(default=0)
+    error = models.TextField(null=True, blank=True)
+    created_datetime = models.DateTimeField(default=timezone.now)
+    updated_datetime = models.DateTimeField(default=timezone.now)
+    finished_datetime = models.DateTimeField(null=True, blank=True, db_index=True)
+
+    COUNTERS = ['files_deleted', 'rows_cascaded', 'objects_queued', 'objects_purged', 'objects_failed']
+
+    def add(self, **counters):
+        for name, value in counters.items():
+            setattr(self, name, getattr(self, name) + value)
+
+    def to_dict(self) -> dict:
+        return {
+            'job_id': self.job_id.hex,
+            'status': self.status,
+            'created_datetime': self.created_datetime,
+            'updated_datetime': self.updated_datetime,
+            'finished_datetime': self.finished_datetime,
+            **{name: getattr(self, name) for name in self.COUNTERS},
+            'error': self.error,
+        }
+
+    def __repr__(self):
+        return f'<DeletionJob {self.job_id.hex} status={self.status}>'
+
+    def __str__(self):
+        return self.__repr__()
+
+
+class PendingObjectDeletion(models.Model):
+    """
+    An object of a deleted file still to be removed from storage. Recorded in the transaction deleting the
+    file row, so a key is never lost: entries left by a failed or interrupted purge are retried by the
+    purge_deleted_objects command.
+    """
+    class Meta:
+        db_table = 'pending_object_deletion'
+
+    pending_id = models.BigAutoField(primary_key=True)
+    job = models.ForeignKey(DeletionJob, on_delete=models.SET_NULL, null=True, blank=True,
+                            related_name='pending_objects')
+    bucket_name = models.CharField(max_length=100)
+    object_key = models.CharField(max_length=255)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(null=True, blank=True)
+    created_datetime = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __repr__(self):
+        return f'<PendingObjectDeletion {self.bucket_name}/{self.object_key} attempts={self.attempts}>'
+
+    def __str__(self):
+        return self.__repr__()
@@ -0,0 +1,106 @@
+import base64
+import json
+from datetime import datetime
+from functools import reduce
+from operator import or_
+from typing import List, Optional, Sequence, Tuple
+
+from django.db.models import Q
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Encodes the keyset values of the last row of a page into an opaque, url-safe cursor."""
+    payload = [
+        {'dt': value.isoformat()} if isinstance(value, datetime) else value
+        for value in values
+    ]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, types: Sequence) -> List:
+    """
+    Decodes a cursor produced by `encode_cursor`, holding one value of each of the Python `types`
+    (as for isinstance) in order. Raises ValueError if the cursor is malformed or its values do not match.
+    """
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {e}")
+
+    if not isinstance(payload, list) or len(payload) != len(types):
+        raise ValueError("Invalid cursor.")
+
+    values = []
+    for value, expected in zip(payload, types):
+        if isinstance(value, dict):
+            if set(value) != {'dt'} or not isinstance(value['dt'], str):
+                raise ValueError("Invalid cursor.")
+            value = datetime.fromisoformat(value['dt'])
+        # bool is an int, but never a key value
+        if isinstance(value, bool) or not isinstance(value, expected):
+            raise ValueError("Invalid cursor.")
+        values.append(value)
+    return values
+
+
+# Python types of the cursor values of a keyset field, by internal type of the model field
+CURSOR_TYPES = {
+    'DateTimeField': datetime,
+    'AutoField': int,
+    'BigAutoField': int,
+    'IntegerField': int,
+    'BigIntegerField': int,
+    'FloatField': (int, float),
+}
+
+
+def keyset_types(queryset, fields: Sequence[str]) -> List:
+    """The Python types of the values of `fields` (model fields or annotations of `queryset`) in a cursor."""
+    types = []
+    for field in fields:
+        if field in queryset.query.annotations:
+            model_field = queryset.query.annotations[field].output_field
+        else:
+            model_field = queryset.model._meta.get_field(field)
+        if model_field.is_relation:
+            model_field = model_field.target_field
+        types.append(CURSOR_TYPES.get(model_field.get_internal_type(), str))
+    return types
+
+
+def keyset_filter(fields: Sequence[str], values: Sequence, descending: bool = False) -> Q:
+    """
+    Builds the row-value comparison `(f1, f2, ...) > (v1, v2, ...)` (or `<` when descending) as a Q object,
+    i.e. f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...
+    """
+    lookup = 'lt' if descending else 'gt'
+    conditions = []
+    for i, field in enumerate(fields):
+        condition = {f: v for f, v in zip(fields[:i], values[:i])}
+        condition[f'{field}__{lookup}'] = values[i]
+        conditions.append(Q(**condition))
+    return reduce(or_, conditions)
+
+
+def paginate_keyset(queryset, fields: Sequence[str], cursor: Optional[str], page_size: int,
+                    descending: bool = False) -> Tuple[list, Optional[str]]:
+    """
+    Returns one page of `queryset` ordered by `fields` (the last field must be unique) starting after `cursor`,
+    together with the cursor of the next page (None on the last page).
+
+    Every field must be readable as an attribute of the returned objects (model field or annotation).
+    """
+    if cursor:
+        values = decode_cursor(cursor, keyset_types(queryset, fields))
+        queryset = queryset.filter(keyset_filter(fields, values, descending))
+
+    ordering = [f'-{field}' if descending else field for field in fields]
+    # Fetch one extra row to know whether another page exists
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([getattr(rows[-1], field) for field in fields])
+
+    return rows, next_cursor
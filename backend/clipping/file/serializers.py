@@ -1,24 +1,44 @@
 from rest_framework import serializers
-from .models import File, FileInteraction
+from .models import File, FileInteraction, is_sha256_hex
+from .services.content_token import verify_content_token
+from .services.r2_service import R2Service
+from .services.storage_router import known_buckets
 from django.utils import timezone
 from django.conf import settings
 
 
 class FileSerializer(serializers.ModelSerializer):
     url = serializers.SerializerMethodField()  # Use a method to get the URL
+    preview_frame_urls = serializers.SerializerMethodField()  # Keyframes of videos for scrubbing previews
+    # Issued with the upload URL, proves content_sha256 (see services.content_token)
+    content_token = serializers.CharField(write_only=True, required=False)
 
     class Meta:
         model = File
         fields = [
             'file_id', 'bucket_name', 'object_key', 'file_type',
             'width', 'height', 'tags', 'created_datetime',
-            'last_updated_datetime', 'description', 'file_caption', 'user_id', 'url'
+            'last_updated_datetime', 'description', 'file_caption', 'user_id', 'url', 'preview_frame_urls',
+            'content_sha256', 'size_bytes', 'taken_datetime', 'camera', 'has_gps', 'dominant_colors',
+            'color_palette', 'content_token'
         ]
-        read_only_fields = ['file_id', 'created_datetime', 'last_updated_datetime', 'user_id']
+        read_only_fields = ['file_id', 'created_datetime', 'last_updated_datetime', 'user_id', 'taken_datetime',
+                            'camera', 'has_gps', 'dominant_colors', 'color_palette']
+
+    def get_extra_kwargs(self):
+        extra_kwargs = super().get_extra_kwargs()
+        if self.instance is not None:
+            # Set once at creation, from a verified upload; the owner's storage_bytes counts the created size
+            for field in ('content_sha256', 'size_bytes'):
+                extra_kwargs.setdefault(field, {})['read_only'] = True
+        return extra_kwargs
 
     def get_url(self, obj):
         return obj.get_url()
 
+    def get_preview_frame_urls(self, obj):
+        return [R2Service.generate_public_url(key, bucket_name=obj.bucket_name) for key in obj.preview_frame_keys]
+
     def to_internal_value(self, data):
         if 'file_type' in data:
             data['file_type'] = self.map_file_type(data['file_type'])
@@ -35,7 +55,35 @@ class FileSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Invalid file_type. Allowed types: image, video, other.")
         return value
 
+    def validate_bucket_name(self, value):
+        # Rows must point to a bucket the storage router can sign for
+        if value not in known_buckets():
+            raise serializers.ValidationError("Unknown bucket.")
+        return value
+
+    def validate_content_sha256(self, value):
+        if value and not is_sha256_hex(value):
+            raise serializers.ValidationError("content_sha256 must be a lower-case hex SHA-256 digest.")
+        return value or None
+
+    def validate_size_bytes(self, value):
+        if value is not None and value < 0:
+            raise serializers.ValidationError("size_bytes must not be negative.")
+        return value
+
     def validate(self, data):
+        content_token = data.pop('content_token', None)
+        if data.get('content_sha256'):
+            request = self.context.get('request')
+            if request is None or not verify_content_token(
+                content_token, request.user.id, data.get('bucket_name', settings.BUCKET_NAME),
+                data.get('object_key'), data['content_sha256']
+            ):
+                raise serializers.ValidationError(
+                    {'content_sha256': "content_sha256 requires the content_token issued with the upload URL."}
+                )
+            if File.objects.filter(user=request.user, content_sha256=data['content_sha256']).exists():
+                raise serializers.ValidationError({'content_sha256': "You already stored this content."})
         return data
 
     def create(self, validated_data):
@@ -53,7 +101,8 @@ class FileSerializer(serializers.ModelSerializer):
         instance.user_id = validated_data.get('user_id', instance.user_id)
         instance.last_updated_datetime = timezone.now()
 
-        instance.save()
+        # Only write what changed; editing tags or the description never triggers enrichment
+        instance.save(update_fields=instance.get_dirty_fields() | {'last_updated_datetime'})
         return instance
 
     def map_file_type(self, file_type):
@@ -0,0 +1,103 @@
+import hashlib
+import logging
+import threading
+import time
+import uuid
+from typing import Callable, Dict, Optional
+
+from django.core.cache import cache
+from django.db import transaction
+
+logger = logging.getLogger('my_logger')
+
+# Version of the file collection, part of every cached response key. Bumping it makes all cached
+# responses unreachable; they age out with their timeout instead of being deleted.
+COLLECTION_VERSION_KEY = 'file:collection_version'
+
+# Presigned URLs in cached list pages expire after an hour, keep responses well below that
+RESPONSE_TIMEOUT = 300
+
+# How long a cache miss may be computed by one worker before others stop waiting for it
+FILL_LOCK_TIMEOUT = 10
+FILL_POLL_INTERVAL = 0.05
+
+_local_locks: Dict[str, threading.Lock] = {}
+_local_locks_guard = threading.Lock()
+
+
+def get_collection_version() -> int:
+    version = cache.get(COLLECTION_VERSION_KEY)
+    if version is None:
+        cache.add(COLLECTION_VERSION_KEY, 1, timeout=None)
+        version = cache.get(COLLECTION_VERSION_KEY, 1)
+    return version
+
+
+def bump_collection_version() -> None:
+    """Invalidate every cached response, once the current transaction (if any) commits."""
+    transaction.on_commit(_bump)
+
+
+def _bump():
+    try:
+        cache.incr(COLLECTION_VERSION_KEY)
+    except ValueError:
+        # Missing (first use or evicted): any value other than the old one works
+        cache.set(COLLECTION_VERSION_KEY, int(time.time()), timeout=None)
+
+
+def make_key(name: str, params: Dict[str, str], user_id: Optional[int] = None) -> str:
+    """Cache key of a response: endpoint name, collection version and a digest of the sorted query params."""
+    digest = hashlib.sha1(
+        '&'.join(f'{k}={v}' for k, v in sorted(params.items())).encode('utf-8')
+    ).hexdigest()
+    scope = f':u{user_id}' if user_id is not None else ''
+    return f'file:{name}:v{get_collection_version()}{scope}:{digest}'
+
+
+def _get_local_lock(key: str) -> threading.Lock:
+    with _local_locks_guard:
+        return _local_locks.setdefault(key, threading.Lock())
+
+
+def get_or_compute(key: str, compute: Callable[[], object], timeout: int = RESPONSE_TIMEOUT):
+    """
+    Return the cached value of `key`, computing and caching it on a miss. Concurrent misses are coalesced
+    (single-flight): threads of this process wait on a local lock, and across processes only the worker
+    that wins `cache.add` on the fill lock computes while the others poll for its result.
+    """
+    value = cache.get(key)
+    if value is not None:
+        return value
+
+    local_lock = _get_local_lock(key)
+    with local_lock:
+        value = cache.get(key)
+        if value is not None:
+            return value
+
+        fill_lock_key = f'{key}:fill'
+        token = uuid.uuid4().hex
+        owns_lock = cache.add(fill_lock_key, token, timeout=FILL_LOCK_TIMEOUT)
+        if not owns_lock:
+            # Another process is computing: wait for its result, up to the lock timeout
+            deadline = time.monotonic() + FILL_LOCK_TIMEOUT
+            while time.monotonic() < deadline:
+                time.sleep(FILL_POLL_INTERVAL)
+                value = cache.get(key)
+                if value is not None:
+                    return value
+            logger.warning("Gave up waiting for cache fill of %s", key)
+            # Computed anyway; the lock is only taken over if it expired
+            owns_lock = cache.add(fill_lock_key, token, timeout=FILL_LOCK_TIMEOUT)
+
+        try:
+            value = compute()
+            cache.set(key, value, timeout)
+        finally:
+            # The lock may have expired and been taken by another process: only release our own
+            if owns_lock and cache.get(fill_lock_key) == token:
+                cache.delete(fill_lock_key)
+            with _local_locks_guard:
+                _local_locks.pop(key, None)
+        return value
@@ -0,0 +1,26 @@
+"""
+Tokens binding an upload to the SHA-256 digest it was presigned for.
+
+`get-pre-signed-urls` only trusts a client's digest for deduplication within the client's own files, and
+presigns the upload with that digest so that the storage refuses any other content. The token it returns
+lets the File row created afterwards record the digest: without it, a client could claim any digest.
+"""
+from django.core import signing
+
+CONTENT_TOKEN_SALT = 'file.content_sha256'
+CONTENT_TOKEN_MAX_AGE = 24 * 60 * 60  # Seconds, well beyond the expiry of the upload URL
+
+
+def make_content_token(user_id: int, bucket_name: str, object_key: str, sha256: str) -> str:
+    return signing.dumps([user_id, bucket_name, object_key, sha256], salt=CONTENT_TOKEN_SALT)
+
+
+def verify_content_token(token, user_id: int, bucket_name: str, object_key: str, sha256: str) -> bool:
+    """Whether `token` was issued to the user for uploading that content to that object."""
+    if not isinstance(token, str):
+        return False
+    try:
+        payload = signing.loads(token, salt=CONTENT_TOKEN_SALT, max_age=CONTENT_TOKEN_MAX_AGE)
+    except signing.BadSignature:
+        return False
+    return payload == [user_id, bucket_name, object_key, sha256]
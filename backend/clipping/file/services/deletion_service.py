@@ -0,0 +1,243 @@
+import logging
+import threading
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache_service import bump_collection_version
+from .event_service import FILE_DELETED, publish
+from .r2_service import R2Service
+from .stats_service import subtract_deleted_files
+from .tag_index import tag_index
+
+logger = logging.getLogger('my_logger')
+
+# Number of file rows removed per transaction
+DELETE_CHUNK_SIZE = 500
+
+# Tables referencing file.file_id; their rows are removed with raw SQL before the file rows,
+# replacing Django's deletion collector for the cascade
+CASCADE_TABLES = ['file_interaction', 'file_score']
+
+# Finished jobs are kept this long for polling, then removed
+DELETION_JOB_RETENTION = timedelta(days=7)
+
+# A running job whose progress was not saved for this long lost its thread (e.g. the worker restarted)
+DELETION_JOB_STALE_AFTER = timedelta(minutes=30)
+
+MAX_ERROR_LENGTH = 1000
+
+# Purges of synchronous deletions (e.g. a user deleting a file) run here, off the request thread
+_purge_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='purge-objects')
+
+
+class DeletionService:
+    """
+    Deletes File rows in primary-key ordered chunks, one short transaction per chunk. The objects of a chunk
+    are recorded in pending_object_deletion in the same transaction and purged from storage once it commits;
+    whatever a purge leaves behind is retried by the purge_deleted_objects command.
+    """
+
+    @staticmethod
+    def get_job(job_id: str):
+        from ..models import DeletionJob
+
+        try:
+            job_id = uuid.UUID(job_id)
+        except (TypeError, ValueError):
+            return None
+        return DeletionJob.objects.filter(job_id=job_id).first()
+
+    @classmethod
+    def delete_files(cls, file_ids: Iterable[int], purge_objects: bool = True):
+        """
+        Synchronously deletes the given files and, unless `purge_objects` is False (e.g. the objects are known
+        to be missing), queues the purge of their objects in the background. The returned job carries the
+        counters but is not stored; the purge counters are filled in once the purge ran.
+        """
+        from ..models import DeletionJob
+
+        job = DeletionJob()
+        cls._delete_chunks(job, sorted(set(file_ids)), purge_objects)
+        return job
+
+    @classmethod
+    def delete_all_files(cls):
+        """Deletes every file in a background thread. Returns the stored job to poll for progress."""
+        from ..models import DeletionJob
+
+        evict_finished_jobs()
+        job = DeletionJob.objects.create()
+        thread = threading.Thread(target=cls._run_in_thread, args=(job, None), name=f'delete-files-{job.job_id}',
+                                  daemon=True)
+        thread.start()
+        return job
+
+    @classmethod
+    def _run_in_thread(cls, job, file_ids: Optional[List[int]]):
+        try:
+            cls._delete_chunks(job, file_ids)
+        finally:
+            # Threads get their own database connection, release it
+            connection.close()
+
+    @classmethod
+    def _delete_chunks(cls, job, file_ids: Optional[List[int]], purge_objects: bool = True):
+        """
+        Deletes the files in `file_ids` (all files when None) in chunks of DELETE_CHUNK_SIZE,
+        walking the primary key so each chunk is an index range scan.
+        """
+        last_id = 0
+        try:
+            while True:
+                last_id = cls._delete_chunk(job, last_id, file_ids, purge_objects)
+                if last_id is None:
+                    break
+                _save_progress(job)
+                logger.info("Deletion job %s: %d files deleted so far", job.job_id, job.files_deleted)
+            job.status = job.Status.COMPLETED
+        except Exception as e:
+            logger.exception("Deletion job %s failed: %s", job.job_id, e)
+            job.status = job.Status.FAILED
+            job.error = str(e)[:MAX_ERROR_LENGTH]
+            raise
+        finally:
+            job.finished_datetime = timezone.now()
+            _save_progress(job)
+
+    @classmethod
+    def _delete_chunk(cls, job, last_id: int, file_ids: Optional[List[int]], purge_objects: bool) -> Optional[int]:
+        """Deletes the next chunk of files after `last_id`. Returns the last deleted id, None when done."""
+        from ..models import PendingObjectDeletion
+
+        with transaction.atomic(), connection.cursor() as cursor:
+            if file_ids is None:
+                cursor.execute(
+                    "SELECT file_id, bucket_name, object_key, preview_frame_keys, tags FROM file "
+                    "WHERE file_id > %s ORDER BY file_id LIMIT %s FOR UPDATE",
+                    [last_id, DELETE_CHUNK_SIZE]
+                )
+            else:
+                cursor.execute(
+                    "SELECT file_id, bucket_name, object_key, preview_frame_keys, tags FROM file "
+                    "WHERE file_id > %s AND file_id = ANY(%s) ORDER BY file_id LIMIT %s FOR UPDATE",
+                    [last_id, file_ids, DELETE_CHUNK_SIZE]
+                )
+            chunk = cursor.fetchall()
+            if not chunk:
+                return None
+
+            ids = [row[0] for row in chunk]
+            # Raw deletes send no signals: keep the per-user counters and the tag index in step here
+            subtract_deleted_files(cursor, ids)
+            tags = [tag for *_, file_tags in chunk for tag in file_tags or []]
+            transaction.on_commit(lambda: tag_index.update(tags, -1))
+            rows_cascaded = 0
+            for table in CASCADE_TABLES:
+                cursor.execute(f"DELETE FROM {table} WHERE file_id = ANY(%s)", [ids])
+                rows_cascaded += cursor.rowcount
+            cursor.execute("DELETE FROM file WHERE file_id = ANY(%s)", [ids])
+            job.add(files_deleted=cursor.rowcount, rows_cascaded=rows_cascaded)
+
+            if purge_objects:
+                # Stored jobs are referenced, the others would violate the foreign key
+                job_ref = None if job._state.adding else job
+                pending = PendingObjectDeletion.objects.bulk_create([
+                    PendingObjectDeletion(job=job_ref, bucket_name=bucket_name, object_key=key)
+                    for _, bucket_name, object_key, derivative_keys, _ in chunk
+                    for key in [object_key, *(derivative_keys or [])]
+                ])
+                job.add(objects_queued=len(pending))
+
+                # Objects must outlive their rows: purge only once the deletion is committed. Stored jobs
+                # already run in their own thread; the others are requests, which should not wait for storage.
+                if job._state.adding:
+                    transaction.on_commit(lambda: _purge_executor.submit(_purge_in_background, job, pending))
+                else:
+                    transaction.on_commit(lambda: _purge(job, pending))
+
+            bump_collection_version()
+            publish(FILE_DELETED, file_ids=ids)
+            return ids[-1]
+
+
+def purge_objects_from_storage(entries: List) -> Tuple[int, int]:
+    """
+    Removes the objects of PendingObjectDeletion entries from storage, per bucket in DeleteObjects batches.
+    Purged entries are deleted; failed ones stay, with their attempt count and error updated.
+    Returns the numbers of purged and failed objects.
+    """
+    from ..models import PendingObjectDeletion
+
+    by_bucket: Dict[str, List] = defaultdict(list)
+    for entry in entries:
+        by_bucket[entry.bucket_name].append(entry)
+
+    purged, failed = 0, []
+    for bucket_name, bucket_entries in by_bucket.items():
+        try:
+            _, errors = R2Service.delete_objects([entry.object_key for entry in bucket_entries], bucket_name)
+        except Exception as e:
+            errors = [{'Key': entry.object_key, 'Code': 'RequestFailed', 'Message': str(e)} for entry in bucket_entries]
+        messages = {error['Key']: error.get('Message') or error.get('Code') for error in errors}
+
+        done = [entry.pending_id for entry in bucket_entries if entry.object_key not in messages]
+        PendingObjectDeletion.objects.filter(pending_id__in=done).delete()
+        purged += len(done)
+        for entry in bucket_entries:
+            if entry.object_key in messages:
+                entry.attempts += 1
+                entry.last_error = str(messages[entry.object_key])[:MAX_ERROR_LENGTH]
+                failed.append(entry)
+        if errors:
+            logger.error("Failed to purge %d of %d objects from bucket %s", len(errors), len(bucket_entries),
+                         bucket_name)
+        logger.info("Purged %d objects from bucket %s", len(done), bucket_name)
+
+    PendingObjectDeletion.objects.bulk_update(failed, ['attempts', 'last_error'])
+    return purged, len(failed)
+
+
+def _purge(job, pending: List) -> None:
+    purged, failed = purge_objects_from_storage(pending)
+    job.add(objects_purged=purged, objects_failed=failed)
+
+
+def _purge_in_background(job, pending: List) -> None:
+    """Purges in the executor thread. Whatever fails stays pending for purge_deleted_objects."""
+    from django.db import close_old_connections
+
+    try:
+        _purge(job, pending)
+    except Exception as e:
+        logger.exception("Background purge of %d objects failed: %s", len(pending), e)
+    finally:
+        close_old_connections()
+
+
+def evict_finished_jobs() -> int:
+    """
+    Removes the jobs finished more than DELETION_JOB_RETENTION ago and fails the running jobs that stopped
+    making progress. Returns the number of removed jobs.
+    """
+    from ..models import DeletionJob
+
+    now = timezone.now()
+    DeletionJob.objects.filter(
+        status=DeletionJob.Status.RUNNING, updated_datetime__lt=now - DELETION_JOB_STALE_AFTER
+    ).update(status=DeletionJob.Status.FAILED, error='Interrupted', finished_datetime=now)
+    removed, _ = DeletionJob.objects.filter(finished_datetime__lt=now - DELETION_JOB_RETENTION).delete()
+    return removed
+
+
+def _save_progress(job) -> None:
+    """Stores the counters of a stored job, so that every worker reports the same progress."""
+    if job._state.adding:
+        return
+    job.updated_datetime = timezone.now()
+    job.save(update_fields=[*job.COUNTERS, 'status', 'error', 'updated_datetime', 'finished_datetime'])
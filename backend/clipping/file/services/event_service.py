@@ -0,0 +1,128 @@
+import asyncio
+import itertools
+import json
+import logging
+import threading
+import time
+from typing import Dict, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger('my_logger')
+
+# Postgres NOTIFY channel carrying the events of every process
+CHANNEL = 'file_events'
+
+# NOTIFY payloads are limited to 8000 bytes; events must stay compact
+MAX_PAYLOAD_SIZE = 7900
+
+# Events buffered per subscriber before it is considered too slow and told to resync
+SUBSCRIBER_QUEUE_SIZE = 256
+
+# Event types
+FILE_CREATED = 'file.created'
+FILE_DELETED = 'file.deleted'
+FILE_ENRICHED = 'file.enriched'
+FILE_UPDATED = 'file.updated'
+INTERACTION_LIKE = 'interaction.like'
+INTERACTION_COMMENT = 'interaction.comment'
+RESYNC = 'resync'
+
+
+def publish(event_type: str, **data) -> None:
+    """
+    Publish an event to every connected client, once the current transaction (if any) commits.
+    On Postgres it goes through NOTIFY, so clients connected to any process receive it; on other
+    databases it is delivered to the subscribers of this process only.
+    """
+    payload = json.dumps({'type': event_type, **data}, cls=DjangoJSONEncoder, separators=(',', ':'))
+    if len(payload.encode('utf-8')) > MAX_PAYLOAD_SIZE:
+        logger.warning("Dropping %s event of %d bytes", event_type, len(payload))
+        return
+    transaction.on_commit(lambda: _send(payload))
+
+
+def _send(payload: str) -> None:
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT pg_notify(%s, %s)", [CHANNEL, payload])
+    else:
+        broker.dispatch(payload)
+
+
+class Subscriber:
+    """An event stream consumer: an asyncio queue fed from the broker thread."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def put(self, event: Dict) -> None:
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Drop the backlog: the client refetches instead of replaying it
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({'id': event['id'], 'type': RESYNC})
+
+
+class EventBroker:
+    """
+    Fans out the events of one source to the subscribers of this process. On Postgres a single daemon
+    thread LISTENs on a dedicated connection; otherwise `publish` dispatches directly.
+    """
+
+    def __init__(self):
+        self.subscribers = set()
+        self.lock = threading.Lock()
+        self.listener: Optional[threading.Thread] = None
+        self.ids = itertools.count(1)
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(asyncio.get_running_loop())
+        with self.lock:
+            self.subscribers.add(subscriber)
+            if self.listener is None and connections['default'].vendor == 'postgresql':
+                self.listener = threading.Thread(target=self._listen, name='file-event-listener', daemon=True)
+                self.listener.start()
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        with self.lock:
+            self.subscribers.discard(subscriber)
+
+    def dispatch(self, payload: str) -> None:
+        try:
+            event = {'id': next(self.ids), **json.loads(payload)}
+        except ValueError:
+            logger.error("Invalid event payload: %s", payload)
+            return
+        with self.lock:
+            subscribers = list(self.subscribers)
+        for subscriber in subscribers:
+            subscriber.loop.call_soon_threadsafe(subscriber.put, event)
+
+    def _listen(self) -> None:
+        """LISTEN loop, reconnecting with backoff. Subscribers are told to resync after a reconnection."""
+        backoff = 1
+        while True:
+            db = connections['default']
+            try:
+                raw_connection = db.get_new_connection(db.get_connection_params())
+                raw_connection.autocommit = True
+                raw_connection.execute(f"LISTEN {CHANNEL}")
+                logger.info("Listening for file events")
+                backoff = 1
+                for notification in raw_connection.notifies():
+                    self.dispatch(notification.payload)
+            except Exception as e:
+                logger.error("File event listener failed, reconnecting in %ds: %s", backoff, e)
+                self.dispatch(json.dumps({'type': RESYNC}))
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 60)
+
+
+broker = EventBroker()
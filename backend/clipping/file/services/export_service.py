@@ -0,0 +1,118 @@
+import csv
+import json
+import logging
+from datetime import datetime, time
+from typing import Iterable, Iterator, List, Optional
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from ..models import File, FileInteraction
+
+logger = logging.getLogger('my_logger')
+
+# Rows fetched per round trip of the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+
+NDJSON = 'ndjson'
+CSV = 'csv'
+EXPORT_FORMATS = {NDJSON: 'application/x-ndjson', CSV: 'text/csv'}
+
+EXPORT_FIELDS = [
+    'file_id', 'bucket_name', 'object_key', 'file_type', 'width', 'height', 'tags', 'description',
+    'file_caption', 'user_id', 'created_datetime', 'last_updated_datetime',
+]
+INTERACTION_COUNT_FIELDS = ['like_count', 'comment_count']
+
+
+def parse_updated_since(raw_value: Optional[str]) -> Optional[datetime]:
+    """
+    Parse an ISO 8601 datetime or date (midnight) into an aware datetime. Naive values are taken in the
+    current time zone. Raises ValueError on malformed input.
+    """
+    if not raw_value:
+        return None
+    value = parse_datetime(raw_value)
+    if value is None:
+        day = parse_date(raw_value)
+        if day is None:
+            raise ValueError(f"Invalid updated_since value: {raw_value!r}")
+        value = datetime.combine(day, time.min)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def _interaction_count(interaction_type):
+    """Correlated subquery counting the interactions of one type of the outer file."""
+    counts = (
+        FileInteraction.objects
+        .filter(file=OuterRef('pk'), interaction_type=interaction_type)
+        .order_by()
+        .values('file')
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+
+def get_export_queryset(updated_since: Optional[datetime] = None, with_interactions: bool = False):
+    """
+    Build the values() queryset of the export, ordered by file_id. Interaction counts are correlated
+    subqueries rather than a JOIN + GROUP BY, so Postgres can stream rows without aggregating the whole table.
+    """
+    queryset = File.objects.order_by('file_id')
+    if updated_since is not None:
+        queryset = queryset.filter(last_updated_datetime__gte=updated_since)
+    if with_interactions:
+        queryset = queryset.annotate(
+            like_count=_interaction_count(FileInteraction.InteractionType.LIKE),
+            comment_count=_interaction_count(FileInteraction.InteractionType.COMMENT),
+        )
+    return queryset.values(*get_export_fields(with_interactions))
+
+
+def get_export_fields(with_interactions: bool = False) -> List[str]:
+    return EXPORT_FIELDS + (INTERACTION_COUNT_FIELDS if with_interactions else [])
+
+
+class _Echo:
+    """File-like object whose write() returns the value, so csv.writer can feed a generator."""
+
+    def write(self, value):
+        return value
+
+
+def iter_ndjson(rows: Iterable[dict]) -> Iterator[str]:
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+
+
+def iter_csv(rows: Iterable[dict], fields: List[str]) -> Iterator[str]:
+    """Yield CSV lines with a header. Tags are written as a JSON array to keep the column unambiguous."""
+    writer = csv.writer(_Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        row = dict(row, tags=json.dumps(row['tags']))
+        yield writer.writerow([
+            value.isoformat() if isinstance(value, datetime) else value
+            for value in (row[field] for field in fields)
+        ])
+
+
+def stream_export(export_format: str = NDJSON, updated_since: Optional[datetime] = None,
+                  with_interactions: bool = False, chunk_size: int = EXPORT_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Stream the file catalog as NDJSON or CSV lines. Rows are read through a server-side cursor
+    (`.iterator(chunk_size)`), so memory stays flat regardless of the table size.
+    """
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format: {export_format!r}")
+
+    rows = get_export_queryset(updated_since, with_interactions).iterator(chunk_size=chunk_size)
+    if export_format == CSV:
+        return iter_csv(rows, get_export_fields(with_interactions))
+    return iter_ndjson(rows)
@@ -0,0 +1,251 @@
+import io
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple, Union
+
+from django.db import transaction
+from django.utils import timezone
+
+logger = logging.getLogger('my_logger')
+
+# EXIF tags: IFD0, and the Exif and GPS sub-IFDs
+EXIF_IFD_TAG = 0x8769
+GPS_IFD_TAG = 0x8825
+EXIF_MAKE_TAG = 0x010F
+EXIF_MODEL_TAG = 0x0110
+EXIF_DATETIME_ORIGINAL_TAG = 0x9003
+EXIF_OFFSET_TIME_ORIGINAL_TAG = 0x9011
+GPS_LATITUDE_TAG = 2
+GPS_LONGITUDE_TAG = 4
+MAX_CAMERA_LENGTH = 100
+
+# Dominant colors: pixels of a downscaled copy are quantized to QUANTIZE_LEVELS levels per channel, the most
+# populated cells covering at least MIN_COLOR_SHARE of the image make the palette
+PALETTE_SIZE = 5
+PALETTE_SAMPLE_SIZE = 64  # Side of the downscaled copy
+PALETTE_DECODE_SIZE = 256  # JPEGs are decoded at a reduced scale of at least this size
+QUANTIZE_LEVELS = 8
+MIN_COLOR_SHARE = 0.05
+
+# Color names of the `?color=` filter. Chromatic colors are named by hue, upper bounds in degrees.
+COLOR_NAMES = ('black', 'white', 'gray', 'brown', 'red', 'orange', 'yellow', 'green', 'cyan', 'blue', 'purple',
+               'pink')
+HUE_BOUNDS = (15, 40, 65, 165, 195, 255, 290, 340)
+HUE_NAMES = ('red', 'orange', 'yellow', 'green', 'cyan', 'blue', 'purple', 'pink', 'red')
+
+# Ingest stage
+FEATURE_FIELDS = ['taken_datetime', 'camera', 'has_gps', 'dominant_colors', 'color_palette',
+                  'features_extracted_datetime']
+FEATURE_WORKERS = 2  # Processes of the background extraction of new uploads
+DOWNLOAD_WORKERS = 8  # Objects downloaded concurrently
+MAX_FEATURE_OBJECT_SIZE = 50 * 1024 * 1024  # Larger images are skipped
+
+Features = Dict[str, object]
+
+
+def parse_exif_datetime(value, offset=None) -> Optional[datetime]:
+    """
+    Parse an EXIF 'YYYY:MM:DD HH:MM:SS' value, aware if its '+HH:MM' offset is known.
+    Returns None for missing or malformed values (e.g. the '0000:00:00 00:00:00' of unset clocks).
+    """
+    if not isinstance(value, str):
+        return None
+    try:
+        taken = datetime.strptime(value.strip('\x00 ')[:19], '%Y:%m:%d %H:%M:%S')
+    except ValueError:
+        return None
+    if isinstance(offset, str):
+        try:
+            taken = taken.replace(tzinfo=datetime.strptime(offset.strip('\x00 '), '%z').tzinfo)
+        except ValueError:
+            pass
+    return taken
+
+
+def extract_exif(image) -> Features:
+    """Capture time, camera and GPS presence from the EXIF of a Pillow image."""
+    exif = image.getexif()
+    exif_ifd = exif.get_ifd(EXIF_IFD_TAG)
+    gps_ifd = exif.get_ifd(GPS_IFD_TAG)
+
+    make = str(exif.get(EXIF_MAKE_TAG) or '').strip('\x00 ')
+    model = str(exif.get(EXIF_MODEL_TAG) or '').strip('\x00 ')
+    # Models usually repeat the make, e.g. 'Canon' 'Canon EOS R5'
+    camera = model if model.lower().startswith(make.lower()) else f'{make} {model}'.strip()
+    return {
+        'taken_datetime': parse_exif_datetime(exif_ifd.get(EXIF_DATETIME_ORIGINAL_TAG),
+                                              exif_ifd.get(EXIF_OFFSET_TIME_ORIGINAL_TAG)),
+        'camera': camera[:MAX_CAMERA_LENGTH] or None,
+        'has_gps': GPS_LATITUDE_TAG in gps_ifd and GPS_LONGITUDE_TAG in gps_ifd,
+    }
+
+
+def dominant_colors(image, size: int = PALETTE_SIZE):
+    """
+    The dominant colors of a Pillow image, most present first, as an (n, 3) array of RGB means together
+    with the share of the image covered by each. The most present color is always returned.
+    """
+    import numpy as np  # Only worker processes pay for the import
+
+    sample = image.convert('RGB').resize((PALETTE_SAMPLE_SIZE, PALETTE_SAMPLE_SIZE))
+    pixels = np.asarray(sample, dtype=np.int64).reshape(-1, 3)
+    cells = pixels // (256 // QUANTIZE_LEVELS)
+    indices = (cells[:, 0] * QUANTIZE_LEVELS + cells[:, 1]) * QUANTIZE_LEVELS + cells[:, 2]
+
+    counts = np.bincount(indices, minlength=QUANTIZE_LEVELS ** 3)
+    order = np.argsort(counts, kind='stable')[::-1][:size]
+    keep = counts[order] >= MIN_COLOR_SHARE * len(indices)
+    keep[0] = True
+    order = order[keep]
+
+    # Mean color of the pixels of each cell, rather than the cell's corner
+    sums = np.stack([np.bincount(indices, weights=pixels[:, channel], minlength=QUANTIZE_LEVELS ** 3)
+                     for channel in range(3)], axis=1)
+    return sums[order] / counts[order, None], counts[order] / len(indices)
+
+
+def name_colors(colors) -> List[str]:
+    """Name each RGB color of an (n, 3) array with one of COLOR_NAMES, from its hue, saturation and value."""
+    import numpy as np
+
+    rgb = np.asarray(colors, dtype=np.float64).reshape(-1, 3) / 255
+    value = rgb.max(axis=1)
+    delta = value - rgb.min(axis=1)
+    saturation = np.where(value > 0, delta / np.maximum(value, 1e-9), 0)
+
+    red, green, blue = rgb.T
+    safe_delta = np.maximum(delta, 1e-9)
+    hue = 60 * np.select(
+        [value == red, value == green],
+        [((green - blue) / safe_delta) % 6, (blue - red) / safe_delta + 2],
+        (red - green) / safe_delta + 4
+    )
+
+    names = np.array(HUE_NAMES)[np.searchsorted(HUE_BOUNDS, hue, side='right')]
+    names = np.where((hue < 50) & (value < 0.6) & (saturation > 0.25), 'brown', names)
+    names = np.where(saturation < 0.15, np.where(value > 0.85, 'white', 'gray'), names)
+    names = np.where(value < 0.2, 'black', names)
+    return [str(name) for name in names]
+
+
+def extract_features(source: Union[bytes, str]) -> Optional[Features]:
+    """
+    Extract the EXIF data and the dominant colors of an image, given as bytes or a local path.
+    Runs in worker processes, so it only touches its input. Returns None if the image cannot be decoded.
+    """
+    from PIL import Image
+
+    try:
+        with Image.open(io.BytesIO(source) if isinstance(source, bytes) else source) as image:
+            features = extract_exif(image)
+            # JPEGs decode straight to a fraction of their size
+            image.draft('RGB', (PALETTE_DECODE_SIZE, PALETTE_DECODE_SIZE))
+            colors, _ = dominant_colors(image)
+    except Exception as e:
+        logger.info("Cannot extract the features of the image: %s", e)
+        return None
+
+    rounded = colors.round().astype(int).tolist()
+    features['color_palette'] = ['#%02x%02x%02x' % tuple(color) for color in rounded]
+    features['dominant_colors'] = list(dict.fromkeys(name_colors(colors)))
+    return features
+
+
+def apply_features(file, features: Optional[Features], extracted_datetime: datetime) -> None:
+    """Set the feature fields of a file from the result of `extract_features` (None: nothing found)."""
+    features = features or {}
+    taken = features.get('taken_datetime')
+    # Cameras record local time without an offset: take it in the current time zone
+    if taken is not None and timezone.is_naive(taken):
+        taken = timezone.make_aware(taken)
+    file.taken_datetime = taken
+    file.camera = features.get('camera')
+    file.has_gps = features.get('has_gps')
+    file.dominant_colors = features.get('dominant_colors', [])
+    file.color_palette = features.get('color_palette', [])
+    file.features_extracted_datetime = extracted_datetime
+
+
+def fetch_image(file) -> Optional[bytes]:
+    """The content of a stored image, or None if it is too large to be processed."""
+    from .r2_service import R2Service
+
+    size = file.size_bytes or R2Service.get_object_size(file.object_key, file.bucket_name)
+    if size > MAX_FEATURE_OBJECT_SIZE:
+        logger.info("Skipping feature extraction of %s (%d bytes)", file.object_key, size)
+        return None
+    return R2Service.get_object_range(file.object_key, 0, size - 1, file.bucket_name) if size else None
+
+
+def extract_file_features(files: List, pool: Executor, download_workers: int = DOWNLOAD_WORKERS) -> List:
+    """
+    Download the given image files concurrently, extract their features in the process `pool` and save them.
+    Files that fail to download are left for a later run. Returns the updated files.
+    """
+    from ..models import File
+    from .cache_service import bump_collection_version
+
+    extractions: List[Tuple] = []
+    with ThreadPoolExecutor(download_workers) as downloads:
+        # Images are handed to the workers as they arrive, decoding overlaps the remaining downloads
+        for file, download in [(file, downloads.submit(fetch_image, file)) for file in files]:
+            try:
+                data = download.result()
+            except Exception as e:
+                logger.error("Failed to download %s for feature extraction: %s", file.object_key, e)
+                continue
+            extractions.append((file, pool.submit(extract_features, data) if data else None))
+
+    now = timezone.now()
+    updated = []
+    for file, extraction in extractions:
+        try:
+            features = extraction.result() if extraction else None
+        except Exception as e:
+            logger.error("Feature extraction of %s failed: %s", file.object_key, e)
+            continue
+        apply_features(file, features, now)
+        updated.append(file)
+
+    if updated:
+        with transaction.atomic():
+            File.objects.bulk_update(updated, FEATURE_FIELDS)
+            bump_collection_version()
+    return updated
+
+
+_process_pool: Optional[ProcessPoolExecutor] = None
+_hook_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='features')
+
+
+def get_process_pool() -> ProcessPoolExecutor:
+    """
+    The worker processes of the background extraction, started on first use. They are spawned rather than
+    forked, since the server process runs threads.
+    """
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(FEATURE_WORKERS, mp_context=multiprocessing.get_context('spawn'))
+    return _process_pool
+
+
+def schedule_extraction(file_ids: List[int]) -> None:
+    """Extract the features of newly created images in the background, once the transaction commits."""
+    def run():
+        from django.db import close_old_connections
+        from ..models import File
+
+        try:
+            files = list(File.objects.filter(file_id__in=file_ids, file_type=File.FileType.IMAGE,
+                                             features_extracted_datetime__isnull=True))
+            if files:
+                extract_file_features(files, get_process_pool())
+        except Exception as e:
+            logger.exception("Background feature extraction of %s failed: %s", file_ids, e)
+        finally:
+            close_old_connections()
+
+    if file_ids:
+        transaction.on_commit(lambda: _hook_executor.submit(run))
@@ -1,15 +1,17 @@
 import json
 import os
-import yaml
 import base64
+import mimetypes
 from abc import ABC, abstractmethod
-from openai import OpenAI
+from functools import lru_cache
 from django.conf import settings
 
 
 # Load the prompt keys from YAML into a dictionary at the beginning
 def load_prompt_keys_from_yaml(file_path: str) -> dict:
     """Load predefined prompts from a YAML configuration file."""
+    import yaml
+
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"Config file {file_path} not found.")
 
@@ -24,12 +26,14 @@ def load_prompt_keys_from_yaml(file_path: str) -> dict:
     return config
 
 
-# Load the prompt keys into a global dictionary
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))  # Get the directory of the script
 PROMPT_KEYS_PATH = os.path.join(SCRIPT_DIR, "prompt_key.yaml")  # Construct the full path to 'prompt_key.yaml'
 
-# Load the prompt keys from the YAML file
-PROMPT_KEYS = load_prompt_keys_from_yaml(PROMPT_KEYS_PATH)
+
+@lru_cache(maxsize=None)
+def get_prompt_keys() -> dict:
+    """Load the prompt keys from the YAML file on first use and reuse them afterwards."""
+    return load_prompt_keys_from_yaml(PROMPT_KEYS_PATH)
 
 
 class GenerativeService(ABC):
@@ -38,6 +42,9 @@ class GenerativeService(ABC):
     """
 
     def __init__(self, api_key: str, prompt_keys: dict):
+        # Imported here, the OpenAI SDK is slow to import and only needed once a generation is requested
+        from openai import OpenAI
+
         self.client = OpenAI(api_key=api_key)
         self.prompt_keys = prompt_keys  # Prompt keys are supplied as a dictionary
 
@@ -53,11 +60,11 @@ class GPTService(GenerativeService):
     Implementation of GenerativeService for GPT-based models using the OpenAI API.
     """
 
-    def __init__(self, api_key: str = None, prompt_keys: dict = PROMPT_KEYS):
+    def __init__(self, api_key: str = None, prompt_keys: dict = None):
         api_key = api_key or settings.GPT_API_KEY or os.environ.get("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("GPT API Key is missing.")
-        super().__init__(api_key=api_key, prompt_keys=prompt_keys)
+        super().__init__(api_key=api_key, prompt_keys=prompt_keys if prompt_keys is not None else get_prompt_keys())
 
     def generate(self, prompt_key: str = None, custom_prompt: str = None, return_format: str = "text",
                  media_object: str = None):
@@ -120,6 +127,13 @@ class GPTService(GenerativeService):
             else:
                 with open(media_object, "rb") as f:
                     encoded_str = base64.b64encode(f.read()).decode("utf-8")
-                return {"type": "image_url", "image_url": {"url": f"data:image/png;base64,{encoded_str}"}}
+                mime_type = mimetypes.guess_type(media_object)[0] or "image/png"
+                return {"type": "image_url", "image_url": {"url": f"data:{mime_type};base64,{encoded_str}"}}
         except Exception as e:
-            raise ValueError(f"Error processing media: {str(e)}")
\ No newline at end of file
+            raise ValueError(f"Error processing media: {str(e)}")
+
+
+@lru_cache(maxsize=None)
+def get_gpt_service() -> GPTService:
+    """Returns the shared GPTService, creating its OpenAI client on first use."""
+    return GPTService()
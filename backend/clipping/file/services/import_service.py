@@ -0,0 +1,105 @@
+import hashlib
+import logging
+import mimetypes
+import os
+import time
+import uuid
+from typing import Dict, Iterator, Optional
+
+from .feature_service import extract_features
+from .r2_service import R2Service
+
+logger = logging.getLogger('my_logger')
+
+# Read size when hashing local files
+HASH_BLOCK_SIZE = 1024 * 1024
+
+# Top-level MIME types that can be imported, with the file type used by the presign/upload API
+IMPORTABLE_TYPES = {'image': 'image', 'video': 'video'}
+
+
+def iter_media_paths(root: str) -> Iterator[str]:
+    """Walk `root` in a stable order, yielding the paths of image and video files. Hidden entries are skipped."""
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories[:] = sorted(d for d in subdirectories if not d.startswith('.'))
+        for filename in sorted(filenames):
+            if filename.startswith('.'):
+                continue
+            content_type, _ = mimetypes.guess_type(filename)
+            if content_type and content_type.split('/')[0] in IMPORTABLE_TYPES:
+                yield os.path.join(directory, filename)
+
+
+def read_image_size(path: str):
+    """Read (width, height) from the image header with Pillow, or (None, None) if unavailable."""
+    try:
+        from PIL import Image
+    except ImportError:
+        return None, None
+    try:
+        with Image.open(path) as image:
+            return image.size
+    except Exception:
+        return None, None
+
+
+def probe_local_file(path: str) -> Optional[Dict]:
+    """
+    Hash a local media file and read its metadata. Runs in worker processes, so it only touches the filesystem.
+    Returns None if the file cannot be read.
+    """
+    sha256 = hashlib.sha256()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+                sha256.update(block)
+        size = os.path.getsize(path)
+    except OSError as e:
+        logger.error("Failed to read %s: %s", path, e)
+        return None
+
+    content_type = mimetypes.guess_type(path)[0]
+    file_type = IMPORTABLE_TYPES[content_type.split('/')[0]]
+    width, height = read_image_size(path) if file_type == 'image' else (None, None)
+    # EXIF and dominant colors, while the process has the image at hand
+    features = extract_features(path) if file_type == 'image' else None
+    return {
+        'path': path,
+        'sha256': sha256.hexdigest(),
+        'size': size,
+        'content_type': content_type,
+        'file_type': file_type,
+        'width': width,
+        'height': height,
+        'features': features,
+    }
+
+
+def build_object_key(path: str, sha256: str, user_id: int) -> str:
+    """
+    Object key of an imported file: its normalized name suffixed with the owner, a content hash prefix and a
+    random part. Content is only deduplicated per user, so every upload needs its own object: a row's deletion
+    purges its object.
+    """
+    stem, extension = os.path.splitext(os.path.basename(path))
+    return R2Service.normalize_key(f"{stem}_{user_id}_{sha256[:12]}_{uuid.uuid4().hex[:8]}{extension}")
+
+
+class ImportStats:
+    """Counters of an import run, with a throughput report."""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.scanned = 0
+        self.skipped = 0
+        self.failed = 0
+        self.imported = 0
+        self.bytes_uploaded = 0
+
+    def report(self) -> str:
+        elapsed = max(time.monotonic() - self.start, 1e-6)
+        return (
+            f"{self.scanned} scanned, {self.imported} imported, {self.skipped} already stored, {self.failed} failed | "
+            f"{self.scanned / elapsed:.1f} files/s hashed, {self.imported / elapsed:.1f} files/s imported, "
+            f"{self.bytes_uploaded / elapsed / 1024 / 1024:.1f} MiB/s uploaded"
+        )
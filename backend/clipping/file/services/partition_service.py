@@ -0,0 +1,242 @@
+"""
+Declarative range partitioning of the largest tables by `created_datetime` month (Postgres only), applied
+with `create_partitions --convert` and undone with `create_partitions --unpartition`.
+
+A partitioned table has one partition per calendar month (UTC), named <table>_pYYYYMM, plus a default
+partition catching rows outside them. `create_partitions` keeps the coming months created ahead of time, so
+the default partition stays empty. Queries filtering on created_datetime only scan the matching partitions,
+and "most recent first" pages stop at the newest partitions. Vacuum and index maintenance run per partition.
+Lookups by primary key alone (detail views, interactions edited by id) cannot be pruned: they probe the
+primary key index of every partition, so their cost grows with the number of months kept.
+
+Postgres requires the primary key and unique indexes of a partitioned table to include the partition key:
+- the primary key becomes (id, created_datetime); ids stay unique as they come from a single sequence,
+- other unique indexes and constraints (e.g. the (user, content_sha256) deduplication constraint of `file`)
+  can only be kept as plain indexes,
+- foreign keys referencing the table (e.g. file_interaction.file_id) cannot be kept at all.
+`partition_table` refuses to lose any of them unless told to with `drop_constraints`. What was changed is
+recorded in the database, so `unpartition_table` restores the original definition. Migrations altering
+those constraints must run on the plain table: unpartition, migrate, then partition again.
+"""
+import json
+import logging
+import re
+from datetime import datetime, timezone as dt_timezone
+from typing import List, Optional, Tuple
+
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('my_logger')
+
+PARTITION_KEY = 'created_datetime'
+
+# Partitioned tables and their primary key column. `file` comes first: interactions reference it.
+PARTITIONED_TABLES = {
+    'file': 'file_id',
+    'file_interaction': 'interaction_id',
+}
+
+# Comments recording the indexes demoted from unique while partitioned
+UNIQUE_INDEX = 'unique index'
+UNIQUE_CONSTRAINT = 'unique constraint'
+
+INDEX_TABLE_RE = re.compile(r' ON (?:ONLY )?\S+ USING ')
+
+DESCRIBE_INDEXES_SQL = """
+    SELECT i.relname, pg_get_indexdef(x.indexrelid), x.indisprimary,
+           CASE
+               WHEN NOT x.indisunique THEN obj_description(x.indexrelid, 'pg_class')
+               WHEN EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid AND c.contype = 'u')
+                   THEN %s
+               ELSE %s
+           END
+    FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+    WHERE x.indrelid = to_regclass(%s)
+"""
+
+FOREIGN_KEYS_SQL = (
+    "SELECT conrelid::regclass::text, conname, pg_get_constraintdef(oid) FROM pg_constraint "
+    "WHERE contype = 'f' AND {column} = to_regclass(%s)"
+)
+
+
+def month_start(value: datetime) -> datetime:
+    """The first instant (UTC) of the month of `value`."""
+    return value.astimezone(dt_timezone.utc).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+
+
+def add_months(month: datetime, months: int) -> datetime:
+    """Shifts the first instant of a month by a number of months."""
+    index = month.year * 12 + month.month - 1 + months
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def month_ranges(start: datetime, end: datetime) -> List[Tuple[datetime, datetime]]:
+    """The [first instant, first instant of the next month) bounds of every month from `start` to `end`."""
+    ranges = []
+    month = month_start(start)
+    while month <= end:
+        ranges.append((month, add_months(month, 1)))
+        month = add_months(month, 1)
+    return ranges
+
+
+def partition_name(table: str, month: datetime) -> str:
+    return f'{table}_p{month:%Y%m}'
+
+
+def default_partition_name(table: str) -> str:
+    return f'{table}_default'
+
+
+def is_partitioned(table: str) -> bool:
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", [table])
+        row = cursor.fetchone()
+    return row is not None and row[0] == 'p'
+
+
+def create_partitions(table: str, start: datetime, end: datetime) -> List[str]:
+    """
+    Creates the missing monthly partitions of `table` from the month of `start` to the month of `end`.
+    Rows of those months already in the default partition are moved to the new partition.
+    Returns the names of the created partitions.
+    """
+    quote = connection.ops.quote_name
+    default = default_partition_name(table)
+    created = []
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(%s)", [table]
+        )
+        existing = {row[0] for row in cursor.fetchall()}
+
+        for month, next_month in month_ranges(start, end):
+            name = partition_name(table, month)
+            if name in existing:
+                continue
+            bounds = f"FROM ('{month.isoformat()}') TO ('{next_month.isoformat()}')"
+            in_range = f"{quote(PARTITION_KEY)} >= %s AND {quote(PARTITION_KEY)} < %s"
+            with transaction.atomic():
+                stray = False
+                if default in existing:
+                    cursor.execute(f"SELECT EXISTS (SELECT 1 FROM {quote(default)} WHERE {in_range})",
+                                   [month, next_month])
+                    stray = cursor.fetchone()[0]
+                if stray:
+                    # The new partition's range must not overlap rows of the default partition
+                    logger.warning("Moving rows of %s from %s to the new partition", name, default)
+                    cursor.execute(f"ALTER TABLE {quote(table)} DETACH PARTITION {quote(default)}")
+                cursor.execute(f"CREATE TABLE {quote(name)} PARTITION OF {quote(table)} FOR VALUES {bounds}")
+                if stray:
+                    cursor.execute(f"INSERT INTO {quote(name)} SELECT * FROM {quote(default)} WHERE {in_range}",
+                                   [month, next_month])
+                    cursor.execute(f"DELETE FROM {quote(default)} WHERE {in_range}", [month, next_month])
+                    cursor.execute(f"ALTER TABLE {quote(table)} ATTACH PARTITION {quote(default)} DEFAULT")
+            created.append(name)
+    return created
+
+
+def create_future_partitions(table: str, months_ahead: int) -> List[str]:
+    """Creates the partitions of the current month and the `months_ahead` following ones."""
+    now = timezone.now()
+    return create_partitions(table, now, add_months(month_start(now), months_ahead))
+
+
+def partition_table(table: str, months_ahead: int, drop_constraints: bool = False) -> None:
+    """
+    Converts `table` into a table partitioned by created_datetime month, copying its rows. The table is
+    locked for the duration: run it in a maintenance window on large tables. Raises ValueError if the table
+    has unique constraints or is referenced by foreign keys, unless `drop_constraints` accepts losing them
+    until `unpartition_table`.
+    """
+    _rebuild(table, partitioned=True, months_ahead=months_ahead, drop_constraints=drop_constraints)
+
+
+def unpartition_table(table: str) -> None:
+    """Converts a table partitioned by `partition_table` back into a plain table, copying its rows."""
+    _rebuild(table, partitioned=False)
+
+
+def _rebuild(table: str, partitioned: bool, months_ahead: int = 0, drop_constraints: bool = False) -> None:
+    """
+    Recreates `table` partitioned or not, with the same columns, rows, indexes, constraints and id sequence.
+    Postgres cannot convert a table in place: the rows are copied into a new table that takes its name.
+    """
+    quote = connection.ops.quote_name
+    pk = PARTITIONED_TABLES[table]
+    old = f'{table}_old'
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(DESCRIBE_INDEXES_SQL, [UNIQUE_CONSTRAINT, UNIQUE_INDEX, table])
+        indexes = cursor.fetchall()
+        cursor.execute(FOREIGN_KEYS_SQL.format(column='conrelid'), [table])
+        foreign_keys = cursor.fetchall()
+        cursor.execute(FOREIGN_KEYS_SQL.format(column='confrelid'), [table])
+        referencing = cursor.fetchall()
+        if partitioned:
+            lost = [name for name, _, primary, unique in indexes
+                    if not primary and unique in (UNIQUE_INDEX, UNIQUE_CONSTRAINT)]
+            lost += [f'{referencing_table}.{name}' for referencing_table, name, _ in referencing]
+            if lost and not drop_constraints:
+                raise ValueError(f"Partitioning {table} would drop {', '.join(lost)}")
+            if lost:
+                logger.warning("Partitioning %s drops %s until it is unpartitioned", table, ', '.join(lost))
+        cursor.execute("SELECT obj_description(to_regclass(%s), 'pg_class')", [table])
+        comment = cursor.fetchone()[0]
+        cursor.execute(f"SELECT COALESCE(MAX({quote(pk)}), 0), MIN({quote(PARTITION_KEY)}) FROM {quote(table)}")
+        max_id, oldest = cursor.fetchone()
+
+        cursor.execute(f"ALTER TABLE {quote(table)} RENAME TO {quote(old)}")
+        # Columns with their NOT NULL and CHECK constraints; the only default is the id sequence, set below
+        partition_by = f" PARTITION BY RANGE ({quote(PARTITION_KEY)})" if partitioned else ''
+        cursor.execute(f"CREATE TABLE {quote(table)} (LIKE {quote(old)} INCLUDING CONSTRAINTS){partition_by}")
+        if partitioned:
+            now = timezone.now()
+            create_partitions(table, min(oldest or now, now), add_months(month_start(now), months_ahead))
+            cursor.execute(f"CREATE TABLE {quote(default_partition_name(table))} PARTITION OF {quote(table)} DEFAULT")
+        cursor.execute(f"INSERT INTO {quote(table)} SELECT * FROM {quote(old)}")
+        # Also drops the old partitions, the id sequence and the foreign keys referencing the table
+        cursor.execute(f"DROP TABLE {quote(old)} CASCADE")
+
+        sequence = f'{table}_{pk}_seq'
+        cursor.execute(f"CREATE SEQUENCE {quote(sequence)} OWNED BY {quote(table)}.{quote(pk)}")
+        cursor.execute(f"ALTER TABLE {quote(table)} ALTER COLUMN {quote(pk)} SET DEFAULT nextval(%s::regclass)",
+                       [sequence])
+        cursor.execute("SELECT setval(%s, %s, false)", [sequence, max_id + 1])
+
+        for name, definition, primary, unique in indexes:
+            if primary:
+                columns = f"{quote(pk)}, {quote(PARTITION_KEY)}" if partitioned else quote(pk)
+                cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} PRIMARY KEY ({columns})")
+                continue
+            definition = INDEX_TABLE_RE.sub(f' ON {quote(table)} USING ', definition, count=1)
+            if unique in (UNIQUE_INDEX, UNIQUE_CONSTRAINT):
+                kind = 'INDEX' if partitioned else 'UNIQUE INDEX'
+                definition = re.sub(r'^CREATE (UNIQUE )?INDEX', f'CREATE {kind}', definition)
+            cursor.execute(definition)
+            if partitioned and unique in (UNIQUE_INDEX, UNIQUE_CONSTRAINT):
+                cursor.execute(f"COMMENT ON INDEX {quote(name)} IS %s", [unique])
+            elif unique == UNIQUE_CONSTRAINT:
+                cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} "
+                               f"UNIQUE USING INDEX {quote(name)}")
+
+        for _, name, definition in foreign_keys:
+            cursor.execute(f"ALTER TABLE {quote(table)} ADD CONSTRAINT {quote(name)} {definition}")
+
+        if partitioned:
+            # A partitioned table cannot be referenced through its id alone: keep the definitions for later
+            cursor.execute(f"COMMENT ON TABLE {quote(table)} IS %s",
+                           [json.dumps({'referencing_foreign_keys': referencing})])
+        else:
+            for referencing_table, name, definition in _recorded_foreign_keys(comment):
+                cursor.execute(f"ALTER TABLE {referencing_table} ADD CONSTRAINT {quote(name)} {definition}")
+    logger.info("Rebuilt table %s %s", table, 'partitioned by month' if partitioned else 'without partitions')
+
+
+def _recorded_foreign_keys(comment: Optional[str]) -> List[List[str]]:
+    try:
+        return json.loads(comment)['referencing_foreign_keys']
+    except (TypeError, ValueError, KeyError):
+        return []
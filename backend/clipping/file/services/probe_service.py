@@ -0,0 +1,235 @@
+import logging
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Iterator, List, Optional, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+
+from .range_reader import R2RangeReader
+
+logger = logging.getLogger('my_logger')
+
+# Bytes fetched per Range GET: image headers fit in the first block, MP4 boxes take a few
+PROBE_BLOCK_SIZE = 64 * 1024
+
+# JPEG segments scanned for the frame header before giving up (EXIF thumbnails come first)
+MAX_JPEG_HEADER_BYTES = 1024 * 1024
+
+# Objects probed concurrently
+PROBE_WORKERS = 8
+
+# JPEG start-of-frame markers carrying the image size (all but DHT, JPG and DAC)
+JPEG_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+# EXIF orientations that rotate the image by 90 or 270 degrees
+ROTATED_ORIENTATIONS = {5, 6, 7, 8}
+
+EXIF_ORIENTATION_TAG = 0x0112
+
+# Probe result: (width, height, rotated), width and height as stored in the file,
+# `rotated` when they must be swapped for display
+Probe = Tuple[int, int, bool]
+
+
+def read_exact(f: BinaryIO, size: int) -> bytes:
+    """Read exactly `size` bytes. Raw readers may return short reads at block boundaries."""
+    data = b''
+    while len(data) < size:
+        chunk = f.read(size - len(data))
+        if not chunk:
+            raise ValueError("Unexpected end of data.")
+        data += chunk
+    return data
+
+
+def parse_exif_orientation(tiff: bytes) -> Optional[int]:
+    """Read the orientation tag from the IFD0 of a TIFF (EXIF) structure."""
+    if tiff[:2] == b'II':
+        endian = '<'
+    elif tiff[:2] == b'MM':
+        endian = '>'
+    else:
+        return None
+    ifd_offset = struct.unpack(endian + 'I', tiff[4:8])[0]
+    (count,) = struct.unpack(endian + 'H', tiff[ifd_offset:ifd_offset + 2])
+    for i in range(count):
+        entry = tiff[ifd_offset + 2 + 12 * i:ifd_offset + 14 + 12 * i]
+        if len(entry) < 12:
+            break
+        tag, = struct.unpack(endian + 'H', entry[:2])
+        if tag == EXIF_ORIENTATION_TAG:
+            return struct.unpack(endian + 'H', entry[8:10])[0]
+    return None
+
+
+def probe_jpeg(f: BinaryIO) -> Optional[Probe]:
+    """Walk the JPEG segments up to the frame header, reading the EXIF orientation on the way."""
+    f.seek(2)
+    orientation = None
+    while f.tell() < MAX_JPEG_HEADER_BYTES:
+        if read_exact(f, 1) != b'\xff':
+            return None
+        marker = read_exact(f, 1)[0]
+        while marker == 0xFF:  # Fill bytes
+            marker = read_exact(f, 1)[0]
+        if marker == 0x01 or 0xD0 <= marker <= 0xD8:  # Standalone markers
+            continue
+        if marker in (0xD9, 0xDA):  # End of image / start of scan: no frame header
+            return None
+
+        length, = struct.unpack('>H', read_exact(f, 2))
+        segment = read_exact(f, length - 2)
+        if marker == 0xE1 and segment[:6] == b'Exif\x00\x00':
+            orientation = parse_exif_orientation(segment[6:])
+        elif marker in JPEG_SOF_MARKERS:
+            height, width = struct.unpack('>HH', segment[1:5])
+            return width, height, orientation in ROTATED_ORIENTATIONS
+    return None
+
+
+def probe_webp(header: bytes) -> Optional[Probe]:
+    chunk = header[12:16]
+    if chunk == b'VP8 ' and header[23:26] == b'\x9d\x01\x2a':
+        width, height = struct.unpack('<HH', header[26:30])
+        return width & 0x3FFF, height & 0x3FFF, False
+    if chunk == b'VP8L' and header[20] == 0x2F:
+        bits = int.from_bytes(header[21:25], 'little')
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1, False
+    if chunk == b'VP8X':
+        width = int.from_bytes(header[24:27], 'little') + 1
+        height = int.from_bytes(header[27:30], 'little') + 1
+        return width, height, False
+    return None
+
+
+def iter_mp4_boxes(f: BinaryIO, start: int, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Yield (type, payload start, box end) of the boxes between `start` and `end`, reading only their headers."""
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        size, box_type = struct.unpack('>I4s', read_exact(f, 8))
+        header_size = 8
+        if size == 1:  # 64-bit size
+            size, = struct.unpack('>Q', read_exact(f, 8))
+            header_size = 16
+        elif size == 0:  # Box extends to the end
+            size = end - position
+        if size < header_size:
+            return
+        yield box_type, position + header_size, position + size
+        position += size
+
+
+def parse_tkhd(payload: bytes) -> Optional[Probe]:
+    """Read the presentation size and rotation of a track header box."""
+    offset = 52 if payload[0] == 1 else 40  # Matrix offset for versions 1 and 0
+    matrix = struct.unpack('>9i', payload[offset:offset + 36])
+    width, height = struct.unpack('>II', payload[offset + 36:offset + 44])
+    width, height = width >> 16, height >> 16
+    if not width or not height:  # Audio and other non-visual tracks
+        return None
+    a, b = matrix[0], matrix[1]
+    rotated = a == 0 and abs(b) == 1 << 16  # 90 or 270 degrees
+    return width, height, rotated
+
+
+def probe_mp4(f: BinaryIO, size: int) -> Optional[Probe]:
+    """Find the first visual track header in `moov`, wherever the box is in the file."""
+    for box_type, start, end in iter_mp4_boxes(f, 0, size):
+        if box_type != b'moov':
+            continue
+        for trak_type, trak_start, trak_end in iter_mp4_boxes(f, start, end):
+            if trak_type != b'trak':
+                continue
+            for child_type, child_start, child_end in iter_mp4_boxes(f, trak_start, trak_end):
+                if child_type == b'tkhd':
+                    f.seek(child_start)
+                    probe = parse_tkhd(read_exact(f, child_end - child_start))
+                    if probe:
+                        return probe
+        return None
+    return None
+
+
+def probe_stream(f: BinaryIO, size: int) -> Optional[Probe]:
+    """Detect the format from the magic bytes and read the dimensions. Returns None for unknown formats."""
+    f.seek(0)
+    header = read_exact(f, min(32, size))
+    if header[:2] == b'\xff\xd8':
+        return probe_jpeg(f)
+    if header[:8] == b'\x89PNG\r\n\x1a\n' and header[12:16] == b'IHDR':
+        width, height = struct.unpack('>II', header[16:24])
+        return width, height, False
+    if header[:6] in (b'GIF87a', b'GIF89a'):
+        width, height = struct.unpack('<HH', header[6:10])
+        return width, height, False
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return probe_webp(header)
+    if header[4:8] in (b'ftyp', b'moov', b'free', b'mdat', b'wide'):
+        return probe_mp4(f, size)
+    return None
+
+
+def display_size(probe: Probe) -> Tuple[int, int]:
+    width, height, rotated = probe
+    return (height, width) if rotated else (width, height)
+
+
+def probe_object(object_key: str, bucket_name: str) -> Optional[Tuple[int, int]]:
+    """Display (width, height) of a stored object, fetched with a few small Range GETs."""
+    try:
+        reader = R2RangeReader(object_key, bucket_name, block_size=PROBE_BLOCK_SIZE)
+        probe = probe_stream(reader, reader.size)
+    except Exception as e:
+        logger.error("Failed to probe %s: %s", object_key, e)
+        return None
+    if probe is None:
+        logger.info("Unrecognized format, cannot probe %s", object_key)
+        return None
+    logger.debug("Probed %s: %s with %d bytes", object_key, probe, reader.bytes_fetched)
+    return display_size(probe)
+
+
+def probe_files(files: List, workers: int = PROBE_WORKERS) -> List:
+    """
+    Probe the given files concurrently and save the dimensions found. Returns the updated files.
+    """
+    from ..models import File
+    from .cache_service import bump_collection_version
+
+    with ThreadPoolExecutor(workers) as pool:
+        sizes = list(pool.map(lambda file: probe_object(file.object_key, file.bucket_name), files))
+
+    updated = []
+    for file, size in zip(files, sizes):
+        if size is not None:
+            file.width, file.height = size
+            updated.append(file)
+    if updated:
+        with transaction.atomic():
+            File.objects.bulk_update(updated, ['width', 'height'])
+            bump_collection_version()
+    return updated
+
+
+_hook_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='probe')
+
+
+def schedule_probe(file_ids: List[int]) -> None:
+    """Probe newly created files without dimensions in the background, once the transaction commits."""
+    def run():
+        from django.db import close_old_connections
+        from ..models import File
+
+        try:
+            files = list(File.objects.filter(Q(width__isnull=True) | Q(height__isnull=True), file_id__in=file_ids))
+            if files:
+                probe_files(files)
+        except Exception as e:
+            logger.exception("Background probe of %s failed: %s", file_ids, e)
+        finally:
+            close_old_connections()
+
+    if file_ids:
+        transaction.on_commit(lambda: _hook_executor.submit(run))
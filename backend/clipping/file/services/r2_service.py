@@ -1,10 +1,12 @@
+import logging
 import time
-from typing import List, Dict, Optional, Tuple
+from typing import List, Dict, Iterator, Optional, Tuple
 
-import boto3
-from botocore.client import Config
 from django.conf import settings
 
+from .storage_backend import MAX_DELETE_BATCH_SIZE, get_storage_backend
+from .storage_router import route_upload
+
 # Credential
 TOKEN_VALUE = settings.TOKEN_VALUE
 ACCESS_KEY_ID = settings.ACCESS_KEY_ID
@@ -15,30 +17,50 @@ ACCOUNT_ID = settings.ACCOUNT_ID
 ENDPOINT_URL = settings.ENDPOINT_URL
 BUCKET_NAME = settings.BUCKET_NAME
 
+logger = logging.getLogger('my_logger')
+
 
 class R2Service:
+    """
+    Storage operations of the application, carried out by the backend selected with the STORAGE_BACKEND
+    setting (R2, or the local filesystem; see storage_backend).
+    """
     FILE_TYPE_MAP = {
         'image': 'image/jpeg',
         'video': 'video/mp4',
     }
 
-    # Configure the S3 client for Cloudflare R2 as a class attribute
-    s3_client = boto3.client(
-        's3',
-        endpoint_url=ENDPOINT_URL,
-        aws_access_key_id=ACCESS_KEY_ID,
-        aws_secret_access_key=SECRET_ACCESS_KEY,
-        config=Config(signature_version='s3v4')
-    )
+    # Content types clients may declare for uploads. Types a browser would render as a document
+    # (e.g. image/svg+xml, which can carry scripts) are not accepted.
+    ALLOWED_CONTENT_TYPES = frozenset({
+        'image/jpeg', 'image/png', 'image/gif', 'image/webp', 'image/avif', 'image/heic', 'image/heif',
+        'video/mp4', 'video/quicktime', 'video/webm', 'video/x-matroska', 'video/3gpp',
+    })
+
+    # Maximum number of keys accepted by a single DeleteObjects request
+    MAX_DELETE_BATCH_SIZE = MAX_DELETE_BATCH_SIZE
+
+    # Prefix of objects derived from uploaded files (e.g. video preview frames)
+    DERIVATIVES_PREFIX = 'derivatives/'
 
     @classmethod
-    def upload_file(cls, file_path: str, object_key: str) -> None:
+    def upload_file(cls, file_path: str, object_key: str, bucket_name: str = BUCKET_NAME) -> None:
         """Uploads a file to the specified bucket and object key."""
         try:
-            cls.s3_client.upload_file(file_path, BUCKET_NAME, object_key)
-            print(f"File {file_path} uploaded to {object_key}.")
+            get_storage_backend().upload_file(file_path, bucket_name, object_key)
+            logger.debug("File %s uploaded to %s.", file_path, object_key)
         except Exception as e:
-            print(f"Failed to upload {file_path} to {object_key}: {e}")
+            logger.error("Failed to upload %s to %s: %s", file_path, object_key, e)
+
+    @classmethod
+    def upload_large_file(cls, file_path: str, object_key: str, content_type: str, bucket_name: str = BUCKET_NAME,
+                          part_size: int = 16 * 1024 * 1024, max_concurrency: int = 4) -> None:
+        """
+        Uploads a local file with boto3's managed transfer: files above `part_size` are sent as a multipart
+        upload with `max_concurrency` parts in flight. Unlike `upload_file`, failures are raised.
+        """
+        get_storage_backend().upload_file(file_path, bucket_name, object_key, content_type, part_size,
+                                          max_concurrency)
 
     @classmethod
     def upload_files(cls, files: List[Dict[str, str]]) -> None:
@@ -50,13 +72,13 @@ class R2Service:
             cls.upload_file(file['file_path'], file['object_key'])
 
     @classmethod
-    def download_file(cls, object_key: str, file_path: str) -> None:
+    def download_file(cls, object_key: str, file_path: str, bucket_name: str = BUCKET_NAME) -> None:
         """Downloads a file from the specified bucket and object key."""
         try:
-            cls.s3_client.download_file(BUCKET_NAME, object_key, file_path)
-            print(f"File {object_key} downloaded to {file_path}.")
+            get_storage_backend().download_file(bucket_name, object_key, file_path)
+            logger.debug("File %s downloaded to %s.", object_key, file_path)
         except Exception as e:
-            print(f"Failed to download {object_key} to {file_path}: {e}")
+            logger.error("Failed to download %s to %s: %s", object_key, file_path, e)
 
     @classmethod
     def download_files(cls, files: List[Dict[str, str]]) -> None:
@@ -68,46 +90,159 @@ class R2Service:
             cls.download_file(file['object_key'], file['file_path'])
 
     @classmethod
-    def get_pre_signed_url(cls, object_key: str, file_type: str, expiration: int = 3600) -> Optional[
-        Tuple[str, str, str]]:
-        """Generates a pre-signed URL for the specified object key with a timestamp."""
+    def upload_bytes(cls, data: bytes, object_key: str, content_type: str, bucket_name: str = BUCKET_NAME) -> None:
+        """Uploads in-memory content to the specified bucket and object key."""
+        get_storage_backend().put_bytes(bucket_name, object_key, data, content_type)
+
+    @classmethod
+    def copy_object(cls, object_key: str, source_bucket: str, destination_bucket: str) -> None:
+        """
+        Copies an object to another bucket under the same key. On R2, buckets of one account are copied
+        server-side; across accounts the object is streamed through this process.
+        """
+        get_storage_backend().copy(object_key, source_bucket, destination_bucket)
+
+    @classmethod
+    def get_object_size(cls, object_key: str, bucket_name: str = BUCKET_NAME) -> int:
+        """Returns the size in bytes of the specified object."""
+        return get_storage_backend().head(bucket_name, object_key)
+
+    @classmethod
+    def get_object_range(cls, object_key: str, start: int, end: int, bucket_name: str = BUCKET_NAME) -> bytes:
+        """Reads bytes `start` to `end` (inclusive) of the specified object with an HTTP Range GET."""
+        return get_storage_backend().get_range(bucket_name, object_key, start, end)
+
+    @classmethod
+    def iter_objects(cls, prefix: str = '', bucket_name: str = BUCKET_NAME, page_size: int = 1000) -> Iterator[Dict]:
+        """
+        Lazily lists the objects of a bucket page by page with list_objects_v2.
+        Objects are yielded in ascending UTF-8 byte order of their keys, as returned by the API.
+
+        Yields:
+        dict: The object entries, each containing at least 'Key', 'Size' and 'LastModified'.
+        """
+        return get_storage_backend().iter_objects(bucket_name, prefix, page_size)
+
+    @classmethod
+    def delete_objects(cls, object_keys: List[str], bucket_name: str = BUCKET_NAME) -> Tuple[int, List[Dict[str, str]]]:
+        """
+        Deletes objects with DeleteObjects requests of at most MAX_DELETE_BATCH_SIZE keys each.
+
+        Returns:
+        tuple: The number of deleted objects and the list of per-key errors ({'Key', 'Code', 'Message'}).
+        """
+        return get_storage_backend().delete(bucket_name, object_keys)
+
+    @staticmethod
+    def normalize_key(key: str) -> str:
+        """Lower-cases the key and replaces characters outside [alnum-._/] with underscores."""
+        key = key.strip().lower()
+        key = ''.join(c if c.isalnum() or c in '-._/' else '_' for c in key)
+        if not key:
+            raise ValueError("Invalid object key.")
+        return key
+
+    @staticmethod
+    def make_unique_key(object_key: str) -> str:
+        """Appends the current timestamp to the key, before its extension."""
+        timestamp = int(time.time())
+        object_key_suffix = object_key.split('.')[-1]
+        return f"{''.join(object_key.split('.')[:-1])}_{timestamp}.{object_key_suffix}"
+
+    @classmethod
+    def resolve_content_type(cls, file_type: str, content_type: Optional[str] = None) -> str:
+        """
+        Uses the content type reported by the client if it is one of ALLOWED_CONTENT_TYPES,
+        otherwise falls back to the default of the file type.
+        """
+        content_type = (content_type or '').split(';')[0].strip().lower()
+        if content_type in cls.ALLOWED_CONTENT_TYPES:
+            return content_type
+        return cls.FILE_TYPE_MAP.get(file_type, 'application/octet-stream')
+
+    @classmethod
+    def get_pre_signed_url(cls, object_key: str, file_type: str, expiration: int = 3600,
+                           content_type: Optional[str] = None,
+                           bucket_name: str = BUCKET_NAME,
+                           checksum_sha256: Optional[str] = None) -> Optional[Tuple[str, str, str]]:
+        """
+        Generates a pre-signed URL for the specified object key with a timestamp. With `checksum_sha256`,
+        the upload is refused unless the content has that digest.
+        """
         try:
-            timestamp = int(time.time())
-            object_key_suffix = object_key.split('.')[-1]
-            key_with_timestamp = f"{''.join(object_key.split('.')[:-1])}_{timestamp}.{object_key_suffix}"
-
-            content_type = cls.FILE_TYPE_MAP.get(file_type, 'application/octet-stream')
-
-            pre_signed_url = cls.s3_client.generate_presigned_url(
-                'put_object',
-                Params={
-                    'Bucket': BUCKET_NAME,
-                    'Key': key_with_timestamp,
-                    'ContentType': content_type
-                },
-                ExpiresIn=expiration
-            )
+            key_with_timestamp = cls.make_unique_key(object_key)
+            content_type = cls.resolve_content_type(file_type, content_type)
+
+            pre_signed_url = get_storage_backend().presign_put(bucket_name, key_with_timestamp, content_type,
+                                                               expiration, checksum_sha256)
             return pre_signed_url, key_with_timestamp, content_type
         except Exception as e:
-            print(f"Failed to generate pre-signed URL for {object_key}: {e}")
+            logger.error("Failed to generate pre-signed URL for %s: %s", object_key, e)
             return None
 
     @classmethod
-    def get_pre_signed_urls(cls, objects: List[dict], expiration: int = 3600) -> List[Dict[str, Optional[str]]]:
-        """Generates pre-signed URLs for a list of object keys, ensuring unique keys."""
+    def create_multipart_upload(cls, object_key: str, file_type: str, content_type: Optional[str] = None,
+                                bucket_name: str = BUCKET_NAME) -> Tuple[str, str, str]:
+        """
+        Starts a multipart upload for the specified object key with a timestamp.
 
-        def preprocess_key(key: str) -> str:
-            key = key.strip().lower()
-            key = ''.join(c if c.isalnum() or c in '-._/' else '_' for c in key)
-            if not key:
-                raise ValueError("Invalid object key.")
-            return key
+        Returns:
+        tuple: The upload ID, the unique object key and the content type.
+        """
+        key_with_timestamp = cls.make_unique_key(cls.normalize_key(object_key))
+        content_type = cls.resolve_content_type(file_type, content_type)
+        upload_id = get_storage_backend().create_multipart_upload(bucket_name, key_with_timestamp, content_type)
+        return upload_id, key_with_timestamp, content_type
 
+    @classmethod
+    def get_pre_signed_part_urls(cls, object_key: str, upload_id: str, part_numbers: List[int],
+                                 expiration: int = 3600, bucket_name: str = BUCKET_NAME) -> List[Dict]:
+        """Generates pre-signed PUT URLs for the given parts of a multipart upload."""
+        backend = get_storage_backend()
+        return [
+            {
+                'part_number': part_number,
+                'pre_signed_url': backend.presign_upload_part(bucket_name, object_key, upload_id, part_number,
+                                                              expiration)
+            }
+            for part_number in part_numbers
+        ]
+
+    @classmethod
+    def complete_multipart_upload(cls, object_key: str, upload_id: str, parts: List[Dict],
+                                  bucket_name: str = BUCKET_NAME) -> None:
+        """
+        Completes a multipart upload.
+
+        Parameters:
+        parts (list of dict): The uploaded parts, each containing 'part_number' and 'etag'.
+        """
+        get_storage_backend().complete_multipart_upload(bucket_name, object_key, upload_id, parts)
+
+    @classmethod
+    def abort_multipart_upload(cls, object_key: str, upload_id: str, bucket_name: str = BUCKET_NAME) -> None:
+        """Aborts a multipart upload, releasing the parts uploaded so far."""
+        get_storage_backend().abort_multipart_upload(bucket_name, object_key, upload_id)
+
+    @classmethod
+    def iter_multipart_uploads(cls, bucket_name: str = BUCKET_NAME) -> Iterator[Dict]:
+        """Lazily lists the in-progress multipart uploads of a bucket ({'Key', 'UploadId', 'Initiated', ...})."""
+        return get_storage_backend().iter_multipart_uploads(bucket_name)
+
+    @classmethod
+    def get_pre_signed_urls(cls, objects: List[dict], expiration: int = 3600,
+                            user_id: Optional[int] = None) -> List[Dict[str, Optional[str]]]:
+        """
+        Generates pre-signed URLs for a list of object keys, ensuring unique keys.
+        Each object is routed to its bucket (see storage_router.route_upload), returned as `bucket_name`.
+        Objects with a `sha256` get URLs bound to that digest; `upload_headers` lists the headers the
+        client must send with the PUT.
+        """
         pre_signed_urls = []
         key_count = {}
 
         for _object in objects:
-            processed_key = preprocess_key(_object['object_key'])
+            processed_key = cls.normalize_key(_object['object_key'])
             file_type = _object['file_type']
 
             if processed_key in key_count:
@@ -117,43 +252,47 @@ class R2Service:
                 key_count[processed_key] = 0
                 new_key = processed_key
 
-            pre_signed_url, unique_object_key, content_type = cls.get_pre_signed_url(new_key, file_type, expiration)
+            bucket_name = route_upload(new_key, file_type, user_id)
+            checksum_sha256 = _object.get('sha256')
+            pre_signed_url, unique_object_key, content_type = cls.get_pre_signed_url(
+                new_key, file_type, expiration, _object.get('content_type'), bucket_name, checksum_sha256
+            )
+            upload_headers = {'Content-Type': content_type}
+            if checksum_sha256:
+                upload_headers.update(get_storage_backend().checksum_headers(checksum_sha256))
 
             pre_signed_urls.append(
                 {
                     "original_object_key": _object['object_key'],
                     "unique_object_key": unique_object_key,
                     "pre_signed_url": pre_signed_url,
-                    "content_type": content_type
+                    "content_type": content_type,
+                    "upload_headers": upload_headers,
+                    "bucket_name": bucket_name
                 }
             )
 
         return pre_signed_urls
 
     @classmethod
-    def generate_public_url(cls, object_key: str, expiration: int = 3600) -> Optional[str]:
+    def generate_public_url(cls, object_key: str, expiration: int = 3600,
+                            bucket_name: str = BUCKET_NAME) -> Optional[str]:
         """
         Generates a public URL for the specified object key with a timestamp.
 
         Parameters:
         object_key (str): The key of the object to generate the URL for.
         expiration (int): Time in seconds for the URL to remain valid. Default is 3600 seconds (1 hour).
+        bucket_name (str): The bucket holding the object.
 
         Returns:
         str: The pre-signed URL or None if an error occurred.
         """
         try:
-            pre_signed_url = cls.s3_client.generate_presigned_url(
-                'get_object',
-                Params={
-                    'Bucket': BUCKET_NAME,
-                    'Key': object_key,
-                },
-                ExpiresIn=expiration
-            )
+            pre_signed_url = get_storage_backend().presign_get(bucket_name, object_key, expiration)
             return pre_signed_url
         except Exception as e:
-            print(f"Failed to generate public URL for {object_key}: {e}")
+            logger.error("Failed to generate public URL for %s: %s", object_key, e)
             return None
 
 
@@ -0,0 +1,71 @@
+import io
+from collections import OrderedDict
+
+from .r2_service import R2Service, BUCKET_NAME
+
+RANGE_BLOCK_SIZE = 1024 * 1024  # Bytes fetched per Range GET
+RANGE_CACHE_BLOCKS = 16  # Blocks kept in memory, the demuxer re-reads headers and index often
+
+
+class R2RangeReader(io.RawIOBase):
+    """
+    Seekable, read-only file object over an R2 object. Data is fetched lazily with HTTP Range GETs
+    in blocks of RANGE_BLOCK_SIZE, so demuxers only download the parts of the file they actually read.
+    """
+
+    def __init__(self, object_key: str, bucket_name: str = BUCKET_NAME, block_size: int = RANGE_BLOCK_SIZE):
+        super().__init__()
+        self.object_key = object_key
+        self.bucket_name = bucket_name
+        self.block_size = block_size
+        self.size = R2Service.get_object_size(object_key, bucket_name)
+        self.position = 0
+        self.bytes_fetched = 0
+        self.blocks = OrderedDict()
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+        self.position = max(0, position)
+        return self.position
+
+    def readinto(self, buffer):
+        if self.position >= self.size:
+            return 0
+
+        index, offset = divmod(self.position, self.block_size)
+        block = self._get_block(index)
+        length = min(len(buffer), len(block) - offset)
+        buffer[:length] = block[offset:offset + length]
+        self.position += length
+        return length
+
+    def _get_block(self, index: int) -> bytes:
+        if index in self.blocks:
+            self.blocks.move_to_end(index)
+            return self.blocks[index]
+
+        start = index * self.block_size
+        end = min(start + self.block_size, self.size) - 1
+        block = R2Service.get_object_range(self.object_key, start, end, self.bucket_name)
+        self.bytes_fetched += len(block)
+
+        self.blocks[index] = block
+        if len(self.blocks) > RANGE_CACHE_BLOCKS:
+            self.blocks.popitem(last=False)
+        return block
@@ -0,0 +1,104 @@
+from itertools import chain
+from typing import Dict, Iterator, Optional, Tuple
+
+from django.db import connection
+from django.db.models.functions import Collate
+
+from ..models import File
+from .r2_service import R2Service
+
+ORPHAN_OBJECT = 'orphan_object'  # Object in the bucket without any File row
+MISSING_OBJECT = 'missing_object'  # File row pointing at an object that is not in the bucket
+MISSING_DERIVATIVE = 'missing_derivative'  # Preview frame of a File row that is not in the bucket
+
+# Preview frame keys of the File rows, with the "C" collation of iter_file_rows
+DERIVATIVE_ROWS_SQL = (
+    'SELECT file_id, frame_key FROM file, unnest(preview_frame_keys) AS frame_key '
+    'WHERE bucket_name = %s AND starts_with(frame_key, %s) ORDER BY frame_key COLLATE "C"'
+)
+
+
+def merge_diff(objects: Iterator[Dict], rows: Iterator[Tuple[int, str]]) -> Iterator[Tuple[str, Dict]]:
+    """
+    Merge-diffs two streams sorted ascending by key: bucket objects ({'Key', 'Size', ...}) and
+    File rows ((file_id, object_key)). Only the current element of each stream is held in memory.
+
+    Several rows may reference the same object; none of them is reported as long as the object exists.
+
+    Yields:
+    tuple: (ORPHAN_OBJECT, object entry) or (MISSING_OBJECT, {'file_id', 'Key'}).
+    """
+    obj = next(objects, None)
+    row = next(rows, None)
+    obj_matched = False
+
+    while obj is not None or row is not None:
+        if row is None or (obj is not None and obj['Key'] < row[1]):
+            if not obj_matched:
+                yield ORPHAN_OBJECT, obj
+            obj, obj_matched = next(objects, None), False
+        elif obj is None or row[1] < obj['Key']:
+            yield MISSING_OBJECT, {'file_id': row[0], 'Key': row[1]}
+            row = next(rows, None)
+        else:
+            # Keep the object, another row may reference the same key
+            obj_matched = True
+            row = next(rows, None)
+
+
+def iter_file_rows(bucket_name: str, prefix: str = '', chunk_size: int = 2000) -> Iterator[Tuple[int, str]]:
+    """
+    Streams (file_id, object_key) of the bucket's File rows with a server-side cursor, sorted with the
+    "C" collation so the order matches the byte order of list_objects_v2.
+    """
+    queryset = File.objects.filter(bucket_name=bucket_name)
+    if prefix:
+        queryset = queryset.filter(object_key__startswith=prefix)
+    return queryset.order_by(Collate('object_key', 'C')).values_list('file_id', 'object_key').iterator(
+        chunk_size=chunk_size
+    )
+
+
+def iter_derivative_rows(bucket_name: str, prefix: str, chunk_size: int = 2000) -> Iterator[Tuple[int, str]]:
+    """Streams (file_id, frame key) of the preview frames referenced by the bucket's File rows, in key order."""
+    with connection.chunked_cursor() as cursor:
+        cursor.execute(DERIVATIVE_ROWS_SQL, [bucket_name, prefix])
+        while rows := cursor.fetchmany(chunk_size):
+            yield from rows
+
+
+def derivatives_prefix(prefix: str) -> Optional[str]:
+    """The part of the derivatives range covered by `prefix`, None if it covers none of it."""
+    if prefix.startswith(R2Service.DERIVATIVES_PREFIX):
+        return prefix
+    if R2Service.DERIVATIVES_PREFIX.startswith(prefix):
+        return R2Service.DERIVATIVES_PREFIX
+    return None
+
+
+def reconcile(bucket_name: str, prefix: str = '', chunk_size: int = 2000) -> Iterator[Tuple[str, Dict]]:
+    """
+    Streams the differences between the bucket's objects and the File rows referencing it.
+    Derivative objects (video preview frames) are not File rows: they are diffed separately against the
+    `preview_frame_keys` of the rows, reporting unreferenced frames as orphans and lost ones as
+    MISSING_DERIVATIVE.
+    """
+    page_size = min(chunk_size, 1000)
+    media_diff = iter(())
+    if not prefix.startswith(R2Service.DERIVATIVES_PREFIX):
+        objects = (
+            obj for obj in R2Service.iter_objects(prefix=prefix, bucket_name=bucket_name, page_size=page_size)
+            if not obj['Key'].startswith(R2Service.DERIVATIVES_PREFIX)
+        )
+        media_diff = merge_diff(objects, iter_file_rows(bucket_name, prefix=prefix, chunk_size=chunk_size))
+
+    frames_prefix = derivatives_prefix(prefix)
+    derivative_diff = iter(())
+    if frames_prefix is not None:
+        derivative_diff = (
+            (MISSING_DERIVATIVE if kind == MISSING_OBJECT else kind, entry) for kind, entry in merge_diff(
+                R2Service.iter_objects(prefix=frames_prefix, bucket_name=bucket_name, page_size=page_size),
+                iter_derivative_rows(bucket_name, frames_prefix, chunk_size=chunk_size)
+            )
+        )
+    return chain(media_diff, derivative_diff)
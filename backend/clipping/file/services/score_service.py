@@ -0,0 +1,103 @@
+import logging
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+logger = logging.getLogger('my_logger')
+
+# Scores below this after a decay are dropped, the file leaves the trending feed
+MIN_SCORE = 1e-3
+
+# Score rows decayed per transaction
+DECAY_CHUNK_SIZE = 10000
+
+# The stored score is as of the last decay of the row: decay it to now before adding the fresh weight
+ADD_SQL = (
+    "INSERT INTO file_score (file_id, score, decayed_datetime) VALUES (%s, %s, %s) "
+    "ON CONFLICT (file_id) DO UPDATE SET score = file_score.score * power(0.5, "
+    "GREATEST(EXTRACT(EPOCH FROM EXCLUDED.decayed_datetime - file_score.decayed_datetime), 0) / %s) "
+    "+ EXCLUDED.score, "
+    "decayed_datetime = GREATEST(file_score.decayed_datetime, EXCLUDED.decayed_datetime)"
+)
+
+# The removed interaction contributed its weight decayed from its creation to the last decay of the row
+REMOVE_SQL = (
+    "UPDATE file_score SET score = GREATEST(score - %s * power(0.5, "
+    "GREATEST(EXTRACT(EPOCH FROM decayed_datetime - %s), 0) / %s), 0) "
+    "WHERE file_id = %s"
+)
+
+DECAY_SQL = (
+    "UPDATE file_score SET score = score * power(0.5, EXTRACT(EPOCH FROM %s - decayed_datetime) / %s), "
+    "decayed_datetime = %s "
+    "WHERE file_id > %s AND file_id <= %s"
+)
+
+REBUILD_SQL = (
+    "INSERT INTO file_score (file_id, score, decayed_datetime) "
+    "SELECT file_id, SUM(CASE interaction_type {weights} ELSE 0 END "
+    "                * power(0.5, EXTRACT(EPOCH FROM %s - created_datetime) / %s)), %s "
+    "FROM file_interaction GROUP BY file_id"
+)
+
+
+def half_life_seconds() -> float:
+    return settings.TRENDING_HALF_LIFE_HOURS * 3600
+
+
+def get_weight(interaction_type: str) -> float:
+    return settings.TRENDING_WEIGHTS.get(interaction_type, 0.0)
+
+
+def add_interaction(file_id: int, interaction_type: str, now: Optional[datetime] = None) -> None:
+    """Add the weight of a new interaction to the score of its file."""
+    weight = get_weight(interaction_type)
+    if weight:
+        with connection.cursor() as cursor:
+            cursor.execute(ADD_SQL, [file_id, weight, now or timezone.now(), half_life_seconds()])
+
+
+def remove_interaction(file_id: int, interaction_type: str, created_datetime: datetime) -> None:
+    """Subtract what a deleted interaction still contributes to the score of its file."""
+    weight = get_weight(interaction_type)
+    if weight:
+        with connection.cursor() as cursor:
+            cursor.execute(REMOVE_SQL, [weight, created_datetime, half_life_seconds(), file_id])
+
+
+def decay_scores(now: Optional[datetime] = None) -> Tuple[int, int]:
+    """
+    Scale every score by 0.5 ** (elapsed / half-life) since its last decay, in primary key chunks so no
+    transaction holds many row locks, then drop negligible scores. Returns (rows decayed, rows dropped).
+    """
+    now = now or timezone.now()
+    decayed = 0
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT COALESCE(MAX(file_id), 0) FROM file_score")
+        max_id = cursor.fetchone()[0]
+        for start in range(0, max_id, DECAY_CHUNK_SIZE):
+            with transaction.atomic():
+                cursor.execute(DECAY_SQL, [now, half_life_seconds(), now, start, start + DECAY_CHUNK_SIZE])
+                decayed += cursor.rowcount
+        cursor.execute("DELETE FROM file_score WHERE score < %s", [MIN_SCORE])
+        dropped = cursor.rowcount
+    logger.info("Decayed %d trending score(s), dropped %d", decayed, dropped)
+    return decayed, dropped
+
+
+def rebuild_scores(now: Optional[datetime] = None) -> int:
+    """Recompute every score from the interaction table. Returns the number of scored files."""
+    now = now or timezone.now()
+    weights = ' '.join(f"WHEN %s THEN {float(weight)!r}" for weight in settings.TRENDING_WEIGHTS.values())
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute("LOCK TABLE file_score IN EXCLUSIVE MODE")
+        cursor.execute("DELETE FROM file_score")
+        cursor.execute(REBUILD_SQL.format(weights=weights),
+                       [*settings.TRENDING_WEIGHTS, now, half_life_seconds(), now])
+        count = cursor.rowcount
+        cursor.execute("DELETE FROM file_score WHERE score < %s", [MIN_SCORE])
+    logger.info("Rebuilt trending scores of %d file(s)", count)
+    return count
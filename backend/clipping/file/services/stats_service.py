@@ -0,0 +1,106 @@
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable
+
+from django.db import connection, transaction
+
+logger = logging.getLogger('my_logger')
+
+STAT_FIELDS = ('file_count', 'storage_bytes', 'likes_received')
+
+# Adds deltas to a user's counters, creating the row on first use
+UPSERT_SQL = (
+    "INSERT INTO user_file_stats (user_id, file_count, storage_bytes, likes_received, updated_datetime) "
+    "VALUES (%s, %s, %s, %s, now()) "
+    "ON CONFLICT (user_id) DO UPDATE SET "
+    "file_count = user_file_stats.file_count + EXCLUDED.file_count, "
+    "storage_bytes = user_file_stats.storage_bytes + EXCLUDED.storage_bytes, "
+    "likes_received = user_file_stats.likes_received + EXCLUDED.likes_received, "
+    "updated_datetime = EXCLUDED.updated_datetime"
+)
+
+# Same, for the owner of a file, resolved in the statement itself
+UPSERT_FILE_OWNER_SQL = (
+    "INSERT INTO user_file_stats (user_id, file_count, storage_bytes, likes_received, updated_datetime) "
+    "SELECT user_id, 0, 0, %s, now() FROM file WHERE file_id = %s AND user_id IS NOT NULL "
+    "ON CONFLICT (user_id) DO UPDATE SET "
+    "likes_received = user_file_stats.likes_received + EXCLUDED.likes_received, "
+    "updated_datetime = EXCLUDED.updated_datetime"
+)
+
+# Aggregates of the given files per owner, computed before they are deleted
+FILES_BY_OWNER_SQL = (
+    "SELECT f.user_id, COUNT(*), COALESCE(SUM(f.size_bytes), 0), COALESCE(SUM(l.likes), 0) "
+    "FROM file f "
+    "LEFT JOIN (SELECT file_id, COUNT(*) AS likes FROM file_interaction "
+    "           WHERE file_id = ANY(%s) AND interaction_type = 'like' GROUP BY file_id) l "
+    "ON l.file_id = f.file_id "
+    "WHERE f.file_id = ANY(%s) AND f.user_id IS NOT NULL "
+    "GROUP BY f.user_id"
+)
+
+REBUILD_SQL = (
+    "INSERT INTO user_file_stats (user_id, file_count, storage_bytes, likes_received, updated_datetime) "
+    "SELECT f.user_id, COUNT(*), COALESCE(SUM(f.size_bytes), 0), COALESCE(SUM(l.likes), 0), now() "
+    "FROM file f "
+    "LEFT JOIN (SELECT file_id, COUNT(*) AS likes FROM file_interaction "
+    "           WHERE interaction_type = 'like' GROUP BY file_id) l "
+    "ON l.file_id = f.file_id "
+    "WHERE f.user_id IS NOT NULL "
+    "GROUP BY f.user_id"
+)
+
+
+def new_deltas() -> Dict[int, Dict[str, int]]:
+    """Per-user delta accumulator, e.g. `deltas[user_id]['file_count'] += 1`."""
+    return defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+
+
+def apply_user_deltas(deltas: Dict[int, Dict[str, int]]) -> None:
+    """Add the accumulated deltas to the counters of each user, in one round trip."""
+    rows = [
+        [user_id, *(delta[field] for field in STAT_FIELDS)]
+        for user_id, delta in deltas.items()
+        if user_id is not None and any(delta.values())
+    ]
+    if rows:
+        with connection.cursor() as cursor:
+            cursor.executemany(UPSERT_SQL, rows)
+
+
+def apply_file_deltas(files: Iterable, sign: int = 1) -> None:
+    """Count files (objects with user_id and size_bytes) in, or out with sign=-1, of their owners' counters."""
+    deltas = new_deltas()
+    for file in files:
+        deltas[file.user_id]['file_count'] += sign
+        deltas[file.user_id]['storage_bytes'] += sign * (file.size_bytes or 0)
+    apply_user_deltas(deltas)
+
+
+def apply_like_delta(file_id: int, delta: int) -> None:
+    """Add `delta` likes to the counters of the owner of the file."""
+    with connection.cursor() as cursor:
+        cursor.execute(UPSERT_FILE_OWNER_SQL, [delta, file_id])
+
+
+def subtract_deleted_files(cursor, file_ids) -> None:
+    """
+    Remove files about to be deleted (and the likes they received) from their owners' counters.
+    Must run in the deleting transaction, before the rows are gone.
+    """
+    cursor.execute(FILES_BY_OWNER_SQL, [file_ids, file_ids])
+    rows = [[user_id, -count, -size, -likes] for user_id, count, size, likes in cursor.fetchall()]
+    if rows:
+        cursor.executemany(UPSERT_SQL, rows)
+
+
+def rebuild_user_stats() -> int:
+    """Recompute every user's counters from the file and interaction tables. Returns the number of users."""
+    with transaction.atomic(), connection.cursor() as cursor:
+        # Block concurrent increments so none is lost between the delete and the insert
+        cursor.execute("LOCK TABLE user_file_stats IN EXCLUSIVE MODE")
+        cursor.execute("DELETE FROM user_file_stats")
+        cursor.execute(REBUILD_SQL)
+        count = cursor.rowcount
+    logger.info("Rebuilt file stats of %d user(s)", count)
+    return count
@@ -0,0 +1,476 @@
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import datetime, timezone as dt_timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+from django.conf import settings
+
+from .storage_router import get_client, same_target
+
+logger = logging.getLogger('my_logger')
+
+# Maximum number of keys accepted by a single DeleteObjects request
+MAX_DELETE_BATCH_SIZE = 1000
+
+# Bytes copied per read when streaming objects to and from disk
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+def iter_chunks(stream: BinaryIO) -> Iterator[bytes]:
+    while chunk := stream.read(COPY_CHUNK_SIZE):
+        yield chunk
+
+
+def iter_files(paths: Iterable[Path]) -> Iterator[bytes]:
+    """Contents of the files one after the other, in chunks."""
+    for path in paths:
+        with open(path, 'rb') as f:
+            yield from iter_chunks(f)
+
+
+def iter_file_range(path: Path, start: int, length: int) -> Iterator[bytes]:
+    """`length` bytes of the file from `start`, in chunks."""
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(COPY_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def checksum_base64(sha256_hex: str) -> str:
+    """The base64 form of a hex SHA-256 digest, as used by the x-amz-checksum-sha256 header."""
+    return base64.b64encode(bytes.fromhex(sha256_hex)).decode('ascii')
+
+
+class ChecksumMismatch(ValueError):
+    """The content written does not have the SHA-256 digest the upload was signed for."""
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Parses a single-range `Range` header into (start, end), both inclusive. Returns None for headers that
+    should be ignored (other units, several ranges, malformed) and raises ValueError if the range cannot
+    be satisfied.
+    """
+    unit, _, spec = header.partition('=')
+    if unit.strip() != 'bytes' or ',' in spec or '-' not in spec:
+        return None
+    first, _, last = spec.strip().partition('-')
+    if not (first or last) or not all(part.isdigit() for part in (first, last) if part):
+        return None
+    if not first:  # Suffix range: the last `last` bytes
+        if int(last) == 0 or size == 0:
+            raise ValueError("Range not satisfiable.")
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        raise ValueError("Range not satisfiable.")
+    return start, end
+
+
+class StorageBackend(ABC):
+    """
+    Object storage operations used by the application. Keys are addressed by (bucket, key) and
+    presigned URLs let clients upload and download without going through the API.
+    """
+
+    @abstractmethod
+    def presign_put(self, bucket_name: str, object_key: str, content_type: str, expiration: int,
+                    checksum_sha256: Optional[str] = None) -> str:
+        """
+        A URL to upload the object with PUT. With `checksum_sha256` (hex), the storage refuses content with
+        another digest; the client must then also send the `checksum_headers`.
+        """
+
+    @abstractmethod
+    def checksum_headers(self, checksum_sha256: str) -> Dict[str, str]:
+        """Headers a client must send to a URL presigned with `checksum_sha256`."""
+
+    @abstractmethod
+    def presign_get(self, bucket_name: str, object_key: str, expiration: int) -> str:
+        ...
+
+    @abstractmethod
+    def upload_file(self, file_path: str, bucket_name: str, object_key: str, content_type: Optional[str] = None,
+                    part_size: int = 16 * 1024 * 1024, max_concurrency: int = 4) -> None:
+        ...
+
+    @abstractmethod
+    def download_file(self, bucket_name: str, object_key: str, file_path: str) -> None:
+        ...
+
+    @abstractmethod
+    def put_bytes(self, bucket_name: str, object_key: str, data: bytes, content_type: str) -> None:
+        ...
+
+    @abstractmethod
+    def head(self, bucket_name: str, object_key: str) -> int:
+        """Size of the object in bytes."""
+
+    @abstractmethod
+    def get_range(self, bucket_name: str, object_key: str, start: int, end: int) -> bytes:
+        """Bytes `start` to `end` (inclusive) of the object."""
+
+    @abstractmethod
+    def copy(self, object_key: str, source_bucket: str, destination_bucket: str) -> None:
+        ...
+
+    @abstractmethod
+    def delete(self, bucket_name: str, object_keys: List[str]) -> Tuple[int, List[Dict[str, str]]]:
+        """Deletes the objects. Returns the number deleted and the per-key errors ({'Key', 'Code', 'Message'})."""
+
+    @abstractmethod
+    def iter_objects(self, bucket_name: str, prefix: str = '', page_size: int = 1000) -> Iterator[Dict]:
+        """Objects ({'Key', 'Size', 'LastModified'}) in ascending key order."""
+
+    @abstractmethod
+    def create_multipart_upload(self, bucket_name: str, object_key: str, content_type: str) -> str:
+        """Starts a multipart upload and returns its ID."""
+
+    @abstractmethod
+    def presign_upload_part(self, bucket_name: str, object_key: str, upload_id: str, part_number: int,
+                            expiration: int) -> str:
+        ...
+
+    @abstractmethod
+    def complete_multipart_upload(self, bucket_name: str, object_key: str, upload_id: str,
+                                  parts: List[Dict]) -> None:
+        ...
+
+    @abstractmethod
+    def abort_multipart_upload(self, bucket_name: str, object_key: str, upload_id: str) -> None:
+        ...
+
+    @abstractmethod
+    def iter_multipart_uploads(self, bucket_name: str) -> Iterator[Dict]:
+        """In-progress multipart uploads ({'Key', 'UploadId', 'Initiated'})."""
+
+
+class R2Backend(StorageBackend):
+    """Cloudflare R2 (or any S3-compatible service) through boto3, with clients chosen by the storage router."""
+
+    def presign_put(self, bucket_name, object_key, content_type, expiration, checksum_sha256=None):
+        params = {'Bucket': bucket_name, 'Key': object_key, 'ContentType': content_type}
+        if checksum_sha256:
+            # Signed: R2 rejects a body with another digest (BadDigest)
+            params['ChecksumSHA256'] = checksum_base64(checksum_sha256)
+        return get_client(bucket_name).generate_presigned_url('put_object', Params=params, ExpiresIn=expiration)
+
+    def checksum_headers(self, checksum_sha256):
+        return {'x-amz-checksum-sha256': checksum_base64(checksum_sha256)}
+
+    def presign_get(self, bucket_name, object_key, expiration):
+        return get_client(bucket_name).generate_presigned_url(
+            'get_object', Params={'Bucket': bucket_name, 'Key': object_key}, ExpiresIn=expiration
+        )
+
+    def upload_file(self, file_path, bucket_name, object_key, content_type=None,
+                    part_size=16 * 1024 * 1024, max_concurrency=4):
+        from boto3.s3.transfer import TransferConfig
+
+        config = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size,
+                                max_concurrency=max_concurrency)
+        get_client(bucket_name).upload_file(file_path, bucket_name, object_key,
+                                            ExtraArgs={'ContentType': content_type} if content_type else None,
+                                            Config=config)
+
+    def download_file(self, bucket_name, object_key, file_path):
+        get_client(bucket_name).download_file(bucket_name, object_key, file_path)
+
+    def put_bytes(self, bucket_name, object_key, data, content_type):
+        get_client(bucket_name).put_object(Bucket=bucket_name, Key=object_key, Body=data, ContentType=content_type)
+
+    def head(self, bucket_name, object_key):
+        return get_client(bucket_name).head_object(Bucket=bucket_name, Key=object_key)['ContentLength']
+
+    def get_range(self, bucket_name, object_key, start, end):
+        response = get_client(bucket_name).get_object(Bucket=bucket_name, Key=object_key,
+                                                      Range=f'bytes={start}-{end}')
+        return response['Body'].read()
+
+    def copy(self, object_key, source_bucket, destination_bucket, part_size=64 * 1024 * 1024):
+        from boto3.s3.transfer import TransferConfig
+
+        config = TransferConfig(multipart_threshold=part_size, multipart_chunksize=part_size)
+        destination = get_client(destination_bucket)
+        if same_target(source_bucket, destination_bucket):
+            # Server-side copy, multipart above `part_size`
+            destination.copy({'Bucket': source_bucket, 'Key': object_key}, destination_bucket, object_key,
+                             Config=config)
+            return
+        # Across accounts the object is streamed through this process
+        source = get_client(source_bucket).get_object(Bucket=source_bucket, Key=object_key)
+        destination.upload_fileobj(source['Body'], destination_bucket, object_key,
+                                   ExtraArgs={'ContentType': source.get('ContentType', 'application/octet-stream')},
+                                   Config=config)
+
+    def delete(self, bucket_name, object_keys):
+        deleted, errors = 0, []
+        for start in range(0, len(object_keys), MAX_DELETE_BATCH_SIZE):
+            batch = object_keys[start:start + MAX_DELETE_BATCH_SIZE]
+            try:
+                response = get_client(bucket_name).delete_objects(
+                    Bucket=bucket_name,
+                    Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+                )
+                batch_errors = response.get('Errors', [])
+                errors.extend(batch_errors)
+                deleted += len(batch) - len(batch_errors)
+            except Exception as e:
+                logger.error("Failed to delete %d objects from %s: %s", len(batch), bucket_name, e)
+                errors.extend({'Key': key, 'Code': 'RequestFailed', 'Message': str(e)} for key in batch)
+        return deleted, errors
+
+    def iter_objects(self, bucket_name, prefix='', page_size=1000):
+        paginator = get_client(bucket_name).get_paginator('list_objects_v2')
+        pages = paginator.paginate(Bucket=bucket_name, Prefix=prefix, PaginationConfig={'PageSize': page_size})
+        for page in pages:
+            yield from page.get('Contents', [])
+
+    def create_multipart_upload(self, bucket_name, object_key, content_type):
+        response = get_client(bucket_name).create_multipart_upload(
+            Bucket=bucket_name, Key=object_key, ContentType=content_type
+        )
+        return response['UploadId']
+
+    def presign_upload_part(self, bucket_name, object_key, upload_id, part_number, expiration):
+        return get_client(bucket_name).generate_presigned_url(
+            'upload_part',
+            Params={'Bucket': bucket_name, 'Key': object_key, 'UploadId': upload_id, 'PartNumber': part_number},
+            ExpiresIn=expiration
+        )
+
+    def complete_multipart_upload(self, bucket_name, object_key, upload_id, parts):
+        get_client(bucket_name).complete_multipart_upload(
+            Bucket=bucket_name,
+            Key=object_key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': [
+                {'PartNumber': part['part_number'], 'ETag': part['etag']}
+                for part in sorted(parts, key=lambda part: part['part_number'])
+            ]}
+        )
+
+    def abort_multipart_upload(self, bucket_name, object_key, upload_id):
+        get_client(bucket_name).abort_multipart_upload(Bucket=bucket_name, Key=object_key, UploadId=upload_id)
+
+    def iter_multipart_uploads(self, bucket_name):
+        paginator = get_client(bucket_name).get_paginator('list_multipart_uploads')
+        for page in paginator.paginate(Bucket=bucket_name):
+            yield from page.get('Uploads', [])
+
+
+def sign_local_url(method: str, bucket_name: str, object_key: str, expires: int, upload_id: str = '',
+                   part_number: int = 0, checksum_sha256: str = '') -> str:
+    message = '\n'.join([method, bucket_name, object_key, str(expires), upload_id, str(part_number),
+                         checksum_sha256])
+    return hmac.new(settings.LOCAL_STORAGE_SECRET.encode('utf-8'), message.encode('utf-8'),
+                    hashlib.sha256).hexdigest()
+
+
+def verify_local_url(method: str, bucket_name: str, object_key: str, params) -> bool:
+    """Whether the query parameters of a local storage URL carry a valid, unexpired signature for the request."""
+    try:
+        expires = int(params.get('expires', ''))
+        part_number = int(params.get('partNumber', 0))
+    except ValueError:
+        return False
+    if expires < time.time():
+        return False
+    expected = sign_local_url(method, bucket_name, object_key, expires, params.get('uploadId', ''), part_number,
+                              params.get('sha256', ''))
+    return hmac.compare_digest(expected, params.get('signature', ''))
+
+
+class LocalBackend(StorageBackend):
+    """
+    Objects stored as files under LOCAL_STORAGE_ROOT/<bucket>/<key>, for tests, load tests and on-prem installs
+    without network access. Presigned URLs point to the `local_storage_object` view and carry an HMAC signature
+    of the method, object and expiry. Multipart parts are kept under .multipart/ until completed.
+    """
+
+    MULTIPART_DIR = '.multipart'
+
+    def __init__(self, root: str):
+        self.root = Path(root).resolve()
+
+    def path(self, bucket_name: str, object_key: str) -> Path:
+        """Path of an object, refusing keys that would escape the bucket directory."""
+        bucket_dir = (self.root / bucket_name).resolve()
+        path = (bucket_dir / object_key).resolve()
+        if bucket_dir.parent != self.root or bucket_name == self.MULTIPART_DIR or not path.is_relative_to(bucket_dir) \
+                or path == bucket_dir:
+            raise ValueError(f"Invalid object {bucket_name}/{object_key}.")
+        return path
+
+    def upload_dir(self, bucket_name: str, upload_id: str) -> Path:
+        if not upload_id.isalnum():
+            raise ValueError("Invalid upload ID.")
+        return self.root / self.MULTIPART_DIR / bucket_name / upload_id
+
+    def signed_url(self, method: str, bucket_name: str, object_key: str, expiration: int, upload_id: str = '',
+                   part_number: int = 0, checksum_sha256: str = '') -> str:
+        expires = int(time.time()) + expiration
+        params = {'expires': expires}
+        if upload_id:
+            params.update(uploadId=upload_id, partNumber=part_number)
+        if checksum_sha256:
+            params['sha256'] = checksum_sha256
+        params['signature'] = sign_local_url(method, bucket_name, object_key, expires, upload_id, part_number,
+                                             checksum_sha256)
+        return f"{settings.LOCAL_STORAGE_URL}{quote(bucket_name)}/{quote(object_key)}?{urlencode(params)}"
+
+    def write(self, path: Path, chunks: Iterable[bytes], checksum_sha256: Optional[str] = None) -> str:
+        """
+        Writes the chunks to `path` atomically and returns their MD5 hex digest, used as ETag.
+        Raises ChecksumMismatch, leaving `path` untouched, if their SHA-256 is not `checksum_sha256`.
+        """
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f'.{path.name}.{uuid.uuid4().hex}.tmp')
+        digest = hashlib.md5()
+        sha256 = hashlib.sha256() if checksum_sha256 else None
+        try:
+            with open(temporary, 'wb') as f:
+                for chunk in chunks:
+                    digest.update(chunk)
+                    if sha256:
+                        sha256.update(chunk)
+                    f.write(chunk)
+            if sha256 and sha256.hexdigest() != checksum_sha256:
+                raise ChecksumMismatch(f"The content of {path.name} does not match its SHA-256 checksum.")
+            os.replace(temporary, path)
+        finally:
+            temporary.unlink(missing_ok=True)
+        return digest.hexdigest()
+
+    def presign_put(self, bucket_name, object_key, content_type, expiration, checksum_sha256=None):
+        # The digest is part of the signed URL, checked by the storage view as it writes
+        return self.signed_url('PUT', bucket_name, object_key, expiration, checksum_sha256=checksum_sha256 or '')
+
+    def checksum_headers(self, checksum_sha256):
+        return {}
+
+    def presign_get(self, bucket_name, object_key, expiration):
+        return self.signed_url('GET', bucket_name, object_key, expiration)
+
+    def upload_file(self, file_path, bucket_name, object_key, content_type=None,
+                    part_size=16 * 1024 * 1024, max_concurrency=4):
+        self.write(self.path(bucket_name, object_key), iter_files([Path(file_path)]))
+
+    def download_file(self, bucket_name, object_key, file_path):
+        shutil.copyfile(self.path(bucket_name, object_key), file_path)
+
+    def put_bytes(self, bucket_name, object_key, data, content_type):
+        self.write(self.path(bucket_name, object_key), [data])
+
+    def head(self, bucket_name, object_key):
+        return self.path(bucket_name, object_key).stat().st_size
+
+    def get_range(self, bucket_name, object_key, start, end):
+        with open(self.path(bucket_name, object_key), 'rb') as f:
+            f.seek(start)
+            return f.read(end - start + 1)
+
+    def copy(self, object_key, source_bucket, destination_bucket):
+        self.write(self.path(destination_bucket, object_key), iter_files([self.path(source_bucket, object_key)]))
+
+    def delete(self, bucket_name, object_keys):
+        deleted, errors = 0, []
+        for key in object_keys:
+            try:
+                # Like S3, deleting a missing object succeeds
+                self.path(bucket_name, key).unlink(missing_ok=True)
+                deleted += 1
+            except (OSError, ValueError) as e:
+                errors.append({'Key': key, 'Code': 'DeleteFailed', 'Message': str(e)})
+        return deleted, errors
+
+    def iter_objects(self, bucket_name, prefix='', page_size=1000):
+        bucket_dir = self.root / bucket_name
+        if not bucket_dir.is_dir():
+            return
+        keys = []
+        for directory, _, names in os.walk(bucket_dir):
+            for name in names:
+                if name.startswith('.') and name.endswith('.tmp'):  # Writes in progress
+                    continue
+                key = Path(directory, name).relative_to(bucket_dir).as_posix()
+                if key.startswith(prefix):
+                    keys.append(key)
+        # Same order as list_objects_v2: ascending UTF-8 bytes
+        for key in sorted(keys, key=lambda key: key.encode('utf-8')):
+            stat = (bucket_dir / key).stat()
+            yield {'Key': key, 'Size': stat.st_size,
+                   'LastModified': datetime.fromtimestamp(stat.st_mtime, tz=dt_timezone.utc)}
+
+    def create_multipart_upload(self, bucket_name, object_key, content_type):
+        self.path(bucket_name, object_key)  # Validate the key
+        upload_id = uuid.uuid4().hex
+        upload_dir = self.upload_dir(bucket_name, upload_id)
+        upload_dir.mkdir(parents=True)
+        (upload_dir / 'upload.json').write_text(json.dumps({'key': object_key, 'initiated': time.time()}))
+        return upload_id
+
+    def presign_upload_part(self, bucket_name, object_key, upload_id, part_number, expiration):
+        return self.signed_url('PUT', bucket_name, object_key, expiration, upload_id, part_number)
+
+    def write_part(self, bucket_name: str, object_key: str, upload_id: str, part_number: int,
+                   stream: BinaryIO) -> str:
+        upload_dir = self.upload_dir(bucket_name, upload_id)
+        if not upload_dir.is_dir():
+            raise FileNotFoundError(f"No upload {upload_id}.")
+        return self.write(upload_dir / f'{part_number:05d}', iter_chunks(stream))
+
+    def complete_multipart_upload(self, bucket_name, object_key, upload_id, parts):
+        upload_dir = self.upload_dir(bucket_name, upload_id)
+        part_paths = [upload_dir / f"{part['part_number']:05d}"
+                      for part in sorted(parts, key=lambda part: part['part_number'])]
+        self.write(self.path(bucket_name, object_key), iter_files(part_paths))
+        shutil.rmtree(upload_dir, ignore_errors=True)
+
+    def abort_multipart_upload(self, bucket_name, object_key, upload_id):
+        upload_dir = self.upload_dir(bucket_name, upload_id)
+        if not upload_dir.is_dir():
+            raise FileNotFoundError(f"NoSuchUpload: {upload_id}")
+        shutil.rmtree(upload_dir)
+
+    def iter_multipart_uploads(self, bucket_name):
+        uploads_dir = self.root / self.MULTIPART_DIR / bucket_name
+        if not uploads_dir.is_dir():
+            return
+        for upload_dir in uploads_dir.iterdir():
+            try:
+                meta = json.loads((upload_dir / 'upload.json').read_text())
+            except (OSError, ValueError):
+                continue
+            yield {'Key': meta['key'], 'UploadId': upload_dir.name,
+                   'Initiated': datetime.fromtimestamp(meta['initiated'], tz=dt_timezone.utc)}
+
+    @staticmethod
+    def content_type(object_key: str) -> str:
+        return mimetypes.guess_type(object_key)[0] or 'application/octet-stream'
+
+
+@lru_cache(maxsize=None)
+def get_storage_backend() -> StorageBackend:
+    """The backend selected by the STORAGE_BACKEND setting ('r2' or 'local')."""
+    if settings.STORAGE_BACKEND == 'local':
+        logger.info("Using local storage under %s", settings.LOCAL_STORAGE_ROOT)
+        return LocalBackend(settings.LOCAL_STORAGE_ROOT)
+    return R2Backend()
@@ -0,0 +1,75 @@
+import hashlib
+import logging
+from functools import lru_cache
+from typing import List, NamedTuple, Optional
+
+from django.conf import settings
+
+logger = logging.getLogger('my_logger')
+
+
+class StorageTarget(NamedTuple):
+    """Endpoint and credentials of an S3-compatible account. Buckets of one target share a client."""
+    endpoint_url: str
+    access_key_id: str
+    secret_access_key: str
+
+
+def get_target(bucket_name: str) -> StorageTarget:
+    """Target holding the bucket: its STORAGE_TARGETS entry, or the default account."""
+    target = settings.STORAGE_TARGETS.get(bucket_name) or settings.STORAGE_TARGETS[settings.BUCKET_NAME]
+    return StorageTarget(target['endpoint_url'], target['access_key_id'], target['secret_access_key'])
+
+
+@lru_cache(maxsize=None)
+def get_target_client(target: StorageTarget):
+    """
+    Returns the S3 client of a target, creating it on first use. boto3 clients are thread-safe and keep a
+    connection pool, so one client per target is shared by every thread of the process.
+    boto3 is imported here so that importing this module (e.g. from models) stays cheap.
+    """
+    import boto3
+    from botocore.client import Config
+
+    logger.debug("Creating storage client for %s", target.endpoint_url)
+    return boto3.client(
+        's3',
+        endpoint_url=target.endpoint_url,
+        aws_access_key_id=target.access_key_id,
+        aws_secret_access_key=target.secret_access_key,
+        config=Config(signature_version='s3v4', max_pool_connections=settings.STORAGE_MAX_POOL_CONNECTIONS)
+    )
+
+
+def get_client(bucket_name: str = None):
+    """S3 client able to sign for and access the bucket."""
+    return get_target_client(get_target(bucket_name or settings.BUCKET_NAME))
+
+
+def same_target(bucket_a: str, bucket_b: str) -> bool:
+    """Whether both buckets are reachable with one set of credentials, i.e. objects can be copied server-side."""
+    return get_target(bucket_a) == get_target(bucket_b)
+
+
+def known_buckets() -> List[str]:
+    """Every bucket files may be stored in: the default bucket and the configured targets and routes."""
+    routing = settings.STORAGE_ROUTING
+    buckets = [settings.BUCKET_NAME, *settings.STORAGE_TARGETS, *routing.get('users', {}).values(),
+               *routing.get('file_types', {}).values(), *routing.get('shards', [])]
+    return list(dict.fromkeys(buckets))
+
+
+def route_upload(object_key: str, file_type: Optional[str] = None, user_id: Optional[int] = None) -> str:
+    """Bucket receiving a new upload, following STORAGE_ROUTING."""
+    routing = settings.STORAGE_ROUTING
+    users = routing.get('users', {})
+    # Keys of settings loaded from JSON are strings
+    bucket = (users.get(user_id) or users.get(str(user_id))) if user_id is not None else None
+    if not bucket and file_type:
+        bucket = routing.get('file_types', {}).get(file_type)
+    if not bucket and routing.get('shards'):
+        # Stable across processes, unlike hash()
+        digest = hashlib.md5(object_key.encode('utf-8')).digest()
+        shards = routing['shards']
+        bucket = shards[int.from_bytes(digest[:4], 'big') % len(shards)]
+    return bucket or settings.BUCKET_NAME
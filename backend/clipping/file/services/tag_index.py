@@ -0,0 +1,170 @@
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.db import connection
+
+logger = logging.getLogger('my_logger')
+
+DEFAULT_SUGGESTIONS = 10
+MAX_SUGGESTIONS = 50
+
+# Prefixes this short match many tags: their results are memoized until the next update
+MEMO_PREFIX_LENGTH = 2
+
+# Minimum seconds between rebuilds triggered by writes of other processes
+REBUILD_INTERVAL = 60
+
+COUNT_TAGS_SQL = "SELECT tag, COUNT(*) FROM file, unnest(file.tags) AS tag GROUP BY tag"
+
+
+def normalize_tag(tag: str) -> str:
+    """Matching form of a tag: NFKC (full-width to half-width) and case-folded, so 'Cat' and 'ｃａｔ' match 'cat'."""
+    return unicodedata.normalize('NFKC', tag).casefold().strip()
+
+
+class TagPrefixIndex:
+    """
+    In-memory prefix index of tags: a sorted array of normalized tags searched with bisect, with per-tag
+    usage counts for ranking. Works for any script, Chinese tags are matched character by character.
+    """
+
+    def __init__(self):
+        self.keys: List[str] = []  # Sorted normalized tags
+        self.counts: Dict[str, int] = {}
+        self.display: Dict[str, str] = {}  # Normalized tag -> tag as written
+        self.memo: Dict[str, List[dict]] = {}
+        self.lock = threading.RLock()
+
+    def build(self, tag_counts: Dict[str, int]) -> None:
+        counts, display = Counter(), {}
+        for tag, count in tag_counts.items():
+            key = normalize_tag(tag)
+            if key:
+                counts[key] += count
+                display.setdefault(key, tag)
+        with self.lock:
+            self.keys = sorted(counts)
+            self.counts = dict(counts)
+            self.display = display
+            self.memo.clear()
+
+    def update(self, tags: Iterable[str], delta: int) -> None:
+        """Add `delta` uses of each tag, inserting new tags and dropping unused ones."""
+        with self.lock:
+            for tag in tags:
+                key = normalize_tag(tag)
+                if not key:
+                    continue
+                count = self.counts.get(key, 0) + delta
+                if count > 0:
+                    if key not in self.counts:
+                        insort(self.keys, key)
+                        self.display[key] = tag
+                    self.counts[key] = count
+                elif key in self.counts:
+                    del self.keys[bisect_left(self.keys, key)]
+                    del self.counts[key]
+                    del self.display[key]
+            self.memo.clear()
+
+    def search(self, query: str, limit: int = DEFAULT_SUGGESTIONS) -> List[dict]:
+        """Most used tags starting with `query`, ties broken alphabetically."""
+        prefix = normalize_tag(query)
+        if not prefix:
+            return []
+        with self.lock:
+            memo_key = f'{prefix}:{limit}'
+            if len(prefix) <= MEMO_PREFIX_LENGTH and memo_key in self.memo:
+                return self.memo[memo_key]
+
+            # All tags with the prefix form one contiguous slice of the sorted array
+            start = bisect_left(self.keys, prefix)
+            end = bisect_left(self.keys, prefix + '\U0010ffff', start)
+            matches = heapq.nsmallest(limit, self.keys[start:end], key=lambda key: (-self.counts[key], key))
+            results = [{'tag': self.display[key], 'count': self.counts[key]} for key in matches]
+
+            if len(prefix) <= MEMO_PREFIX_LENGTH:
+                self.memo[memo_key] = results
+            return results
+
+
+class ProcessTagIndex:
+    """
+    The tag index of this process. Built from the database on first use, updated incrementally by the
+    signal receivers of this process, and rebuilt (at most every REBUILD_INTERVAL seconds, in the background)
+    when the collection version shows that another process or a bulk path changed the files.
+    """
+
+    def __init__(self):
+        self.index = TagPrefixIndex()
+        self.built_version: Optional[int] = None
+        self.built_at = 0.0
+        self.rebuilding = False
+        self.lock = threading.Lock()
+        # Deltas applied while a rebuild reads the database, replayed onto its result (None: not rebuilding)
+        self.pending: Optional[List[Tuple[List[str], int]]] = None
+
+    def rebuild(self) -> None:
+        """
+        Rebuilds the index from the database. Deltas committed after the query started are missing from its
+        result and replayed; one committed just before it may be counted twice until the next rebuild.
+        """
+        from .cache_service import get_collection_version
+
+        with self.index.lock:
+            self.pending = []
+        try:
+            version = get_collection_version()
+            with connection.cursor() as cursor:
+                cursor.execute(COUNT_TAGS_SQL)
+                tag_counts = dict(cursor.fetchall())
+            with self.index.lock:
+                self.index.build(tag_counts)
+                for tags, delta in self.pending:
+                    self.index.update(tags, delta)
+                self.built_version, self.built_at = version, time.monotonic()
+        finally:
+            with self.index.lock:
+                self.pending = None
+        logger.info("Built the tag index: %d tags", len(tag_counts))
+
+    def _rebuild_in_background(self) -> None:
+        from django.db import close_old_connections
+
+        try:
+            self.rebuild()
+        except Exception as e:
+            logger.exception("Failed to rebuild the tag index: %s", e)
+        finally:
+            self.rebuilding = False
+            close_old_connections()
+
+    def get(self) -> TagPrefixIndex:
+        from .cache_service import get_collection_version
+
+        with self.lock:
+            if self.built_version is None:
+                self.rebuild()
+            elif (get_collection_version() != self.built_version and not self.rebuilding
+                  and time.monotonic() - self.built_at > REBUILD_INTERVAL):
+                self.rebuilding = True
+                threading.Thread(target=self._rebuild_in_background, name='tag-index-rebuild', daemon=True).start()
+        return self.index
+
+    def update(self, tags: Iterable[str], delta: int) -> None:
+        tags = list(tags)
+        with self.index.lock:
+            if self.pending is not None:
+                self.pending.append((tags, delta))
+            # Nothing else to keep in step before the first build
+            if self.built_version is not None:
+                self.index.update(tags, delta)
+
+
+tag_index = ProcessTagIndex()
@@ -0,0 +1,144 @@
+import io
+import logging
+import math
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Iterator, List, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .r2_service import R2Service, BUCKET_NAME
+from .range_reader import R2RangeReader
+
+try:
+    import av  # PyAV, CPU-only ffmpeg bindings
+except ImportError:  # Optional dependency, videos are not enriched without it
+    av = None
+
+logger = logging.getLogger('my_logger')
+
+# Keyframe sampling
+SAMPLE_POINTS = 24  # Evenly spaced seek positions, each decodes one keyframe
+MAX_KEYFRAMES = 6  # Frames kept for the contact sheet and the previews
+MIN_SCENE_SCORE = 0.15  # Minimum histogram distance to the previous sample to count as a scene change
+HISTOGRAM_BINS = 8  # Bins per RGB channel
+FRAME_MAX_SIZE = 640  # Longest side of the stored preview frames
+
+# Contact sheet
+SHEET_COLUMNS = 3
+SHEET_TILE_WIDTH = 320
+
+
+def sample_keyframes(source, sample_points: int = SAMPLE_POINTS) -> List[Tuple[float, Image.Image]]:
+    """
+    Seeks to evenly spaced positions of the video and decodes the keyframe at each of them,
+    skipping the non-key frames entirely. Returns (timestamp in seconds, frame) pairs in time order.
+    """
+    frames = []
+    with av.open(source) as container:
+        stream = container.streams.video[0]
+        stream.codec_context.skip_frame = 'NONKEY'
+
+        if stream.duration:
+            duration = float(stream.duration * stream.time_base)
+        else:
+            duration = (container.duration or 0) / av.time_base
+
+        last_pts = None
+        for i in range(sample_points if duration > 0 else 1):
+            if duration > 0:
+                container.seek(int(duration * i / sample_points / stream.time_base), stream=stream)
+
+            for frame in container.decode(stream):
+                # Long GOPs make neighbouring seeks land on the same keyframe
+                if frame.pts != last_pts:
+                    image = frame.to_image()
+                    image.thumbnail((FRAME_MAX_SIZE, FRAME_MAX_SIZE))
+                    frames.append((float(frame.pts * stream.time_base) if frame.pts is not None else 0.0, image))
+                    last_pts = frame.pts
+                break
+
+    return frames
+
+
+def color_histogram(image: Image.Image, bins: int = HISTOGRAM_BINS) -> np.ndarray:
+    """Normalized 3D RGB histogram of a downscaled copy of the image."""
+    pixels = np.asarray(image.convert('RGB').resize((64, 64)), dtype=np.uint16) // (256 // bins)
+    indices = (pixels[..., 0] * bins + pixels[..., 1]) * bins + pixels[..., 2]
+    return np.bincount(indices.ravel(), minlength=bins ** 3) / indices.size
+
+
+def select_scene_changes(frames: List[Tuple[float, Image.Image]], max_frames: int = MAX_KEYFRAMES,
+                         min_score: float = MIN_SCENE_SCORE) -> List[Tuple[float, Image.Image]]:
+    """
+    Keeps the frames that differ the most from the preceding sample (histogram distance in [0, 1]),
+    always including the first frame. The selection is returned in time order.
+    """
+    if not frames:
+        return []
+
+    histograms = [color_histogram(image) for _, image in frames]
+    scores = [1.0] + [0.5 * float(np.abs(histograms[i] - histograms[i - 1]).sum()) for i in range(1, len(frames))]
+
+    ranked = sorted((i for i, score in enumerate(scores) if score >= min_score), key=lambda i: -scores[i])
+    return [frames[i] for i in sorted(ranked[:max_frames])]
+
+
+def build_contact_sheet(images: List[Image.Image], columns: int = SHEET_COLUMNS,
+                        tile_width: int = SHEET_TILE_WIDTH) -> Image.Image:
+    """Tiles the frames row by row into a single image, each frame centered in its tile."""
+    columns = min(columns, len(images))
+    rows = math.ceil(len(images) / columns)
+    tile_height = max(round(tile_width * image.height / image.width) for image in images)
+
+    sheet = Image.new('RGB', (columns * tile_width, rows * tile_height), 'black')
+    for i, image in enumerate(images):
+        tile = image.convert('RGB')
+        tile.thumbnail((tile_width, tile_height))
+        row, column = divmod(i, columns)
+        sheet.paste(tile, (column * tile_width + (tile_width - tile.width) // 2,
+                           row * tile_height + (tile_height - tile.height) // 2))
+    return sheet
+
+
+def encode_jpeg(image: Image.Image, quality: int = 85) -> bytes:
+    buffer = io.BytesIO()
+    image.convert('RGB').save(buffer, 'JPEG', quality=quality)
+    return buffer.getvalue()
+
+
+@contextmanager
+def video_contact_sheet(object_key: str, bucket_name: str = BUCKET_NAME) -> Iterator[Tuple[str, List[str]]]:
+    """
+    Extracts scene-change keyframes of a stored video with ranged reads, uploads them as preview derivatives
+    and tiles them into a contact sheet for a single vision request.
+
+    Yields:
+    tuple: The path of a temporary JPEG contact sheet (removed on exit) and the object keys of the frames.
+    """
+    if av is None:
+        raise RuntimeError("PyAV is not installed, video keyframes cannot be extracted.")
+
+    reader = R2RangeReader(object_key, bucket_name)
+    frames = select_scene_changes(sample_keyframes(reader))
+    if not frames:
+        raise ValueError(f"No keyframe could be decoded from {object_key}.")
+    logger.info("Extracted %d keyframes from %s reading %d of %d bytes",
+                len(frames), object_key, reader.bytes_fetched, reader.size)
+
+    frame_keys = []
+    for i, (_, image) in enumerate(frames):
+        frame_key = f"{R2Service.DERIVATIVES_PREFIX}{object_key}/frame_{i:02d}.jpg"
+        R2Service.upload_bytes(encode_jpeg(image), frame_key, 'image/jpeg', bucket_name)
+        frame_keys.append(frame_key)
+
+    sheet_file = tempfile.NamedTemporaryFile(suffix='.jpg', delete=False)
+    try:
+        build_contact_sheet([image for _, image in frames]).save(sheet_file, 'JPEG', quality=85)
+        sheet_file.close()
+        yield sheet_file.name, frame_keys
+    finally:
+        sheet_file.close()
+        os.remove(sheet_file.name)
@@ -0,0 +1,97 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import File, FileInteraction
+from .services import cache_service, event_service, stats_service
+from .services.tag_index import tag_index
+
+
+# Bulk and raw SQL paths (bulk_create, DeletionService) do not send these signals
+# and update the counters themselves.
+
+@receiver(post_save, sender=File, dispatch_uid='file_stats_on_create')
+def count_created_file(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        stats_service.apply_file_deltas([instance])
+
+
+@receiver(post_delete, sender=File, dispatch_uid='file_stats_on_delete')
+def count_deleted_file(sender, instance, **kwargs):
+    stats_service.apply_file_deltas([instance], sign=-1)
+
+
+@receiver(post_save, sender=FileInteraction, dispatch_uid='file_stats_on_like')
+def count_like(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.interaction_type == FileInteraction.InteractionType.LIKE:
+        stats_service.apply_like_delta(instance.file_id, 1)
+
+
+@receiver(post_delete, sender=FileInteraction, dispatch_uid='file_stats_on_unlike')
+def count_unlike(sender, instance, **kwargs):
+    if instance.interaction_type == FileInteraction.InteractionType.LIKE:
+        stats_service.apply_like_delta(instance.file_id, -1)
+
+
+# Cached responses only hold file fields: interactions leave them valid
+@receiver(post_save, sender=File, dispatch_uid='file_cache_on_file_save')
+@receiver(post_delete, sender=File, dispatch_uid='file_cache_on_file_delete')
+def invalidate_cached_responses(sender, **kwargs):
+    cache_service.bump_collection_version()
+
+
+@receiver(post_save, sender=File, dispatch_uid='file_event_on_create')
+def publish_created_file(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        event_service.publish(event_service.FILE_CREATED, file_id=instance.file_id, user_id=instance.user_id)
+
+
+@receiver(post_delete, sender=File, dispatch_uid='file_event_on_delete')
+def publish_deleted_file(sender, instance, **kwargs):
+    event_service.publish(event_service.FILE_DELETED, file_ids=[instance.file_id])
+
+
+@receiver(post_save, sender=FileInteraction, dispatch_uid='file_event_on_interaction_save')
+def publish_interaction(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    event_type = (event_service.INTERACTION_LIKE if instance.interaction_type == FileInteraction.InteractionType.LIKE
+                  else event_service.INTERACTION_COMMENT)
+    # Comment edits are sent with a zero delta
+    event_service.publish(event_type, file_id=instance.file_id, interaction_id=instance.interaction_id,
+                          user_id=instance.user_id, delta=1 if created else 0)
+
+
+@receiver(post_delete, sender=FileInteraction, dispatch_uid='file_event_on_interaction_delete')
+def publish_deleted_interaction(sender, instance, **kwargs):
+    event_type = (event_service.INTERACTION_LIKE if instance.interaction_type == FileInteraction.InteractionType.LIKE
+                  else event_service.INTERACTION_COMMENT)
+    event_service.publish(event_type, file_id=instance.file_id, interaction_id=instance.interaction_id,
+                          user_id=instance.user_id, delta=-1)
+
+
+@receiver(post_save, sender=File, dispatch_uid='file_tag_index_on_save')
+def index_saved_tags(sender, instance, created, raw=False, **kwargs):
+    if raw or 'tags' not in instance.__dict__:
+        return
+    if created:
+        old_tags = set()
+    else:
+        # Sent before save() refreshes _loaded_values: they still hold the tags as loaded
+        loaded = getattr(instance, '_loaded_values', None) or {}
+        if 'tags' not in loaded:
+            return
+        old_tags = set(loaded['tags'])
+    new_tags = set(instance.tags)
+    if old_tags != new_tags:
+        def apply():
+            tag_index.update(old_tags - new_tags, -1)
+            tag_index.update(new_tags - old_tags, 1)
+
+        transaction.on_commit(apply)
+
+
+@receiver(post_delete, sender=File, dispatch_uid='file_tag_index_on_delete')
+def unindex_deleted_tags(sender, instance, **kwargs):
+    tags = list(instance.__dict__.get('tags') or [])
+    transaction.on_commit(lambda: tag_index.update(tags, -1))
@@ -0,0 +1,44 @@
+import itertools
+from typing import AsyncIterator, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+# Chunks produced per hop to the sync thread when streaming under ASGI
+STREAM_BATCH_SIZE = 100
+
+
+def is_asgi_request(request) -> bool:
+    """Whether the request (Django's or DRF's) is served by the ASGI application."""
+    return isinstance(getattr(request, '_request', request), ASGIRequest)
+
+
+async def iterate_in_thread(chunks: Iterable, batch_size: Optional[int] = None) -> AsyncIterator:
+    """
+    Async iterator over a sync iterable, advanced `batch_size` chunks at a time in the thread-sensitive sync
+    thread, the one running the views of the request, so database cursors stay on their connection.
+    Defaults to STREAM_BATCH_SIZE chunks.
+    """
+    iterator = iter(chunks)
+    batch_size = batch_size or STREAM_BATCH_SIZE
+    next_batch = sync_to_async(lambda: list(itertools.islice(iterator, batch_size)))
+    try:
+        while batch := await next_batch():
+            for chunk in batch:
+                yield chunk
+    finally:
+        # Runs the generator's cleanup (closing files and cursors) when the client goes away
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await sync_to_async(close)()
+
+
+def streaming_response(request, chunks: Iterable, **kwargs) -> StreamingHttpResponse:
+    """
+    StreamingHttpResponse of a sync iterable that is streamed under both WSGI and ASGI. Under ASGI Django
+    would buffer a sync iterator whole before sending the first byte: it is driven asynchronously instead.
+    """
+    if is_asgi_request(request):
+        chunks = iterate_in_thread(chunks)
+    return StreamingHttpResponse(chunks, **kwargs)
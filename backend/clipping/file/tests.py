@@ -1,6 +1,65 @@
-from django.test import TestCase
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import struct
+import tempfile
+from PIL import Image
+from datetime import datetime, timedelta, timezone as dt_timezone
+from importlib import import_module
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs, urlparse
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import AsyncClient, TestCase, SimpleTestCase, override_settings
 from django.contrib.auth.models import User
-from .models import File
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+from .models import DeletionJob, File, FileInteraction, FileScore, PendingObjectDeletion, UploadSession, UserFileStats, MAX_ENRICHMENT_ATTEMPTS, MEDIA_FIELDS, merge_tags, is_sha256_hex
+from .views import apply_bulk_operation, parse_bulk_operations, parse_datetime_range, parse_id_list
+from .pagination import encode_cursor, decode_cursor, keyset_filter
+from .management.commands.enrich_files import write_back
+from .services import cache_service, deletion_service, event_service
+from .services.deletion_service import DELETION_JOB_RETENTION, DeletionService, evict_finished_jobs
+from .services.r2_service import R2Service
+from .services.score_service import MIN_SCORE, add_interaction, decay_scores, rebuild_scores, remove_interaction
+from .services.stats_service import rebuild_user_stats
+from .services.reconciliation_service import merge_diff, reconcile, ORPHAN_OBJECT, MISSING_OBJECT, MISSING_DERIVATIVE
+from .services.export_service import iter_csv, iter_ndjson, parse_updated_since, stream_export
+from .services.import_service import build_object_key, iter_media_paths, probe_local_file
+from .services.probe_service import display_size, probe_stream
+from .services.tag_index import ProcessTagIndex, TagPrefixIndex
+from .services.feature_service import name_colors, parse_exif_datetime
+from .services.partition_service import (
+    add_months, is_partitioned, month_ranges, month_start, partition_name, partition_table, unpartition_table
+)
+from .services.storage_router import route_upload
+from .services.storage_backend import LocalBackend, parse_range, verify_local_url
+from .services.video_service import build_contact_sheet, color_histogram, select_scene_changes
+
+
+def make_files(user, count=1, **fields):
+    """Insert files without going through save(), which would call GPT to enrich them."""
+    return File.objects.bulk_create([
+        File(object_key=f'object-{i}.jpg', file_type=File.FileType.IMAGE, user=user, **fields) for i in range(count)
+    ])
+
+
+def use_local_storage(test_case):
+    """Serve the storage of a test from a LocalBackend in a temporary directory."""
+    root = tempfile.TemporaryDirectory()
+    test_case.addCleanup(root.cleanup)
+    backend = LocalBackend(root.name)
+    for target in ('file.services.r2_service.get_storage_backend', 'file.views.get_storage_backend'):
+        patcher = mock.patch(target, return_value=backend)
+        patcher.start()
+        test_case.addCleanup(patcher.stop)
+    return backend
 
 
 class FileCRUDTestCase(TestCase):
@@ -108,3 +167,1168 @@ class FileCRUDTestCase(TestCase):
         for file in files:
             print(f'Object Key: {file.object_key}, Bucket: {file.bucket_name}, Description: {file.description}, '
                   f'Width: {file.width}, Height: {file.height}, Tag: {file.tag}, User: {file.user_id.username if file.user_id else "None"}')
+
+
+class ParseIdListTestCase(SimpleTestCase):
+
+    def test_parse_id_list(self):
+        self.assertEqual(parse_id_list('3,1, 2,3,'), [3, 1, 2], "Ids should be parsed in order without duplicates")
+        self.assertEqual(parse_id_list(None), [], "Missing value should give an empty list")
+
+    def test_parse_id_list_invalid(self):
+        with self.assertRaises(ValueError, msg="Non integer ids should be rejected"):
+            parse_id_list('1,abc')
+
+
+class BulkOperationsTestCase(SimpleTestCase):
+
+    def test_parse_bulk_operations_invalid(self):
+        for operations in ([], {}, [{'file_id': '1'}], [{'file_id': 1}, {'file_id': 1}],
+                           [{'file_id': 1, 'add_tags': 'cat'}], [{'file_id': 1, 'remove_tags': ['x' * 51]}],
+                           [{'file_id': 1, 'description': 3}]):
+            with self.assertRaises(ValueError, msg=f"{operations} should be rejected"):
+                parse_bulk_operations(operations)
+
+    def test_apply_bulk_operation(self):
+        file = File(tags=['cat', 'dog'], description='old')
+        self.assertTrue(apply_bulk_operation(file, {'file_id': 1, 'add_tags': ['bird', 'cat'], 'remove_tags': ['dog']}))
+        self.assertEqual(file.tags, ['cat', 'bird'], "Removed tags should go before added tags are merged")
+        self.assertEqual(file.description, 'old', "A missing description should be left unchanged")
+        self.assertFalse(apply_bulk_operation(file, {'file_id': 1, 'add_tags': ['cat']}),
+                         "An operation changing nothing should be reported as such")
+        self.assertTrue(apply_bulk_operation(file, {'file_id': 1, 'description': None}))
+        self.assertIsNone(file.description)
+
+
+class KeysetCursorTestCase(SimpleTestCase):
+
+    def test_cursor_round_trip(self):
+        created = timezone.now()
+        cursor = encode_cursor([created, 42])
+        self.assertEqual(decode_cursor(cursor, (datetime, int)), [created, 42],
+                         "Cursor values should survive a round trip")
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(ValueError, msg="A garbage cursor should be rejected"):
+            decode_cursor('not-a-cursor', (datetime, int))
+        with self.assertRaises(ValueError, msg="A cursor with the wrong number of values should be rejected"):
+            decode_cursor(encode_cursor([1]), (datetime, int))
+        for payload in ([{'dt': 5}, 1], [{'dt': 'yesterday'}, 1], [{'dt': '2026-01-01', 'x': 1}, 1], [[1], 1],
+                        [{'dt': '2026-01-01'}, '1'], [{'dt': '2026-01-01'}, True], [{'dt': '2026-01-01'}, None],
+                        ['2026-01-01', 1]):
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+            with self.subTest(payload=payload), self.assertRaises(ValueError):
+                decode_cursor(cursor, (datetime, int))
+
+    def test_keyset_filter(self):
+        condition = keyset_filter(['created_datetime', 'interaction_id'], ['t', 7], descending=True)
+        expected = Q(created_datetime__lt='t') | Q(created_datetime='t', interaction_id__lt=7)
+        self.assertEqual(condition, expected, "Keyset filter should expand the row comparison")
+
+
+class MergeDiffTestCase(SimpleTestCase):
+
+    def test_merge_diff(self):
+        objects = iter([{'Key': 'a.jpg', 'Size': 1}, {'Key': 'b.jpg', 'Size': 2}, {'Key': 'd.jpg', 'Size': 4}])
+        rows = iter([(1, 'b.jpg'), (2, 'b.jpg'), (3, 'c.jpg'), (4, 'e.jpg')])
+        result = [(kind, entry['Key']) for kind, entry in merge_diff(objects, rows)]
+        self.assertEqual(result, [
+            (ORPHAN_OBJECT, 'a.jpg'),
+            (MISSING_OBJECT, 'c.jpg'),
+            (ORPHAN_OBJECT, 'd.jpg'),
+            (MISSING_OBJECT, 'e.jpg'),
+        ], "Only unmatched objects and rows should be reported, in key order")
+
+
+class MergeTagsTestCase(SimpleTestCase):
+
+    def test_merge_tags(self):
+        self.assertEqual(merge_tags(['cat', 'dog'], ['dog', '', 'cat', '猫']), ['cat', 'dog', '猫'],
+                         "Merged tags should be unique and keep their first occurrence order")
+        self.assertEqual(merge_tags(None), [], "Missing tags should give an empty list")
+
+
+class ContentHashTestCase(SimpleTestCase):
+
+    def test_is_sha256_hex(self):
+        self.assertTrue(is_sha256_hex(hashlib.sha256(b'cat').hexdigest()))
+        self.assertFalse(is_sha256_hex(hashlib.sha256(b'cat').hexdigest().upper()), "Digests must be lower-case")
+        self.assertFalse(is_sha256_hex('abc'), "Digests must be 64 characters long")
+        self.assertFalse(is_sha256_hex(None))
+
+
+class ExportFormatTestCase(SimpleTestCase):
+
+    def test_parse_updated_since(self):
+        self.assertIsNone(parse_updated_since(''), "Missing value should disable the filter")
+        self.assertTrue(timezone.is_aware(parse_updated_since('2026-10-01')), "Dates should become aware datetimes")
+        with self.assertRaises(ValueError, msg="Garbage should be rejected"):
+            parse_updated_since('yesterday')
+
+    def test_iter_lines(self):
+        rows = [{'file_id': 1, 'tags': ['cat', 'dog']}]
+        self.assertEqual(list(iter_ndjson(rows)), ['{"file_id": 1, "tags": ["cat", "dog"]}\n'])
+        self.assertEqual(list(iter_csv(rows, ['file_id', 'tags'])),
+                         ['file_id,tags\r\n', '1,"[""cat"", ""dog""]"\r\n'],
+                         "CSV should have a header and tags as a quoted JSON array")
+
+
+class ImportMediaTestCase(SimpleTestCase):
+
+    def test_probe_local_files(self):
+        with tempfile.TemporaryDirectory() as root:
+            os.makedirs(os.path.join(root, '.cache'))
+            for name in ('b.mp4', 'a.JPG', 'notes.txt', '.cache/c.png'):
+                with open(os.path.join(root, name), 'wb') as f:
+                    f.write(name.encode())
+
+            paths = list(iter_media_paths(root))
+            self.assertEqual([os.path.basename(path) for path in paths], ['a.JPG', 'b.mp4'],
+                             "Only visible images and videos should be yielded, in sorted order")
+
+            probe = probe_local_file(paths[1])
+            self.assertEqual(probe['sha256'], hashlib.sha256(b'b.mp4').hexdigest())
+            self.assertEqual((probe['file_type'], probe['size']), ('video', 5))
+
+    def test_build_object_key(self):
+        key = build_object_key('/photos/My Cat.JPG', 'abcdef0123456789', 7)
+        self.assertRegex(key, r'^my_cat_7_abcdef012345_[0-9a-f]{8}\.jpg$',
+                         "Keys should be normalized and suffixed with the owner, hash prefix and a random part")
+        self.assertNotEqual(build_object_key('/photos/My Cat.JPG', 'abcdef0123456789', 7), key)
+
+
+class ImportMediaCommandTestCase(TestCase):
+
+    def test_same_content_for_two_users(self):
+        backend = use_local_storage(self)
+        users = [User.objects.create_user(username=name) for name in ('alice', 'bob')]
+        with tempfile.TemporaryDirectory() as root:
+            with open(os.path.join(root, 'clip.mp4'), 'wb') as f:
+                f.write(b'same content')
+            for user in users:
+                call_command('import_media', root, user=user.username, bucket='media', hash_workers=1,
+                             upload_workers=1, stdout=io.StringIO())
+
+        alice_file, bob_file = (File.objects.get(user=user) for user in users)
+        self.assertNotEqual(alice_file.object_key, bob_file.object_key,
+                            "Users importing the same content should not share an object")
+        executor = mock.Mock(submit=lambda fn, *args: deletion_service._purge(*args))
+        with mock.patch.object(deletion_service, '_purge_executor', executor), \
+                self.captureOnCommitCallbacks(execute=True):
+            DeletionService.delete_files([alice_file.file_id])
+        self.assertFalse(backend.path('media', alice_file.object_key).exists())
+        self.assertEqual(backend.head('media', bob_file.object_key), len(b'same content'),
+                         "Deleting a file should not purge the object of another user")
+
+
+class ProbeHeadersTestCase(SimpleTestCase):
+
+    def probe(self, data):
+        return probe_stream(io.BytesIO(data), len(data))
+
+    def test_png_and_gif(self):
+        png = b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', 640, 480) + bytes(13)
+        self.assertEqual(self.probe(png), (640, 480, False))
+        gif = b'GIF89a' + struct.pack('<HH', 10, 20) + bytes(30)
+        self.assertEqual(self.probe(gif), (10, 20, False))
+
+    def test_jpeg_with_exif_orientation(self):
+        # Big-endian TIFF with a single IFD0 entry: orientation 6 (rotated 90 degrees)
+        tiff = b'MM\x00\x2a' + struct.pack('>IH', 8, 1) + struct.pack('>HHIHH', 0x0112, 3, 1, 6, 0) + bytes(4)
+        app1 = b'Exif\x00\x00' + tiff
+        sof = b'\x08' + struct.pack('>HH', 300, 400) + b'\x03' + bytes(9)
+        jpeg = (b'\xff\xd8' + b'\xff\xe1' + struct.pack('>H', len(app1) + 2) + app1
+                + b'\xff\xc0' + struct.pack('>H', len(sof) + 2) + sof + b'\xff\xd9')
+        probe = self.probe(jpeg)
+        self.assertEqual(probe, (400, 300, True))
+        self.assertEqual(display_size(probe), (300, 400), "Rotated images should have swapped display dimensions")
+
+    def test_mp4_with_moov_at_the_end(self):
+        def box(box_type, payload):
+            return struct.pack('>I', 8 + len(payload)) + box_type + payload
+
+        def tkhd(width, height, matrix):
+            return box(b'tkhd', bytes(4 + 20 + 16) + struct.pack('>9i', *matrix) + struct.pack('>II', width << 16, height << 16))
+
+        identity = (1 << 16, 0, 0, 0, 1 << 16, 0, 0, 0, 1 << 30)
+        rotate_90 = (0, 1 << 16, 0, -(1 << 16), 0, 0, 0, 0, 1 << 30)
+        mp4 = (box(b'ftyp', b'isom' + bytes(4)) + box(b'mdat', bytes(100))
+               + box(b'moov', box(b'trak', tkhd(0, 0, identity)) + box(b'trak', tkhd(1920, 1080, rotate_90))))
+        self.assertEqual(self.probe(mp4), (1920, 1080, True), "The first visual track should be used")
+
+    def test_unknown_format(self):
+        self.assertIsNone(self.probe(b'not an image at all, just text' * 2))
+
+
+class TagPrefixIndexTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.index = TagPrefixIndex()
+        self.index.build({'cat': 5, 'Car': 2, 'cartoon': 9, 'dog': 4, '猫咪': 3, '猫': 7})
+
+    def test_search_ranks_by_count(self):
+        self.assertEqual([t['tag'] for t in self.index.search('ca')], ['cartoon', 'cat', 'Car'])
+        self.assertEqual([t['tag'] for t in self.index.search('CA', limit=1)], ['cartoon'],
+                         "Matching should be case insensitive and honour the limit")
+        self.assertEqual([t['tag'] for t in self.index.search('猫')], ['猫', '猫咪'])
+        self.assertEqual(self.index.search(''), [])
+
+    def test_incremental_update(self):
+        self.index.search('c')  # Memoized, must be invalidated by updates
+        self.index.update(['cartoon'], -9)
+        self.index.update(['cobra'], 1)
+        self.assertEqual([t['tag'] for t in self.index.search('c')], ['cat', 'Car', 'cobra'])
+
+
+class StorageRoutingTestCase(SimpleTestCase):
+
+    @override_settings(BUCKET_NAME='default', STORAGE_ROUTING={
+        'users': {'7': 'tenant-7'},
+        'file_types': {'video': 'videos'},
+        'shards': ['shard-a', 'shard-b'],
+    })
+    def test_route_upload(self):
+        self.assertEqual(route_upload('a.mp4', 'video', user_id=7), 'tenant-7', "User routes should come first")
+        self.assertEqual(route_upload('a.mp4', 'video', user_id=8), 'videos')
+        shard = route_upload('a.jpg', 'image', user_id=8)
+        self.assertIn(shard, ['shard-a', 'shard-b'])
+        self.assertEqual(route_upload('a.jpg', 'image'), shard, "Sharding should only depend on the key")
+
+    @override_settings(BUCKET_NAME='default', STORAGE_ROUTING={'users': {}, 'file_types': {}, 'shards': []})
+    def test_default_bucket(self):
+        self.assertEqual(route_upload('a.jpg', 'image', user_id=1), 'default')
+
+
+@override_settings(LOCAL_STORAGE_SECRET='test-secret', LOCAL_STORAGE_URL='http://testserver/api/v1/storage/')
+class LocalStorageBackendTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.backend = LocalBackend(self.root.name)
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def test_objects(self):
+        self.backend.put_bytes('bucket', 'a/b.jpg', b'hello world', 'image/jpeg')
+        self.assertEqual(self.backend.head('bucket', 'a/b.jpg'), 11)
+        self.assertEqual(self.backend.get_range('bucket', 'a/b.jpg', 6, 10), b'world')
+        self.assertEqual([obj['Key'] for obj in self.backend.iter_objects('bucket')], ['a/b.jpg'])
+        self.assertEqual(self.backend.delete('bucket', ['a/b.jpg']), (1, []))
+        self.assertEqual(list(self.backend.iter_objects('bucket')), [])
+        with self.assertRaises(ValueError, msg="Keys escaping the bucket should be refused"):
+            self.backend.path('bucket', '../other/key')
+
+    def test_multipart_upload(self):
+        upload_id = self.backend.create_multipart_upload('bucket', 'video.mp4', 'video/mp4')
+        self.backend.write_part('bucket', 'video.mp4', upload_id, 2, io.BytesIO(b'world'))
+        self.backend.write_part('bucket', 'video.mp4', upload_id, 1, io.BytesIO(b'hello '))
+        self.backend.complete_multipart_upload('bucket', 'video.mp4', upload_id,
+                                               [{'part_number': 2}, {'part_number': 1}])
+        self.assertEqual(self.backend.get_range('bucket', 'video.mp4', 0, 99), b'hello world')
+        self.assertEqual(list(self.backend.iter_multipart_uploads('bucket')), [])
+
+    def test_signed_urls(self):
+        url = self.backend.presign_put('bucket', 'a b.jpg', 'image/jpeg', 60)
+        params = {key: values[0] for key, values in parse_qs(urlparse(url).query).items()}
+        self.assertTrue(verify_local_url('PUT', 'bucket', 'a b.jpg', params))
+        self.assertFalse(verify_local_url('GET', 'bucket', 'a b.jpg', params), "Signatures are bound to the method")
+        self.assertFalse(verify_local_url('PUT', 'bucket', 'other.jpg', params))
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+        self.assertEqual(parse_range('bytes=900-', 1000), (900, 999))
+        self.assertEqual(parse_range('bytes=-10', 1000), (990, 999))
+        self.assertEqual(parse_range('bytes=0-5000', 1000), (0, 999))
+        self.assertIsNone(parse_range('bytes=0-1,5-6', 1000), "Multiple ranges are served in full")
+        with self.assertRaises(ValueError):
+            parse_range('bytes=1000-', 1000)
+
+
+class DirtyFieldsTestCase(SimpleTestCase):
+
+    def load(self, **values):
+        file = File(object_key='a.jpg', file_type=File.FileType.IMAGE, tags=['cat'], **values)
+        names = [field.attname for field in File._meta.concrete_fields]
+        return File.from_db('default', names, [getattr(file, name) for name in names])
+
+    def test_dirty_fields(self):
+        file = self.load()
+        self.assertEqual(file.get_dirty_fields(), set())
+        file.tags = ['cat', 'dog']
+        file.description = 'A cat'
+        self.assertEqual(file.get_dirty_fields(), {'tags', 'description'})
+        self.assertFalse(file.get_dirty_fields() & MEDIA_FIELDS, "Editing tags should not count as new media")
+        file.object_key = 'b.jpg'
+        self.assertIn('object_key', file.get_dirty_fields())
+
+    def test_enrichment_backoff(self):
+        file = self.load()
+        file.record_enrichment(False)
+        first_retry = file.next_enrichment_datetime
+        self.assertTrue(file.needs_enrichment)
+        file.record_enrichment(False)
+        self.assertGreater(file.next_enrichment_datetime - timezone.now(), first_retry - timezone.now(),
+                           "Retries should back off")
+        for _ in range(MAX_ENRICHMENT_ATTEMPTS):
+            file.record_enrichment(False)
+        self.assertFalse(file.needs_enrichment, "Enrichment should be given up after the maximum attempts")
+        file.record_enrichment(True)
+        self.assertEqual((file.enrichment_attempts, file.next_enrichment_datetime), (0, None))
+
+
+class PartitionMonthsTestCase(SimpleTestCase):
+
+    def test_month_bounds(self):
+        month = month_start(datetime(2026, 12, 31, 23, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(month, datetime(2026, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(add_months(month, 1), datetime(2027, 1, 1, tzinfo=dt_timezone.utc),
+                         "Adding months should roll over the year")
+        self.assertEqual(add_months(month, -12), datetime(2025, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partition_name('file', month), 'file_p202612')
+
+    def test_month_ranges(self):
+        ranges = month_ranges(datetime(2026, 11, 15, tzinfo=dt_timezone.utc),
+                              datetime(2027, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual([partition_name('file', start) for start, _ in ranges],
+                         ['file_p202611', 'file_p202612', 'file_p202701'], "Both end months should be included")
+        self.assertTrue(all(end == add_months(start, 1) for start, end in ranges))
+
+
+class FeatureExtractionTestCase(SimpleTestCase):
+
+    def test_parse_exif_datetime(self):
+        self.assertEqual(parse_exif_datetime('2024:06:01 12:30:00'), datetime(2024, 6, 1, 12, 30))
+        self.assertEqual(parse_exif_datetime('2024:06:01 12:30:00\x00', '+02:00').utcoffset(), timedelta(hours=2),
+                         "The recorded offset should make the time aware")
+        self.assertIsNone(parse_exif_datetime('0000:00:00 00:00:00'), "Unset clocks should give no time")
+        self.assertIsNone(parse_exif_datetime(None))
+
+    def test_name_colors(self):
+        self.assertEqual(
+            name_colors([[250, 250, 250], [10, 10, 10], [128, 128, 128], [220, 30, 30], [30, 60, 200],
+                         [40, 170, 60], [120, 70, 30]]),
+            ['white', 'black', 'gray', 'red', 'blue', 'green', 'brown']
+        )
+
+    def test_parse_datetime_range(self):
+        start, end = parse_datetime_range('2024-06-01,2024-08-31')
+        self.assertEqual(end - start, timedelta(days=92), "A date as end bound should include that day")
+        self.assertEqual(parse_datetime_range('2024-06-01,')[1], None, "Bounds may be left empty")
+        for raw_value in ('2024-06-01', '2024-06-01,2024-08-31,2024-09-30', 'june,'):
+            with self.assertRaises(ValueError, msg=f"{raw_value} should be rejected"):
+                parse_datetime_range(raw_value)
+
+
+class InteractionsSummaryTestCase(TestCase):
+
+    def setUp(self):
+        self.users = [User.objects.create_user(username=f'user{i}', password='password123') for i in range(3)]
+        self.file, self.other_file = make_files(self.users[0], 2)
+        now = timezone.now()
+        for i, user in enumerate(self.users):
+            FileInteraction.objects.create(file=self.file, user=user, interaction_type='like',
+                                           created_datetime=now - timedelta(minutes=i))
+        FileInteraction.objects.create(file=self.file, user=self.users[1], interaction_type='comment', comment='Nice')
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[1])
+
+    def get_summary(self, **params):
+        return self.client.get('/api/v1/file/interactions_summary/', params)
+
+    def test_window_query(self):
+        response = self.get_summary(file_ids=f'{self.other_file.file_id},{self.file.file_id}', latest=2)
+        self.assertEqual(response.status_code, 200)
+        empty, summary = response.json()
+        self.assertEqual(empty['file_id'], self.other_file.file_id, "Summaries should follow the requested order")
+        self.assertEqual((empty['like_count'], empty['latest_likes']), (0, []))
+        self.assertEqual((summary['like_count'], summary['comment_count']), (3, 1))
+        self.assertEqual([like['username'] for like in summary['latest_likes']], ['user0', 'user1'],
+                         "Only the `latest` most recent likes should be returned")
+        self.assertEqual(summary['latest_comments'][0]['comment'], 'Nice')
+        my_like = FileInteraction.objects.get(file=self.file, user=self.users[1], interaction_type='like')
+        self.assertEqual(summary['my_like_id'], my_like.interaction_id)
+
+    def test_counts_without_latest(self):
+        summary, = self.get_summary(file_ids=str(self.file.file_id), latest=0).json()
+        self.assertEqual((summary['like_count'], summary['latest_likes']), (3, []),
+                         "Counts should be returned even when no interaction is requested")
+
+    def test_invalid_parameters(self):
+        response = self.get_summary(file_ids='1,x')
+        self.assertEqual((response.status_code, response.json()['error']),
+                         (400, "file_ids must be a comma separated list of integers."))
+        response = self.get_summary(file_ids='1', latest='many')
+        self.assertEqual((response.status_code, response.json()['error']), (400, "latest must be an integer."))
+
+
+    def test_malformed_cursors(self):
+        for payload in ([{'dt': 5}, 1], [{'dt': '2026-01-01T00:00:00+00:00'}, {'$gt': 1}], ['x', 'y']):
+            cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+            for url, params in ((f'/api/v1/file/{self.file.file_id}/interactions/', {}),
+                                ('/api/v1/file/', {'ordering': 'trending'})):
+                with self.subTest(url=url, payload=payload):
+                    response = self.client.get(url, {'cursor': cursor, **params})
+                    self.assertEqual(response.status_code, 400, "Malformed cursors should be reported as such")
+
+class DeletionServiceTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password123')
+        self.files = make_files(self.user, 3, bucket_name='media')
+        self.files[0].preview_frame_keys = ['derivatives/object-0/frame-0.jpg']
+        self.files[0].save(update_fields=['preview_frame_keys'])
+        FileInteraction.objects.create(file=self.files[0], user=self.user, interaction_type='like')
+
+    def delete(self, file_ids, errors=()):
+        # Purges inline: the executor thread would neither see the test transaction nor keep its connection
+        executor = mock.Mock(submit=lambda fn, *args: deletion_service._purge(*args))
+        with mock.patch.object(R2Service, 'delete_objects', return_value=(0, list(errors))) as delete_objects, \
+                mock.patch.object(deletion_service, '_purge_executor', executor), \
+                self.captureOnCommitCallbacks(execute=True):
+            job = DeletionService.delete_files(file_ids)
+        return job, delete_objects
+
+    def test_delete_files(self):
+        job, delete_objects = self.delete([self.files[0].file_id, self.files[1].file_id])
+        self.assertEqual(list(File.objects.values_list('file_id', flat=True)), [self.files[2].file_id])
+        self.assertFalse(FileInteraction.objects.exists())
+        delete_objects.assert_called_once_with(['object-0.jpg', 'derivatives/object-0/frame-0.jpg', 'object-1.jpg'],
+                                               'media')
+        self.assertEqual((job.files_deleted, job.rows_cascaded, job.objects_queued, job.objects_purged),
+                         (2, 1, 3, 3))
+        self.assertFalse(PendingObjectDeletion.objects.exists(), "Purged objects should not be pending anymore")
+        self.assertFalse(DeletionJob.objects.exists(), "Synchronous deletions should not store a job")
+
+    def test_failed_purge_stays_pending(self):
+        job, _ = self.delete([self.files[1].file_id],
+                             errors=[{'Key': 'object-1.jpg', 'Code': 'InternalError', 'Message': 'Try again'}])
+        self.assertEqual((job.objects_purged, job.objects_failed), (0, 1))
+        pending = PendingObjectDeletion.objects.get()
+        self.assertEqual((pending.bucket_name, pending.object_key, pending.attempts, pending.last_error),
+                         ('media', 'object-1.jpg', 1, 'Try again'))
+
+    def test_purge_waits_for_commit(self):
+        with mock.patch.object(R2Service, 'delete_objects', return_value=(0, [])) as delete_objects, \
+                self.captureOnCommitCallbacks(execute=False):
+            DeletionService.delete_files([self.files[1].file_id])
+            delete_objects.assert_not_called()
+        self.assertEqual(PendingObjectDeletion.objects.count(), 1,
+                         "Objects should be recorded with the deletion of their rows")
+
+    def test_purge_runs_in_background(self):
+        with mock.patch.object(R2Service, 'delete_objects', return_value=(0, [])) as delete_objects, \
+                mock.patch.object(deletion_service, '_purge_executor') as executor, \
+                self.captureOnCommitCallbacks(execute=True):
+            job = DeletionService.delete_files([self.files[1].file_id])
+        delete_objects.assert_not_called()
+        executor.submit.assert_called_once()
+        self.assertEqual((job.files_deleted, job.objects_purged), (1, 0),
+                         "The request should not wait for the storage to purge the objects")
+        self.assertEqual(PendingObjectDeletion.objects.count(), 1,
+                         "Objects should stay pending until the background purge ran")
+
+    def test_evict_finished_jobs(self):
+        now = timezone.now()
+        old = DeletionJob.objects.create(status=DeletionJob.Status.COMPLETED,
+                                         finished_datetime=now - DELETION_JOB_RETENTION - timedelta(hours=1))
+        recent = DeletionJob.objects.create(status=DeletionJob.Status.COMPLETED, finished_datetime=now)
+        stale = DeletionJob.objects.create(updated_datetime=now - timedelta(hours=1))
+        running = DeletionJob.objects.create()
+        self.assertEqual(evict_finished_jobs(), 1)
+        self.assertFalse(DeletionJob.objects.filter(pk=old.pk).exists())
+        self.assertTrue(DeletionJob.objects.filter(pk=recent.pk).exists())
+        self.assertEqual(DeletionJob.objects.get(pk=stale.pk).status, DeletionJob.Status.FAILED,
+                         "Jobs that stopped making progress should be reported as failed")
+        self.assertEqual(DeletionJob.objects.get(pk=running.pk).status, DeletionJob.Status.RUNNING)
+
+    def test_deletion_views_require_staff(self):
+        job = DeletionJob.objects.create(files_deleted=5)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertEqual(client.delete('/api/v1/file/delete_all/').status_code, 403)
+        self.assertEqual(client.get('/api/v1/file/deletion_status/', {'job_id': job.job_id.hex}).status_code, 403)
+        self.assertEqual(File.objects.count(), 3)
+
+        client.force_authenticate(User.objects.create_user(username='staff', is_staff=True))
+        response = client.get('/api/v1/file/deletion_status/', {'job_id': job.job_id.hex})
+        self.assertEqual((response.status_code, response.json()['files_deleted']), (200, 5),
+                         "Jobs should be read from the database, whichever worker runs them")
+        self.assertEqual(client.get('/api/v1/file/deletion_status/', {'job_id': 'nope'}).status_code, 404)
+
+
+class VideoKeyframesTestCase(SimpleTestCase):
+
+    def frames(self, *colors):
+        return [(float(i), Image.new('RGB', (64, 36), color)) for i, color in enumerate(colors)]
+
+    def test_color_histogram(self):
+        histogram = color_histogram(Image.new('RGB', (10, 10), (255, 0, 0)))
+        self.assertAlmostEqual(histogram.sum(), 1.0)
+        self.assertEqual((histogram.argmax(), histogram.max()), ((7 * 8 + 0) * 8 + 0, 1.0),
+                         "A solid color should fill a single bin")
+
+    def test_select_scene_changes(self):
+        frames = self.frames('red', 'red', 'blue', (0, 0, 250), 'green')
+        self.assertEqual([time for time, _ in select_scene_changes(frames)], [0.0, 2.0, 4.0],
+                         "Frames close to the previous sample should be skipped")
+        self.assertEqual([time for time, _ in select_scene_changes(frames, max_frames=2)], [0.0, 2.0],
+                         "The kept frames should be returned in time order")
+        self.assertEqual(select_scene_changes([]), [])
+
+    def test_build_contact_sheet(self):
+        images = [image for _, image in self.frames('red', 'green', 'blue', 'white')]
+        sheet = build_contact_sheet(images, columns=3, tile_width=320)
+        self.assertEqual(sheet.size, (960, 360), "Four 16:9 frames should fill two rows of three 320px tiles")
+        self.assertEqual(sheet.getpixel((160, 90)), (255, 0, 0))
+        self.assertEqual(sheet.getpixel((160, 270)), (255, 255, 255), "The fourth frame should start a row")
+        self.assertEqual(sheet.getpixel((800, 270)), (0, 0, 0), "Empty tiles should stay black")
+
+
+class VideoEnrichmentQueueTestCase(TestCase):
+
+    def test_new_video_is_queued(self):
+        user = User.objects.create_user(username='owner', password='password123')
+        with mock.patch.object(File, 'enrich') as enrich:
+            video = File(object_key='clip.mp4', file_type=File.FileType.VIDEO, user=user)
+            video.save()
+            enrich.assert_not_called()
+            self.assertTrue(File.objects.get(pk=video.pk).needs_enrichment,
+                            "New videos should be left to enrich_files rather than enriched in the request")
+            video.save(enrich=True)
+            enrich.assert_called_once()
+
+
+class ReconcileDerivativesTestCase(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username='owner', password='password123')
+        File.objects.bulk_create([File(
+            object_key='clip.mp4', file_type=File.FileType.VIDEO, user=user, bucket_name='media',
+            preview_frame_keys=['derivatives/clip.mp4/frame_00.jpg', 'derivatives/clip.mp4/frame_01.jpg']
+        )])
+        now = timezone.now()
+        self.objects = [{'Key': key, 'Size': 1, 'LastModified': now} for key in
+                        ['clip.mp4', 'derivatives/clip.mp4/frame_00.jpg', 'derivatives/gone.mp4/frame_00.jpg']]
+
+    def reconcile(self, prefix=''):
+        def iter_objects(prefix='', bucket_name=None, page_size=1000):
+            return iter([obj for obj in self.objects if obj['Key'].startswith(prefix)])
+
+        with mock.patch.object(R2Service, 'iter_objects', side_effect=iter_objects):
+            return [(kind, entry['Key']) for kind, entry in reconcile('media', prefix=prefix)]
+
+    def test_reconcile_derivatives(self):
+        self.assertEqual(self.reconcile(), [
+            (MISSING_DERIVATIVE, 'derivatives/clip.mp4/frame_01.jpg'),
+            (ORPHAN_OBJECT, 'derivatives/gone.mp4/frame_00.jpg'),
+        ], "Frames should be matched against the preview_frame_keys of the rows, not skipped")
+        self.assertEqual(self.reconcile(prefix='derivatives/gone'),
+                         [(ORPHAN_OBJECT, 'derivatives/gone.mp4/frame_00.jpg')])
+        self.assertEqual(self.reconcile(prefix='clip'), [])
+
+
+class UploadContentTypeTestCase(SimpleTestCase):
+
+    def test_resolve_content_type(self):
+        self.assertEqual(R2Service.resolve_content_type('video', 'video/quicktime'), 'video/quicktime')
+        self.assertEqual(R2Service.resolve_content_type('image', 'Image/PNG; charset=binary'), 'image/png')
+        self.assertEqual(R2Service.resolve_content_type('image', 'image/svg+xml'), 'image/jpeg',
+                         "Types rendered as documents should fall back to the default of the file type")
+        self.assertEqual(R2Service.resolve_content_type('video', 'text/html'), 'video/mp4')
+        self.assertEqual(R2Service.resolve_content_type('other', None), 'application/octet-stream')
+
+
+@override_settings(BUCKET_NAME='media', STORAGE_ROUTING={'users': {}, 'file_types': {}, 'shards': []},
+                   MAX_UPLOAD_SIZE=100 * 1024 * 1024)
+class MultipartUploadTestCase(TestCase):
+
+    def setUp(self):
+        self.backend = use_local_storage(self)
+        self.user = User.objects.create_user(username='uploader', password='password123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_session(self, **data):
+        return self.client.post('/api/v1/multipart-uploads/', {
+            'object_key': 'clip.mp4', 'file_type': 'video', 'size': 11, **data
+        }, format='json')
+
+    def test_upload(self):
+        response = self.create_session(content_type='image/svg+xml')
+        self.assertEqual(response.status_code, 201)
+        session = response.json()['data']
+        self.assertEqual((session['content_type'], session['part_count']), ('video/mp4', 1))
+
+        response = self.client.post(f"/api/v1/multipart-uploads/{session['session_id']}/parts/", {},
+                                    format='json')
+        self.assertEqual((response.status_code, len(response.json()['data'])), (200, 1))
+        upload_id = UploadSession.objects.get(pk=session['session_id']).upload_id
+        etag = self.backend.write_part('media', session['unique_object_key'], upload_id, 1, io.BytesIO(b'hello world'))
+
+        response = self.client.post(f"/api/v1/multipart-uploads/{session['session_id']}/complete/",
+                                    {'parts': [{'part_number': 1, 'etag': etag}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.backend.get_range('media', session['unique_object_key'], 0, 99), b'hello world')
+        self.assertEqual(UploadSession.objects.get(pk=session['session_id']).status, UploadSession.Status.COMPLETED)
+        self.assertEqual(self.client.post(f"/api/v1/multipart-uploads/{session['session_id']}/complete/",
+                                          {'parts': []}, format='json').status_code, 404,
+                         "Closed sessions should not be usable anymore")
+
+    def test_abort(self):
+        session_id = self.create_session().json()['data']['session_id']
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user(username='other', password='password123'))
+        self.assertEqual(other.delete(f'/api/v1/multipart-uploads/{session_id}/').status_code, 404,
+                         "Sessions should only be visible to their owner")
+        self.assertEqual(self.client.delete(f'/api/v1/multipart-uploads/{session_id}/').status_code, 200)
+        self.assertEqual(UploadSession.objects.get(pk=session_id).status, UploadSession.Status.ABORTED)
+        self.assertEqual(list(self.backend.iter_multipart_uploads('media')), [])
+
+    def test_invalid_sessions(self):
+        self.assertEqual(self.create_session(size=100 * 1024 * 1024 + 1).status_code, 400,
+                         "Uploads above MAX_UPLOAD_SIZE should be refused")
+        self.assertEqual(self.create_session(size='big').status_code, 400)
+        self.assertEqual(self.create_session(size=0).status_code, 400)
+        session_id = self.create_session().json()['data']['session_id']
+        response = self.client.post(f'/api/v1/multipart-uploads/{session_id}/parts/', {'part_numbers': [2]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_sweep_upload_sessions(self):
+        expired_id = self.create_session().json()['data']['session_id']
+        open_id = self.create_session().json()['data']['session_id']
+        UploadSession.objects.filter(pk=expired_id).update(expires_datetime=timezone.now() - timedelta(minutes=1))
+        untracked_id = self.backend.create_multipart_upload('media', 'untracked.mp4', 'video/mp4')
+
+        with mock.patch('file.management.commands.sweep_upload_sessions.known_buckets', return_value=['media']):
+            call_command('sweep_upload_sessions', untracked_older_than_hours=0, stdout=io.StringIO())
+        self.assertEqual(UploadSession.objects.get(pk=expired_id).status, UploadSession.Status.EXPIRED)
+        self.assertEqual(UploadSession.objects.get(pk=open_id).status, UploadSession.Status.OPEN)
+        remaining = {upload['UploadId'] for upload in self.backend.iter_multipart_uploads('media')}
+        self.assertEqual(remaining, {UploadSession.objects.get(pk=open_id).upload_id},
+                         "Expired and untracked uploads should be aborted, open sessions kept")
+        self.assertNotIn(untracked_id, remaining)
+
+
+class EnrichWriteBackTestCase(TestCase):
+
+    def test_keeps_concurrent_edits(self):
+        user = User.objects.create_user(username='owner', password='password123')
+        file_id = make_files(user, tags=['cat', 'sofa'], needs_enrichment=True)[0].file_id
+        enriched = File.objects.get(pk=file_id)
+        # As enrichment does, while the owner edits the tags and caption
+        enriched.tags = merge_tags(enriched.tags, ['cat', 'indoors'])
+        enriched.file_caption = 'A cat on a sofa'
+        enriched.record_enrichment(True)
+        File.objects.filter(pk=file_id).update(tags=['cat', 'kitten'], file_caption='Mittens')
+
+        write_back([enriched])
+        file = File.objects.get(pk=file_id)
+        self.assertEqual(file.tags, ['cat', 'kitten', 'indoors'],
+                         "Only generated tags should be added, keeping the tags edited meanwhile")
+        self.assertEqual(file.file_caption, 'Mittens', "A caption set meanwhile should not be replaced")
+        self.assertFalse(file.needs_enrichment)
+
+
+@override_settings(BUCKET_NAME='media', STORAGE_ROUTING={'users': {}, 'file_types': {}, 'shards': []},
+                   LOCAL_STORAGE_URL='http://testserver/api/v1/storage/')
+class ContentDeduplicationTestCase(TestCase):
+
+    def setUp(self):
+        self.backend = use_local_storage(self)
+        self.content = b'hello world'
+        self.sha256 = hashlib.sha256(self.content).hexdigest()
+        self.user, self.other = (User.objects.create_user(username=name, password='password123')
+                                 for name in ('owner', 'other'))
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        enrich = mock.patch.object(File, 'enrich')
+        enrich.start()
+        self.addCleanup(enrich.stop)
+
+    def presign(self, sha256):
+        response = self.client.post('/api/v1/get-pre-signed-urls/', [
+            {'object_key': 'photo.jpg', 'file_type': 'image', 'content_type': 'image/jpeg', 'sha256': sha256}
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['data'][0]
+
+    def upload(self, url, content):
+        return self.client.put(url['pre_signed_url'].removeprefix('http://testserver'), content,
+                               content_type=url['content_type'])
+
+    def create_file(self, url, **fields):
+        return self.client.post('/api/v1/file/', {
+            'object_key': url['unique_object_key'], 'bucket_name': url['bucket_name'], 'file_type': 'image',
+            'content_sha256': self.sha256, 'width': 1, 'height': 1, **fields
+        }, format='json')
+
+    def test_other_users_content_is_not_matched(self):
+        File.objects.bulk_create([File(object_key='secret.jpg', bucket_name='private', user=self.other,
+                                       content_sha256=self.sha256)])
+        url = self.presign(self.sha256)
+        self.assertFalse(url['already_stored'], "Another user's file should neither be matched nor revealed")
+        self.assertNotIn('secret', json.dumps(url))
+        self.assertEqual(self.upload(url, self.content).status_code, 200)
+        self.assertEqual(self.create_file(url, content_token=url['content_token']).status_code, 201,
+                         "Both users should be able to store the same content")
+
+    def test_own_content_is_matched(self):
+        file, = File.objects.bulk_create([File(object_key='mine.jpg', bucket_name='media', user=self.user,
+                                               content_sha256=self.sha256)])
+        url = self.presign(self.sha256)
+        self.assertEqual((url['already_stored'], url['file_id'], url['pre_signed_url']), (True, file.file_id, None))
+
+    def test_content_is_verified(self):
+        url = self.presign(self.sha256)
+        self.assertEqual(self.upload(url, b'other content').status_code, 400,
+                         "Storage should refuse content that does not match the digest")
+        self.assertFalse(list(self.backend.iter_objects('media')))
+        self.assertEqual(self.upload(url, self.content).status_code, 200)
+
+        self.assertEqual(self.create_file(url).status_code, 400, "A digest without its token should be refused")
+        self.assertEqual(self.create_file(url, content_sha256='0' * 64, content_token=url['content_token'])
+                         .status_code, 400, "The token should only vouch for the uploaded digest")
+        response = self.create_file(url, content_token=url['content_token'])
+        self.assertEqual(response.status_code, 201)
+        file_id = response.json()['file_id']
+
+        response = self.client.patch(f'/api/v1/file/{file_id}/', {'content_sha256': '0' * 64, 'tags': ['a']},
+                                     format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(File.objects.get(pk=file_id).content_sha256, self.sha256,
+                         "content_sha256 should be read-only after creation")
+
+
+class UserFileStatsTestCase(TestCase):
+
+    def setUp(self):
+        self.owner, self.fan = (User.objects.create_user(username=name, password='password123')
+                                for name in ('owner', 'fan'))
+        enrich = mock.patch.object(File, 'enrich')
+        enrich.start()
+        self.addCleanup(enrich.stop)
+
+    def stats(self, user=None):
+        stats = UserFileStats.objects.filter(user=user or self.owner).first()
+        return (stats.file_count, stats.storage_bytes, stats.likes_received) if stats else (0, 0, 0)
+
+    def test_signals(self):
+        file = File.objects.create(object_key='a.jpg', user=self.owner, size_bytes=100)
+        File.objects.create(object_key='b.jpg', user=self.owner, size_bytes=50)
+        self.assertEqual(self.stats(), (2, 150, 0))
+
+        like = FileInteraction.objects.create(file=file, user=self.fan, interaction_type='like')
+        FileInteraction.objects.create(file=file, user=self.fan, interaction_type='comment', comment='Nice')
+        self.assertEqual(self.stats(), (2, 150, 1), "Only likes should be counted")
+        self.assertEqual(self.stats(self.fan), (0, 0, 0))
+        like.delete()
+        self.assertEqual(self.stats(), (2, 150, 0))
+
+        file.tags = ['cat']
+        file.save()
+        self.assertEqual(self.stats(), (2, 150, 0), "Updates should not count the file again")
+        file.delete()
+        self.assertEqual(self.stats(), (1, 50, 0))
+
+    def test_deletion_service(self):
+        files = make_files(self.owner, 2, size_bytes=10)
+        rebuild_user_stats()
+        FileInteraction.objects.create(file=files[0], user=self.fan, interaction_type='like')
+        with mock.patch.object(R2Service, 'delete_objects', return_value=(0, [])):
+            DeletionService.delete_files([files[0].file_id], purge_objects=False)
+        self.assertEqual(self.stats(), (1, 10, 0), "The likes of deleted files should be removed too")
+
+    def test_rebuild(self):
+        file, = make_files(self.owner, size_bytes=30)
+        FileInteraction.objects.create(file=file, user=self.fan, interaction_type='like')
+        UserFileStats.objects.all().delete()
+        self.assertEqual(rebuild_user_stats(), 1)
+        self.assertEqual(self.stats(), (1, 30, 1))
+
+    def test_size_is_read_only_on_update(self):
+        file = File.objects.create(object_key='a.jpg', user=self.owner, size_bytes=100)
+        client = APIClient()
+        client.force_authenticate(self.owner)
+        response = client.patch(f'/api/v1/file/{file.file_id}/', {'size_bytes': 1}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((File.objects.get(pk=file.pk).size_bytes, self.stats()), (100, (1, 100, 0)),
+                         "The stored size should stay in step with storage_bytes")
+
+
+@override_settings(TRENDING_HALF_LIFE_HOURS=1, TRENDING_WEIGHTS={'like': 1.0, 'comment': 2.0})
+class TrendingScoreTestCase(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='owner', password='password123')
+        self.files = make_files(self.user, 3)
+        self.now = timezone.now()
+
+    def score(self, file):
+        return FileScore.objects.filter(file=file).values_list('score', flat=True).first()
+
+    def set_score(self, file, score, decayed_datetime):
+        FileScore.objects.update_or_create(file=file, defaults={'score': score, 'decayed_datetime': decayed_datetime})
+
+    def test_add_interaction(self):
+        add_interaction(self.files[0].file_id, 'like', self.now)
+        add_interaction(self.files[0].file_id, 'comment', self.now)
+        add_interaction(self.files[0].file_id, 'share', self.now)
+        self.assertAlmostEqual(self.score(self.files[0]), 3.0)
+        self.assertIsNone(self.score(self.files[1]), "Files without interactions should have no score")
+
+    def test_add_interaction_to_stale_score(self):
+        self.set_score(self.files[0], 8.0, self.now - timedelta(hours=4))
+        add_interaction(self.files[0].file_id, 'like', self.now)
+        add_interaction(self.files[1].file_id, 'comment', self.now)
+        self.assertAlmostEqual(self.score(self.files[0]), 1.5,
+                               msg="The stored score should be decayed to now before adding the weight")
+        self.assertEqual(FileScore.objects.get(file=self.files[0]).decayed_datetime, self.now)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/file/', {'ordering': 'trending'})
+        self.assertEqual([file['file_id'] for file in response.json()['results']],
+                         [self.files[1].file_id, self.files[0].file_id],
+                         "A fresh comment should outrank an old score with a fresh like")
+
+    def test_remove_interaction(self):
+        self.set_score(self.files[0], 3.0, self.now)
+        remove_interaction(self.files[0].file_id, 'like', self.now - timedelta(hours=1))
+        self.assertAlmostEqual(self.score(self.files[0]), 2.5,
+                               msg="The weight should be decayed from the interaction to the last decay")
+        remove_interaction(self.files[0].file_id, 'comment', self.now)
+        self.assertAlmostEqual(self.score(self.files[0]), 0.5)
+        remove_interaction(self.files[0].file_id, 'comment', self.now)
+        self.assertEqual(self.score(self.files[0]), 0, "Scores should not go negative")
+
+    def test_decay_scores(self):
+        self.set_score(self.files[0], 4.0, self.now - timedelta(hours=1))
+        self.set_score(self.files[1], 4.0, self.now - timedelta(hours=2))
+        self.set_score(self.files[2], MIN_SCORE * 1.5, self.now - timedelta(hours=1))
+        with mock.patch('file.services.score_service.DECAY_CHUNK_SIZE', 1):
+            self.assertEqual(decay_scores(self.now), (3, 1))
+        self.assertAlmostEqual(self.score(self.files[0]), 2.0)
+        self.assertAlmostEqual(self.score(self.files[1]), 1.0)
+        self.assertIsNone(self.score(self.files[2]), "Negligible scores should be dropped")
+        self.assertEqual(FileScore.objects.get(file=self.files[0]).decayed_datetime, self.now)
+
+    def test_rebuild_scores(self):
+        for file, interaction_type, age in [(self.files[0], 'like', 0), (self.files[0], 'comment', 1),
+                                            (self.files[1], 'like', 1)]:
+            interaction = FileInteraction.objects.create(file=file, user=self.user, interaction_type=interaction_type)
+            FileInteraction.objects.filter(pk=interaction.pk).update(created_datetime=self.now - timedelta(hours=age))
+        self.assertEqual(rebuild_scores(self.now), 2)
+        self.assertAlmostEqual(self.score(self.files[0]), 2.0)
+        self.assertAlmostEqual(self.score(self.files[1]), 0.5)
+
+    def test_trending_feed(self):
+        self.set_score(self.files[0], 1.0, self.now)
+        self.set_score(self.files[2], 2.0, self.now)
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/v1/file/', {'ordering': 'trending', 'limit': 1})
+        self.assertEqual([file['file_id'] for file in response.json()['results']], [self.files[2].file_id])
+        response = client.get('/api/v1/file/', {'ordering': 'trending', 'cursor': response.json()['next_cursor']})
+        self.assertEqual([file['file_id'] for file in response.json()['results']], [self.files[0].file_id])
+
+
+class ResponseCacheTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        self.compute = mock.Mock(return_value={'results': []})
+
+    def test_get_or_compute(self):
+        self.assertEqual(cache_service.get_or_compute('file:test', self.compute), {'results': []})
+        self.assertEqual(cache_service.get_or_compute('file:test', self.compute), {'results': []})
+        self.compute.assert_called_once()
+        self.assertIsNone(cache.get('file:test:fill'), "The fill lock should be released")
+
+    @mock.patch.object(cache_service, 'FILL_LOCK_TIMEOUT', 0.1)
+    def test_timed_out_waiter_keeps_foreign_lock(self):
+        cache.set('file:test:fill', 'other-process', timeout=60)
+        self.assertEqual(cache_service.get_or_compute('file:test', self.compute), {'results': []})
+        self.compute.assert_called_once()
+        self.assertEqual(cache.get('file:test:fill'), 'other-process',
+                         "A waiter should not release the lock of the process computing the value")
+
+    def test_version_bumps(self):
+        user = User.objects.create_user(username='owner', password='password123')
+        file, = make_files(user)
+        version = cache_service.get_collection_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            FileInteraction.objects.create(file=file, user=user, interaction_type='like')
+        self.assertEqual(cache_service.get_collection_version(), version,
+                         "Interactions should not invalidate the cached file pages")
+        with self.captureOnCommitCallbacks(execute=True):
+            file.save(update_fields=['description'])
+        self.assertNotEqual(cache_service.get_collection_version(), version)
+
+
+class FileEventStreamTestCase(TestCase):
+
+    def setUp(self):
+        self.token = str(AccessToken.for_user(User.objects.create_user(username='viewer', password='password123')))
+        # Events are dispatched by the test, not by a LISTEN thread
+        patcher = mock.patch.object(event_service.broker, 'listener', object())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_stream_delivers_events(self):
+        response = await AsyncClient().get('/api/v1/file-events/', {'token': self.token})
+        self.assertEqual((response.status_code, response['Content-Type']), (200, 'text/event-stream'))
+        content = response.streaming_content
+        self.assertEqual(await anext(content), b'retry: 3000\n\n')
+        event_service.broker.dispatch(json.dumps({'type': event_service.FILE_DELETED, 'file_ids': [7]}))
+        chunk = (await asyncio.wait_for(anext(content), 5)).decode()
+        self.assertRegex(chunk, r'^id: \d+\nevent: file.deleted\ndata: ')
+        self.assertEqual(json.loads(chunk.split('data: ', 1)[1])['file_ids'], [7])
+
+        # A client disconnection cancels the task sending the stream
+        waiting = asyncio.ensure_future(anext(content))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            await waiting
+        self.assertFalse(event_service.broker.subscribers, "Closed streams should unsubscribe")
+
+    async def test_requires_token(self):
+        response = await AsyncClient().get('/api/v1/file-events/', {'token': 'nope'})
+        self.assertEqual(response.status_code, 401)
+
+    def test_refused_under_wsgi(self):
+        self.assertEqual(self.client.get('/api/v1/file-events/', {'token': self.token}).status_code, 501,
+                         "WSGI servers cannot stream the events")
+
+
+class ProcessTagIndexTestCase(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username='owner', password='password123')
+        make_files(user, 2, tags=['cat'])
+        self.tag_index = ProcessTagIndex()
+
+    def counts(self):
+        return dict(self.tag_index.index.counts)
+
+    def test_rebuild_replays_concurrent_updates(self):
+        def version():
+            # Writes committed while the rebuild runs, which its query does not see
+            self.tag_index.update(['dog'], 1)
+            self.tag_index.update(['cat'], -1)
+            return 1
+
+        self.tag_index.rebuild()
+        with mock.patch('file.services.cache_service.get_collection_version', side_effect=version):
+            self.tag_index.rebuild()
+        self.assertEqual(self.counts(), {'cat': 1, 'dog': 1})
+        self.assertIsNone(self.tag_index.pending)
+        self.tag_index.update(['dog'], 1)
+        self.assertEqual(self.counts(), {'cat': 1, 'dog': 2}, "Updates after the rebuild should not be recorded")
+        self.assertIsNone(self.tag_index.pending)
+
+    def test_signals_apply_tag_changes(self):
+        self.tag_index.rebuild()
+        with mock.patch('file.signals.tag_index', self.tag_index), mock.patch.object(File, 'enrich'), \
+                self.captureOnCommitCallbacks(execute=True):
+            file = File.objects.filter(tags=['cat']).first()
+            file.tags = ['cat', 'dog']
+            file.save()
+            file.save()
+            File.objects.get(pk=file.pk).save(update_fields=['description'])
+            File.objects.only('file_id', 'description').get(pk=file.pk).save(update_fields=['description'])
+            created = File.objects.create(object_key='new.jpg', tags=['bird'])
+            created.delete()
+        self.assertEqual(self.counts(), {'cat': 2, 'dog': 1},
+                         "Each change should be applied once, unchanged and deferred tags ignored")
+
+    def test_deletion_service_removes_tags(self):
+        file, = make_files(File.objects.first().user, tags=['cat', 'dog'])
+        self.tag_index.rebuild()
+        with mock.patch.object(deletion_service, 'tag_index', self.tag_index), \
+                self.captureOnCommitCallbacks(execute=True):
+            DeletionService.delete_files([file.file_id], purge_objects=False)
+        self.assertEqual(self.tag_index.index.search('d'), [], "Tags of deleted files should leave the suggestions")
+        self.assertEqual(self.tag_index.index.search('ca'), [{'tag': 'cat', 'count': 2}])
+
+
+@override_settings(LOCAL_STORAGE_SECRET='test-secret', LOCAL_STORAGE_URL='http://testserver/api/v1/storage/')
+class LocalStorageViewTestCase(SimpleTestCase):
+
+    def setUp(self):
+        self.backend = use_local_storage(self)
+
+    def url(self, method, object_key):
+        return self.backend.signed_url(method, 'media', object_key, 60).removeprefix('http://testserver')
+
+    def test_signed_put(self):
+        response = self.client.put(self.url('PUT', 'a.jpg'), b'hello world', content_type='image/jpeg')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'"{hashlib.md5(b"hello world").hexdigest()}"')
+        self.assertEqual(self.backend.get_range('media', 'a.jpg', 0, 99), b'hello world')
+
+        self.assertEqual(self.client.put(self.url('GET', 'b.jpg'), b'x', content_type='image/jpeg').status_code, 403,
+                         "Signatures are bound to the method")
+        self.assertEqual(self.client.put('/api/v1/storage/media/b.jpg?expires=9999999999&signature=x', b'x',
+                                         content_type='image/jpeg').status_code, 403)
+        self.assertEqual(self.client.delete(self.url('GET', 'a.jpg')).status_code, 405)
+
+    def test_ranges(self):
+        self.backend.put_bytes('media', 'a.jpg', b'hello world', 'image/jpeg')
+        response = self.client.get(self.url('GET', 'a.jpg'))
+        self.assertEqual((response.status_code, b''.join(response.streaming_content), response['Accept-Ranges']),
+                         (200, b'hello world', 'bytes'))
+
+        response = self.client.get(self.url('GET', 'a.jpg'), HTTP_RANGE='bytes=6-')
+        self.assertEqual((response.status_code, b''.join(response.streaming_content)), (206, b'world'))
+        self.assertEqual((response['Content-Range'], response['Content-Length']), ('bytes 6-10/11', '5'))
+
+        response = self.client.get(self.url('GET', 'a.jpg'), HTTP_RANGE='bytes=20-30')
+        self.assertEqual((response.status_code, response['Content-Range']), (416, 'bytes */11'))
+        self.assertEqual(self.client.get(self.url('GET', 'missing.jpg')).status_code, 404)
+
+    def test_content_types(self):
+        self.backend.put_bytes('media', 'a.jpg', b'jpeg', 'image/jpeg')
+        self.backend.put_bytes('media', 'page.html', b'<script>alert(1)</script>', 'text/html')
+        self.backend.put_bytes('media', 'icon.svg', b'<svg onload="alert(1)"/>', 'image/svg+xml')
+
+        response = self.client.get(self.url('GET', 'a.jpg'))
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertFalse(response.get('Content-Disposition', '').startswith('attachment'))
+        for object_key in ('page.html', 'icon.svg'):
+            response = self.client.get(self.url('GET', object_key))
+            self.assertEqual((response['Content-Type'], response['Content-Disposition']),
+                             ('application/octet-stream', 'attachment'),
+                             "Documents that can run scripts should not render on the API origin")
+            self.assertEqual(response['X-Content-Type-Options'], 'nosniff')
+
+
+
+@skipUnless(connection.vendor == 'postgresql', "Requires PostgreSQL")
+class PartitionTableTestCase(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username='owner', password='password123')
+        self.files = make_files(user, 3)
+        File.objects.filter(pk=self.files[0].pk).update(created_datetime=timezone.now() - timedelta(days=400))
+        FileInteraction.objects.create(file=self.files[0], user=user, interaction_type='like')
+        with connection.cursor() as cursor:
+            # Pending deferred foreign key checks of the rows above would forbid altering the tables
+            cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+
+    def constraints(self):
+        """(table, name, type) of the keys of `file` and of the foreign keys referencing it, partitions left out."""
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT conrelid::regclass::text, conname, contype FROM pg_constraint "
+                           "WHERE contype IN ('p', 'u', 'f') AND conparentid = 0 "
+                           "AND (conrelid = 'file'::regclass OR (contype = 'f' AND confrelid = 'file'::regclass))")
+            return set(cursor.fetchall())
+
+    def rows(self):
+        return list(File.objects.order_by('file_id').values_list('file_id', 'object_key', 'created_datetime'))
+
+    def test_refuses_to_drop_constraints(self):
+        constraints = self.constraints()
+        with self.assertRaisesMessage(ValueError, 'file_user_content_sha256_uniq'):
+            partition_table('file', 1)
+        self.assertFalse(is_partitioned('file'))
+        self.assertEqual(self.constraints(), constraints)
+
+    def test_round_trip(self):
+        constraints, rows = self.constraints(), self.rows()
+        self.assertIn(('file', 'file_user_content_sha256_uniq', 'u'), constraints)
+        self.assertIn('file_interaction', {table for table, _, _ in constraints})
+
+        partition_table('file', 1, drop_constraints=True)
+        self.assertTrue(is_partitioned('file'))
+        self.assertEqual(self.rows(), rows)
+        self.assertEqual({(table, contype) for table, _, contype in self.constraints()}, {('file', 'p'), ('file', 'f')},
+                         "Only the primary key and the table's own foreign keys can be kept")
+        new, = File.objects.bulk_create([File(object_key='new.jpg', file_type=File.FileType.IMAGE)])
+        self.assertEqual(new.file_id, rows[-1][0] + 1, "Ids should keep coming from the same sequence")
+
+        unpartition_table('file')
+        self.assertFalse(is_partitioned('file'))
+        self.assertEqual(self.constraints(), constraints,
+                         "The unique constraint and the foreign keys referencing the table should be restored")
+        self.assertEqual(self.rows()[:-1], rows)
+        self.assertEqual(FileInteraction.objects.get().file_id, self.files[0].file_id)
+        newer, = File.objects.bulk_create([File(object_key='newer.jpg', file_type=File.FileType.IMAGE)])
+        self.assertEqual(newer.file_id, new.file_id + 1)
+
+    def test_partition_interactions(self):
+        constraints, interaction = self.constraints(), FileInteraction.objects.get()
+        partition_table('file_interaction', 1)
+        self.assertTrue(is_partitioned('file_interaction'))
+        self.assertEqual(self.constraints(), constraints, "The foreign keys of the table should be kept")
+        self.assertEqual(FileInteraction.objects.get(pk=interaction.pk).file_id, self.files[0].file_id,
+                         "Primary key lookups should still work, probing every partition")
+        unpartition_table('file_interaction')
+        self.assertFalse(is_partitioned('file_interaction'))
+        self.assertEqual(FileInteraction.objects.get().pk, interaction.pk)
+
+    def test_rollback_requires_unpartitioned_tables(self):
+        check_unpartitioned = import_module('file.migrations.0021_partition_file_tables').check_unpartitioned
+        schema_editor = mock.Mock(connection=connection)
+        partition_table('file_interaction', 1)
+        with self.assertRaisesMessage(RuntimeError, 'file_interaction still partitioned'):
+            check_unpartitioned(None, schema_editor)
+        unpartition_table('file_interaction')
+        check_unpartitioned(None, schema_editor)
+
+
+class AsgiStreamingTestCase(TestCase):
+
+    def setUp(self):
+        user = User.objects.create_user(username='owner', password='password123')
+        self.files = make_files(user, 5)
+        self.headers = {'Authorization': f'Bearer {AccessToken.for_user(user)}'}
+        self.produced = []
+
+        def counting_export(*args, **kwargs):
+            for line in stream_export(*args, **kwargs):
+                self.produced.append(line)
+                yield line
+
+        for patcher in (mock.patch('file.views.stream_export', side_effect=counting_export),
+                        mock.patch('file.streaming.STREAM_BATCH_SIZE', 2)):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_streams_under_asgi(self):
+        response = await AsyncClient().get('/api/v1/file/export/', headers=self.headers)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.is_async, "Under ASGI, a sync iterator would be buffered whole")
+        content = response.streaming_content
+        first = await anext(content)
+        self.assertEqual(len(self.produced), 2, "Rows should be read as the response is sent")
+        lines = [first] + [chunk async for chunk in content]
+        self.assertEqual([json.loads(line)['file_id'] for line in lines], [file.file_id for file in self.files])
+
+    async def test_interactions_export_streams_under_asgi(self):
+        file = self.files[0]
+        user = await User.objects.aget(username='owner')
+        for _ in range(3):
+            await FileInteraction.objects.acreate(file=file, user=user, interaction_type='like')
+        with mock.patch('file.views.EXPORT_CHUNK_SIZE', 1):
+            response = await AsyncClient().get(f'/api/v1/file/{file.file_id}/interactions_export/', headers=self.headers)
+            self.assertTrue(response.is_async)
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(len(chunks), 5, "The array should be sent one interaction at a time")
+        self.assertEqual(len(json.loads(b''.join(chunks))), 3)
+
+    @override_settings(LOCAL_STORAGE_SECRET='test-secret', LOCAL_STORAGE_URL='http://testserver/api/v1/storage/')
+    async def test_storage_reads_stream_under_asgi(self):
+        backend = use_local_storage(self)
+        backend.put_bytes('media', 'a.mp4', b'0123456789', 'video/mp4')
+        with mock.patch('file.services.storage_backend.COPY_CHUNK_SIZE', 3):
+            url = backend.signed_url('GET', 'media', 'a.mp4', 60).removeprefix('http://testserver')
+            for headers, status_code, expected in (({}, 200, [b'012', b'345', b'678', b'9']),
+                                                   ({'Range': 'bytes=2-6'}, 206, [b'234', b'56'])):
+                response = await AsyncClient().get(url, headers=headers)
+                self.assertEqual((response.status_code, response.is_async), (status_code, True))
+                self.assertEqual(response['Content-Length'], str(sum(map(len, expected))))
+                self.assertEqual([chunk async for chunk in response.streaming_content], expected,
+                                 "Objects should be sent in chunks, not read whole")
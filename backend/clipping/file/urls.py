@@ -1,6 +1,9 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import FileViewSet, get_pre_signed_urls
+from .views import (
+    FileViewSet, get_pre_signed_urls, create_multipart_upload, get_multipart_part_urls, complete_multipart_upload,
+    abort_multipart_upload, file_events, local_storage_object
+)
 
 router = DefaultRouter()
 router.register(r'file', FileViewSet)
@@ -8,4 +11,11 @@ router.register(r'file', FileViewSet)
 urlpatterns = [
     path('', include(router.urls)),
     path('get-pre-signed-urls/', get_pre_signed_urls, name='get_pre_signed_urls'),
+    path('multipart-uploads/', create_multipart_upload, name='create_multipart_upload'),
+    path('multipart-uploads/<int:session_id>/parts/', get_multipart_part_urls, name='get_multipart_part_urls'),
+    path('multipart-uploads/<int:session_id>/complete/', complete_multipart_upload,
+         name='complete_multipart_upload'),
+    path('multipart-uploads/<int:session_id>/', abort_multipart_upload, name='abort_multipart_upload'),
+    path('file-events/', file_events, name='file_events'),
+    path('storage/<str:bucket_name>/<path:object_key>', local_storage_object, name='local_storage_object'),
 ]
@@ -1,15 +1,157 @@
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework import viewsets, status
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.decorators import api_view, permission_classes, authentication_classes
-from .models import File, FileInteraction
+from .models import File, FileInteraction, UploadSession, UserFileStats, is_sha256_hex, merge_tags
 from .serializers import FileSerializer, FileInteractionSerializer
 from .services.r2_service import R2Service  # Ensure this is the correct import
+from .services.content_token import make_content_token
+from .services.deletion_service import DeletionService
+from .services.export_service import EXPORT_FORMATS, NDJSON, parse_updated_since, stream_export
+from .services.stats_service import STAT_FIELDS
+from .services import cache_service, event_service, feature_service, probe_service, score_service
+from .services.tag_index import DEFAULT_SUGGESTIONS, MAX_SUGGESTIONS, tag_index
+from .services.storage_router import route_upload
+from .services.storage_backend import (
+    ChecksumMismatch, LocalBackend, get_storage_backend, iter_chunks, iter_file_range, parse_range, verify_local_url
+)
+import json
 import logging
 from collections import Counter
-from rest_framework.exceptions import PermissionDenied  # Import for 403 responses
+from rest_framework.exceptions import PermissionDenied, ValidationError  # Import for 403/400 responses
 from rest_framework.permissions import BasePermission
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Count, Max, Case, When, Window
+from django.db.models.functions import RowNumber
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseBadRequest, HttpResponseForbidden, HttpResponseNotAllowed,
+    JsonResponse,
+    StreamingHttpResponse
+)
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from .pagination import paginate_keyset
+from .streaming import is_asgi_request, streaming_response
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from datetime import timedelta
+import math
+import asyncio
+
+logger = logging.getLogger('my_logger')
+
+# Upper bounds for the batched interaction summary endpoint
+MAX_SUMMARY_FILE_IDS = 100
+DEFAULT_SUMMARY_LATEST = 3
+MAX_SUMMARY_LATEST = 20
+
+# Keyset pagination of a file's interactions
+INTERACTION_KEYSET = ('created_datetime', 'interaction_id')
+DEFAULT_INTERACTIONS_PAGE_SIZE = 50
+MAX_INTERACTIONS_PAGE_SIZE = 200
+EXPORT_CHUNK_SIZE = 1000
+
+# Keyset pagination of the trending feed, over the file_score index
+TRENDING_KEYSET = ('trending_score', 'file_id')
+MAX_TRENDING_PAGE_SIZE = 100
+
+# Multipart uploads: R2 requires every part but the last to be between 5 MiB and 5 GiB, and at most 10000 parts
+MULTIPART_MIN_PART_SIZE = 8 * 1024 * 1024
+MULTIPART_MAX_PARTS = 10000
+MULTIPART_MAX_PART_URLS = 1000  # Part URLs presigned per request
+MULTIPART_MAX_PART_SIZE = 5 * 1024 ** 3
+MULTIPART_SESSION_TTL = timedelta(hours=24)
+
+# Operations accepted by one bulk update request
+MAX_BULK_OPERATIONS = 500
+MAX_TAG_LENGTH = 50
+
+
+def serialize_interaction(interaction):
+    """
+    Build the response payload of a single interaction, including username and user_id.
+    Requires the interaction to be loaded with `select_related('user')`.
+    """
+    return {
+        'interaction_id': interaction.interaction_id,
+        'user_id': interaction.user.id,
+        'username': interaction.user.username,
+        'interaction_type': interaction.interaction_type,
+        'comment': interaction.comment,
+        'created_datetime': interaction.created_datetime
+    }
+
+
+def parse_id_list(raw_value):
+    """
+    Parse a comma separated list of integer ids, e.g. '1,2,3'. Duplicates are dropped, order is kept.
+    Raises ValueError on malformed input.
+    """
+    ids = []
+    for part in (raw_value or '').split(','):
+        part = part.strip()
+        if not part:
+            continue
+        value = int(part)
+        if value not in ids:
+            ids.append(value)
+    return ids
+
+
+def parse_datetime_range(raw_value):
+    """
+    Parse a 'start,end' range of ISO 8601 dates or datetimes, either bound may be empty, e.g. '2024-06-01,'.
+    Returns (start, end) with an exclusive end; a date as end includes that whole day.
+    Raises ValueError on malformed input.
+    """
+    bounds = (raw_value or '').split(',')
+    if len(bounds) != 2:
+        raise ValueError("Expected two comma separated bounds.")
+    start, end = (parse_updated_since(bound.strip()) for bound in bounds)
+    if end is not None and parse_date(bounds[1].strip()) is not None:
+        end += timedelta(days=1)
+    return start, end
+
+
+def parse_bulk_operations(operations):
+    """
+    Validate the operations of a bulk update: a list of {file_id, add_tags, remove_tags, description},
+    where every key but file_id is optional and each file appears once.
+    Raises ValueError with a message describing the first invalid operation.
+    """
+    if not isinstance(operations, list) or not 0 < len(operations) <= MAX_BULK_OPERATIONS:
+        raise ValueError(f"Expected a list of 1 to {MAX_BULK_OPERATIONS} operations.")
+
+    seen = set()
+    for index, operation in enumerate(operations):
+        if not isinstance(operation, dict) or not isinstance(operation.get('file_id'), int):
+            raise ValueError(f"Operation {index} must be an object with an integer file_id.")
+        if operation['file_id'] in seen:
+            raise ValueError(f"File {operation['file_id']} appears in several operations.")
+        seen.add(operation['file_id'])
+        for key in ('add_tags', 'remove_tags'):
+            tags = operation.get(key, [])
+            if not isinstance(tags, list) or not all(isinstance(tag, str) and 0 < len(tag) <= MAX_TAG_LENGTH
+                                                     for tag in tags):
+                raise ValueError(f"{key} of operation {index} must be a list of tags of 1 to "
+                                 f"{MAX_TAG_LENGTH} characters.")
+        if 'description' in operation and not isinstance(operation['description'], (str, type(None))):
+            raise ValueError(f"description of operation {index} must be a string or null.")
+    return operations
+
+
+def apply_bulk_operation(file, operation):
+    """Apply one validated bulk operation to a file in memory. Returns whether anything changed."""
+    removed = set(operation.get('remove_tags', []))
+    tags = merge_tags([tag for tag in file.tags if tag not in removed], operation.get('add_tags', []))
+    description = operation.get('description', file.description)
+    changed = tags != file.tags or description != file.description
+    file.tags, file.description = tags, description
+    return changed
 
 
 class IsGuestUserOrReadOnly(BasePermission):
@@ -38,6 +180,115 @@ class FileViewSet(viewsets.ModelViewSet):
     serializer_class = FileSerializer
     permission_classes = [IsGuestUserOrReadOnly]
 
+    def get_queryset(self):
+        """
+        Supports tag filtering on the file list, e.g. /api/v1/file/?tags=cat,dog&match=any
+
+        - `match=all` (default): files having every tag, compiled to `tags @> ARRAY[...]`.
+        - `match=any`: files having at least one of the tags, compiled to `tags && ARRAY[...]`.
+        Both are served by the GIN index on `file.tags`.
+
+        Owner filtering, e.g. /api/v1/file/?user=3 or /api/v1/file/?mine=1, is served by the
+        (user_id, created_datetime) index.
+
+        Creation time filtering, e.g. /api/v1/file/?created_after=2026-01-01&created_before=2026-04-01, only
+        scans the matching months when the table is partitioned (see services.partition_service).
+
+        Filters on the features extracted from images (see services.feature_service):
+        - `color=red,blue`: images where all the colors are dominant, served by the GIN index on `dominant_colors`.
+        - `taken_between=2024-06-01,2024-08-31`: images captured in the range (EXIF time, end date included),
+          either bound may be left empty. Served by the `taken_datetime` index.
+        """
+        queryset = super().get_queryset()
+        if self.action != 'list':
+            return queryset
+
+        if self.request.query_params.get('mine') in ('1', 'true'):
+            if not self.request.user.is_authenticated:
+                raise ValidationError({'mine': "Log in to list your own files."})
+            queryset = queryset.filter(user_id=self.request.user.id)
+        elif self.request.query_params.get('user'):
+            try:
+                queryset = queryset.filter(user_id=int(self.request.query_params['user']))
+            except ValueError:
+                raise ValidationError({'user': "user must be an integer user id."})
+
+        for param, lookup in (('created_after', 'created_datetime__gte'), ('created_before', 'created_datetime__lt')):
+            try:
+                value = parse_updated_since(self.request.query_params.get(param))
+            except ValueError:
+                raise ValidationError({param: f"{param} must be an ISO 8601 date or datetime."})
+            if value is not None:
+                queryset = queryset.filter(**{lookup: value})
+
+        colors = [color.strip().lower() for color in self.request.query_params.get('color', '').split(',')
+                  if color.strip()]
+        if colors:
+            unknown = sorted(set(colors) - set(feature_service.COLOR_NAMES))
+            if unknown:
+                raise ValidationError({'color': f"Unknown colors {', '.join(unknown)}. Allowed values: "
+                                                f"{', '.join(feature_service.COLOR_NAMES)}."})
+            queryset = queryset.filter(dominant_colors__contains=colors)
+
+        if self.request.query_params.get('taken_between'):
+            try:
+                taken_after, taken_before = parse_datetime_range(self.request.query_params['taken_between'])
+            except ValueError:
+                raise ValidationError({'taken_between': "taken_between must be two comma separated ISO 8601 "
+                                                        "dates or datetimes, e.g. 2024-06-01,2024-08-31."})
+            if taken_after is not None:
+                queryset = queryset.filter(taken_datetime__gte=taken_after)
+            if taken_before is not None:
+                queryset = queryset.filter(taken_datetime__lt=taken_before)
+
+        tags = [tag.strip() for tag in self.request.query_params.get('tags', '').split(',') if tag.strip()]
+        if tags:
+            match = self.request.query_params.get('match', 'all')
+            if match == 'all':
+                queryset = queryset.filter(tags__contains=tags)
+            elif match == 'any':
+                queryset = queryset.filter(tags__overlap=tags)
+            else:
+                raise ValidationError({'match': "Invalid match. Allowed values: all, any."})
+
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        """
+        Supports `ordering=trending`, e.g. /api/v1/file/?ordering=trending&limit=20, ordering files by their
+        time-decayed like/comment score. Trending pages are keyset paginated on (score, file_id): pass the
+        returned `next_cursor` as `cursor` to fetch the following page. Files without interactions are left out.
+        """
+        ordering = request.query_params.get('ordering')
+        if ordering is None:
+            # Pages are cached per query string and collection version, `mine` pages per user as well
+            params = request.query_params.dict()
+            user_id = request.user.id if 'mine' in params else None
+            key = cache_service.make_key('list', params, user_id)
+            data = cache_service.get_or_compute(
+                key, lambda: super(FileViewSet, self).list(request, *args, **kwargs).data
+            )
+            return Response(data, status=status.HTTP_200_OK)
+        if ordering != 'trending':
+            raise ValidationError({'ordering': "Invalid ordering. Allowed values: trending."})
+
+        queryset = self.filter_queryset(self.get_queryset()).filter(score__isnull=False).annotate(
+            trending_score=F('score__score')
+        )
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', self.paginator.page_size)),
+                               MAX_TRENDING_PAGE_SIZE))
+            page, next_cursor = paginate_keyset(
+                queryset, TRENDING_KEYSET, request.query_params.get('cursor'), limit, descending=True
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'results': self.get_serializer(page, many=True).data,
+            'next_cursor': next_cursor,
+        }, status=status.HTTP_200_OK)
+
     def create(self, request, *args, **kwargs):
 
         if isinstance(request.data, list):
@@ -54,7 +305,13 @@ class FileViewSet(viewsets.ModelViewSet):
 
     def perform_create(self, serializer):
         user = self.request.user
-        serializer.save(user=user)
+        created = serializer.save(user=user)
+
+        # Fill in the dimensions the client did not send, from the stored object's header
+        files = created if isinstance(created, list) else [created]
+        probe_service.schedule_probe([file.file_id for file in files if file.width is None or file.height is None])
+        # EXIF and dominant colors are computed locally, in worker processes
+        feature_service.schedule_extraction([file.file_id for file in files if file.file_type == File.FileType.IMAGE])
 
     def destroy(self, request, *args, **kwargs):
         """
@@ -65,8 +322,8 @@ class FileViewSet(viewsets.ModelViewSet):
 
         # Check if the authenticated user owns the file
         if file.user_id != user.id:
-            logging.error(
-                f"User {user.username} [{user.id}] attempted to delete file {file.user_id} but does not own it."
+            logger.error(
+                "User %s [%s] attempted to delete file %s but does not own it.", user.username, user.id, file.file_id
             )
             raise PermissionDenied(detail="You do not have permission to delete this file.")
 
@@ -76,49 +333,198 @@ class FileViewSet(viewsets.ModelViewSet):
 
     def perform_destroy(self, instance):
         """
-        Perform the deletion of the file instance.
+        Perform the deletion of the file instance, its interactions and its R2 objects.
         """
-        instance.delete()
+        DeletionService.delete_files([instance.file_id])
 
     # Custom action for deleting all files, e.g. /api/v1/file/delete_all/, WARNING: use this method with caution
-    @action(detail=False, methods=['delete'], permission_classes=[IsAuthenticated])
+    @action(detail=False, methods=['delete'], permission_classes=[IsAdminUser])
     def delete_all(self, request):
+        """
+        Start deleting all files of every user, their interactions and their R2 objects in the background.
+        Restricted to staff.
+        Poll /api/v1/file/deletion_status/?job_id=<job_id> for progress.
+        """
         try:
-            # Count interactions before deleting files
-            interaction_count = FileInteraction.objects.count()
-
-            # Delete all files (this will also cascade delete all interactions due to on_delete=models.CASCADE)
-            file_count, _ = File.objects.all().delete()
-
+            job = DeletionService.delete_all_files()
             return Response({
                 'success': True,
-                'message': f"Deleted {file_count} file(s) and {interaction_count} interaction(s)."
-            }, status=status.HTTP_200_OK)
+                'message': "Deletion of all files started.",
+                'job': job.to_dict()
+            }, status=status.HTTP_202_ACCEPTED)
         except Exception as e:
-            logging.error(f"Exception occurred while deleting all files and interactions: {e}")
+            logger.error("Exception occurred while deleting all files and interactions: %s", e)
             return Response({
                 'success': False,
                 'message': 'An error occurred while trying to delete all files and interactions.'
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def deletion_status(self, request):
+        """
+        Report the progress of a deletion job started by `delete_all`.
+        """
+        job = DeletionService.get_job(request.query_params.get('job_id', ''))
+        if job is None:
+            return Response({"error": "Deletion job not found."}, status=status.HTTP_404_NOT_FOUND)
+        return Response(job.to_dict(), status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def export(self, request):
+        """
+        Stream the whole file catalog, e.g.
+        /api/v1/file/export/?export_format=csv&updated_since=2026-10-01T00:00:00Z&interactions=1
+
+        - `export_format`: `ndjson` (default, one JSON object per line) or `csv`.
+        - `updated_since`: only files updated at or after this ISO 8601 datetime or date.
+        - `interactions=1`: add `like_count` and `comment_count` columns.
+        Rows are read with a server-side cursor and written as they arrive, so memory stays flat.
+        (`format` is reserved by DRF for renderer selection, hence `export_format`.)
+        """
+        export_format = request.query_params.get('export_format', NDJSON)
+        if export_format not in EXPORT_FORMATS:
+            return Response({"error": f"Invalid export_format. Allowed values: {', '.join(EXPORT_FORMATS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            updated_since = parse_updated_since(request.query_params.get('updated_since'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        with_interactions = request.query_params.get('interactions') in ('1', 'true')
+
+        response = streaming_response(
+            request,
+            stream_export(export_format, updated_since, with_interactions),
+            content_type=EXPORT_FORMATS[export_format],
+        )
+        response['Content-Disposition'] = f'attachment; filename="files.{export_format}"'
+        return response
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def user_stats(self, request):
+        """
+        Gallery aggregates of a user (the requesting user by default), e.g. /api/v1/file/user_stats/?user=3
+
+        Read from the incrementally maintained user_file_stats row, not counted on request.
+        """
+        try:
+            user_id = int(request.query_params.get('user', request.user.id))
+        except ValueError:
+            return Response({"error": "user must be an integer user id."}, status=status.HTTP_400_BAD_REQUEST)
+
+        stats = UserFileStats.objects.filter(user_id=user_id).values(*STAT_FIELDS).first()
+        return Response({'user_id': user_id, **(stats or dict.fromkeys(STAT_FIELDS, 0))}, status=status.HTTP_200_OK)
+
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def unique_tags(self, request):
         """
         Custom endpoint to retrieve all unique tags from File model,
         count their occurrences, and rank them by frequency.
         """
-        tags_counter = Counter()
-        files = self.get_queryset().values('tags')
+        def rank_tags():
+            tags_counter = Counter()
+            files = self.get_queryset().values('tags')
 
-        for file in files:
-            tags_counter.update(file['tags'])  # Update counter with tags from each file
+            for file in files:
+                tags_counter.update(file['tags'])  # Update counter with tags from each file
 
-        # Convert counter to a list of dictionaries sorted by count
-        sorted_tags = sorted(tags_counter.items(), key=lambda x: x[1], reverse=True)
-        ranked_tags = [{"tag": tag, "count": count} for idx, (tag, count) in enumerate(sorted_tags)]
+            # Convert counter to a list of dictionaries sorted by count
+            sorted_tags = sorted(tags_counter.items(), key=lambda x: x[1], reverse=True)
+            return [{"tag": tag, "count": count} for idx, (tag, count) in enumerate(sorted_tags)]
 
+        ranked_tags = cache_service.get_or_compute(cache_service.make_key('unique_tags', {}), rank_tags)
         return Response({"tags": ranked_tags}, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated], url_path='tags/autocomplete')
+    def tags_autocomplete(self, request):
+        """
+        Suggest tags for a typed prefix, most used first, e.g. /api/v1/file/tags/autocomplete/?q=ca&limit=10
+
+        Answered from the in-memory prefix index of this process, matching is case and width insensitive.
+        """
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', DEFAULT_SUGGESTIONS)), MAX_SUGGESTIONS))
+        except ValueError:
+            return Response({"error": "limit must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        suggestions = tag_index.get().search(request.query_params.get('q', ''), limit)
+        return Response({"tags": suggestions}, status=status.HTTP_200_OK)
+
+    @action(detail=False, methods=['patch'], permission_classes=[IsGuestUserOrReadOnly])
+    def bulk(self, request):
+        """
+        Edit the tags and descriptions of many files in one request, e.g. PATCH /api/v1/file/bulk/ with
+        [{"file_id": 1, "add_tags": ["cat"], "remove_tags": ["dog"], "description": "..."}, ...]
+
+        Every file must belong to the requesting user. The rows are locked and checked with a single query
+        and written with one bulk UPDATE in a single transaction; enrichment is never triggered.
+        """
+        try:
+            operations = parse_bulk_operations(request.data)
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        file_ids = [operation['file_id'] for operation in operations]
+        with transaction.atomic():
+            files = {
+                file.file_id: file
+                for file in File.objects.select_for_update()
+                .filter(file_id__in=file_ids)
+                .only('file_id', 'user_id', 'tags', 'description')
+            }
+            missing = [file_id for file_id in file_ids if file_id not in files]
+            if missing:
+                return Response({"error": "Files not found.", "file_ids": missing}, status=status.HTTP_404_NOT_FOUND)
+            not_owned = [file_id for file_id, file in files.items() if file.user_id != request.user.id]
+            if not_owned:
+                logger.error("User %s attempted to bulk update files %s it does not own", request.user.id, not_owned)
+                raise PermissionDenied(detail="You do not have permission to update these files.")
+
+            old_tags = {file_id: list(file.tags) for file_id, file in files.items()}
+            now = timezone.now()
+            updated = []
+            for operation in operations:
+                file = files[operation['file_id']]
+                if apply_bulk_operation(file, operation):
+                    file.last_updated_datetime = now
+                    updated.append(file)
+            # bulk_update bypasses File.save() and its signals: maintain the caches and events here
+            File.objects.bulk_update(updated, ['tags', 'description', 'last_updated_datetime'])
+
+            if updated:
+                cache_service.bump_collection_version()
+                added = [tag for file in updated for tag in set(file.tags) - set(old_tags[file.file_id])]
+                removed = [tag for file in updated for tag in set(old_tags[file.file_id]) - set(file.tags)]
+
+                def update_tag_index():
+                    tag_index.update(removed, -1)
+                    tag_index.update(added, 1)
+
+                transaction.on_commit(update_tag_index)
+                for file in updated:
+                    event_service.publish(event_service.FILE_UPDATED, file_id=file.file_id, tags=file.tags,
+                                          description=file.description)
+
+        return Response({
+            "updated": [{"file_id": file.file_id, "tags": file.tags, "description": file.description}
+                        for file in updated],
+            "unchanged": len(operations) - len(updated),
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'], permission_classes=[IsGuestUserOrReadOnly])
+    def enrich(self, request, pk=None):
+        """
+        Regenerate the caption and tags of a file now, e.g. after automatic enrichment gave up.
+        Only the owner may request it.
+        """
+        file = self.get_object()
+        if file.user_id != request.user.id:
+            raise PermissionDenied(detail="You do not have permission to enrich this file.")
+
+        file.enrichment_attempts = 0
+        file.save(enrich=True)
+        event_service.publish(event_service.FILE_ENRICHED, file_id=file.file_id, tags=file.tags)
+        return Response(self.get_serializer(file).data, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=['post'], permission_classes=[IsGuestUserOrReadOnly])
     def interact(self, request, pk=None):
         """
@@ -157,6 +563,7 @@ class FileViewSet(viewsets.ModelViewSet):
                 user=user,
                 interaction_type=FileInteraction.InteractionType.LIKE
             )
+            score_service.add_interaction(file.file_id, like_interaction.interaction_type)
 
             # Return the created "like" interaction
             serializer = FileInteractionSerializer(like_interaction)
@@ -187,33 +594,149 @@ class FileViewSet(viewsets.ModelViewSet):
                     interaction_type=FileInteraction.InteractionType.COMMENT,
                     comment=comment
                 )
+                score_service.add_interaction(file.file_id, new_comment.interaction_type)
                 serializer = FileInteractionSerializer(new_comment)
                 return Response(serializer.data, status=status.HTTP_201_CREATED)
 
         # If the interaction type is neither 'like' nor 'comment', return an error
         return Response({"error": "Unsupported interaction type."}, status=status.HTTP_400_BAD_REQUEST)
 
+    def _get_interactions_queryset(self, file, interaction_type):
+        """
+        Interactions of `file`, optionally restricted to one interaction type.
+        Raises ValueError for an unknown interaction type.
+        """
+        interactions = FileInteraction.objects.filter(file=file).select_related('user')
+        if interaction_type:
+            if interaction_type not in FileInteraction.InteractionType.values:
+                raise ValueError("Invalid interaction type.")
+            interactions = interactions.filter(interaction_type=interaction_type)
+        return interactions
+
     @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
     def interactions(self, request, pk=None):
         """
-        Get all interactions for the given file (likes, comments) along with username and user_id.
+        Get the interactions for the given file (likes, comments) along with username and user_id,
+        one page at a time, e.g. /api/v1/file/1/interactions/?interaction_type=comment&limit=50&order=desc
+
+        Pages are keyset paginated on (created_datetime, interaction_id): pass the returned `next_cursor`
+        as `cursor` to fetch the following page.
         """
         file = self.get_object()
-        interactions = FileInteraction.objects.filter(file=file).select_related('user')
+        descending = request.query_params.get('order', 'asc') == 'desc'
+
+        try:
+            limit = max(1, min(int(request.query_params.get('limit', DEFAULT_INTERACTIONS_PAGE_SIZE)),
+                               MAX_INTERACTIONS_PAGE_SIZE))
+            interactions = self._get_interactions_queryset(file, request.query_params.get('interaction_type'))
+            page, next_cursor = paginate_keyset(
+                interactions, INTERACTION_KEYSET, request.query_params.get('cursor'), limit, descending
+            )
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        return Response({
+            'results': [serialize_interaction(interaction) for interaction in page],
+            'next_cursor': next_cursor,
+        }, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['get'], permission_classes=[IsAuthenticated])
+    def interactions_export(self, request, pk=None):
+        """
+        Stream all interactions of the given file as a JSON array, e.g. /api/v1/file/1/interactions_export/
+
+        Rows are read in keyset-paginated chunks, so memory stays bounded however many interactions the file has.
+        """
+        file = self.get_object()
+        try:
+            interactions = self._get_interactions_queryset(file, request.query_params.get('interaction_type'))
+        except ValueError as e:
+            return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        def stream():
+            yield '['
+            cursor, first = None, True
+            while True:
+                page, cursor = paginate_keyset(interactions, INTERACTION_KEYSET, cursor, EXPORT_CHUNK_SIZE)
+                for interaction in page:
+                    yield ('' if first else ',') + json.dumps(serialize_interaction(interaction), cls=DjangoJSONEncoder)
+                    first = False
+                if cursor is None:
+                    break
+            yield ']'
+
+        response = streaming_response(request, stream(), content_type='application/json')
+        response['Content-Disposition'] = f'attachment; filename="file_{file.file_id}_interactions.json"'
+        return response
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
+    def interactions_summary(self, request):
+        """
+        Get the interaction summary of a page of files in one request, e.g.
+        /api/v1/file/interactions_summary/?file_ids=1,2,3&latest=3
+
+        For each file: like/comment counts, the requesting user's like (if any) and the latest `latest`
+        likes and comments. Everything is fetched with a single window-function query.
+        """
+        try:
+            file_ids = parse_id_list(request.query_params.get('file_ids'))
+        except ValueError:
+            return Response({"error": "file_ids must be a comma separated list of integers."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            latest = int(request.query_params.get('latest', DEFAULT_SUMMARY_LATEST))
+        except ValueError:
+            return Response({"error": "latest must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+
+        if not file_ids:
+            return Response({"error": "file_ids parameter is required."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(file_ids) > MAX_SUMMARY_FILE_IDS:
+            return Response({"error": f"At most {MAX_SUMMARY_FILE_IDS} file_ids are allowed per request."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        latest = max(0, min(latest, MAX_SUMMARY_LATEST))
+
+        per_type = [F('file_id'), F('interaction_type')]
+        interactions = FileInteraction.objects.filter(file_id__in=file_ids).select_related('user').annotate(
+            # ROW_NUMBER() OVER (PARTITION BY file_id, interaction_type ORDER BY created_datetime DESC)
+            row_number=Window(
+                RowNumber(),
+                partition_by=per_type,
+                order_by=[F('created_datetime').desc(), F('interaction_id').desc()]
+            ),
+            type_count=Window(Count('interaction_id'), partition_by=per_type),
+            my_like_id=Window(
+                Max(Case(When(Q(user_id=request.user.id, interaction_type=FileInteraction.InteractionType.LIKE),
+                              then=F('interaction_id')))),
+                partition_by=[F('file_id')]
+            ),
+        ).filter(row_number__lte=max(latest, 1)).order_by('file_id', 'interaction_type', 'row_number')
+
+        summaries = {
+            file_id: {
+                'file_id': file_id,
+                'like_count': 0,
+                'comment_count': 0,
+                'my_like_id': None,
+                'latest_likes': [],
+                'latest_comments': [],
+            } for file_id in file_ids
+        }
 
-        # Prepare a custom response to include username and user_id
-        interaction_list = []
         for interaction in interactions:
-            interaction_list.append({
-                'interaction_id': interaction.interaction_id,
-                'user_id': interaction.user.id,
-                'username': interaction.user.username,
-                'interaction_type': interaction.interaction_type,
-                'comment': interaction.comment,
-                'created_datetime': interaction.created_datetime
-            })
+            summary = summaries[interaction.file_id]
+            summary['my_like_id'] = interaction.my_like_id
+            if interaction.interaction_type == FileInteraction.InteractionType.LIKE:
+                summary['like_count'] = interaction.type_count
+                latest_list = summary['latest_likes']
+            else:
+                summary['comment_count'] = interaction.type_count
+                latest_list = summary['latest_comments']
+
+            # Row 1 is always fetched to carry the counts, even when `latest` is 0
+            if interaction.row_number <= latest:
+                latest_list.append(serialize_interaction(interaction))
 
-        return Response(interaction_list, status=status.HTTP_200_OK)
+        return Response(list(summaries.values()), status=status.HTTP_200_OK)
 
     @action(detail=True, methods=['delete'], permission_classes=[IsGuestUserOrReadOnly])
     def delete_interaction(self, request, pk=None):
@@ -249,8 +772,9 @@ class FileViewSet(viewsets.ModelViewSet):
         except FileInteraction.DoesNotExist:
             return Response({"error": "Interaction not found."}, status=status.HTTP_404_NOT_FOUND)
 
-        # Finally, delete the interaction
+        # Finally, delete the interaction and take it out of the trending score
         interaction.delete()
+        score_service.remove_interaction(file.file_id, interaction.interaction_type, interaction.created_datetime)
         return Response({"message": f"{interaction_type.capitalize()} interaction deleted successfully."},
                         status=status.HTTP_204_NO_CONTENT)
 
@@ -262,26 +786,57 @@ def get_pre_signed_urls(request):
     # Extract the list of object keys from the POST request
     objects = request.data
 
-    print(f"Received request to generate pre-signed URLs for: {objects}")
+    logger.debug("Received request to generate pre-signed URLs for %d object(s)",
+                 len(objects) if isinstance(objects, list) else 0)
 
-    # Validate that object_keys is a list of strings
-    if not isinstance(objects, list) or not all(isinstance(key['object_key'], str) for key in objects):
-        print(f"Invalid input: {objects}")
+    # Validate that object_keys is a list of strings, with an optional content hash
+    if (not isinstance(objects, list)
+            or not all(isinstance(item, dict) and isinstance(item.get('object_key'), str) for item in objects)
+            or not all(item.get('sha256') is None or is_sha256_hex(item['sha256']) for item in objects)):
+        logger.warning("Invalid pre-signed URL request input")
         return Response({
             'success': False,
-            'message': 'Invalid input, expected a list of object keys.',
+            'message': 'Invalid input, expected a list of object keys with optional lower-case hex sha256.',
             'data': None
         }, status=status.HTTP_400_BAD_REQUEST)
 
     try:
-        # Extract the actual keys from dictionaries
-        # Get pre-signed URLs for the object keys
-        pre_signed_urls = R2Service.get_pre_signed_urls(objects)
-        if pre_signed_urls is None:
-            raise ValueError("Failed to generate pre-signed URLs due to a service error.")
+        # Content the user already stores needs no upload: answer with their existing file instead of a URL.
+        # Other users' files are never matched, the digest is only the client's claim.
+        stored = {
+            sha256: (file_id, object_key, bucket_name)
+            for sha256, file_id, object_key, bucket_name in
+            File.objects.filter(user=request.user,
+                                content_sha256__in={item['sha256'] for item in objects if item.get('sha256')})
+            .values_list('content_sha256', 'file_id', 'object_key', 'bucket_name')
+        }
+        to_sign = [item for item in objects if item.get('sha256') not in stored]
+
+        # Get pre-signed URLs for the other object keys, in the buckets routed for this user. URLs of objects
+        # with a digest only accept that content, and come with the token letting the File row record it.
+        signed = iter(R2Service.get_pre_signed_urls(to_sign, user_id=request.user.id) if to_sign else [])
+        pre_signed_urls = []
+        for item in objects:
+            if item.get('sha256') in stored:
+                file_id, object_key, bucket_name = stored[item['sha256']]
+                pre_signed_urls.append({
+                    "original_object_key": item['object_key'],
+                    "unique_object_key": object_key,
+                    "bucket_name": bucket_name,
+                    "file_id": file_id,
+                    "pre_signed_url": None,
+                    "already_stored": True
+                })
+            else:
+                url = next(signed)
+                if item.get('sha256'):
+                    url['content_token'] = make_content_token(request.user.id, url['bucket_name'],
+                                                              url['unique_object_key'], item['sha256'])
+                pre_signed_urls.append({**url, "already_stored": False})
+        logger.debug("%d of %d object(s) already stored", len(objects) - len(to_sign), len(objects))
 
     except Exception as e:
-        print(f"Error generating pre-signed URLs: {e}")
+        logger.error("Error generating pre-signed URLs: %s", e)
         return Response({
             'success': False,
             'message': 'An error occurred while generating pre-signed URLs.',
@@ -293,3 +848,285 @@ def get_pre_signed_urls(request):
         'message': 'Pre-signed URLs generated successfully.',
         'data': pre_signed_urls
     }, status=status.HTTP_200_OK)
+
+
+def get_open_upload_session(request, session_id):
+    """
+    Fetch an open upload session owned by the requesting user, or raise 404.
+    Expired sessions are treated as missing, the sweeper aborts them.
+    """
+    return get_object_or_404(
+        UploadSession,
+        session_id=session_id,
+        user=request.user,
+        status=UploadSession.Status.OPEN,
+        expires_datetime__gt=timezone.now()
+    )
+
+
+@api_view(['POST'])
+@permission_classes([IsGuestUserOrReadOnly])
+def create_multipart_upload(request):
+    """
+    Start a multipart upload session for a large file.
+
+    Expects `object_key`, `file_type`, `size` (bytes) and optionally `content_type` and `part_size`.
+    Returns the session with the part size and count the client must use.
+    """
+    object_key = request.data.get('object_key')
+    file_type = request.data.get('file_type')
+    try:
+        size = int(request.data.get('size'))
+        part_size = max(int(request.data.get('part_size', MULTIPART_MIN_PART_SIZE)), MULTIPART_MIN_PART_SIZE)
+    except (TypeError, ValueError):
+        return Response({'success': False, 'message': 'size and part_size must be integers.', 'data': None},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    if not isinstance(object_key, str) or not object_key.strip() or size <= 0:
+        return Response({'success': False, 'message': 'Invalid input, expected an object key and a size.',
+                         'data': None}, status=status.HTTP_400_BAD_REQUEST)
+    if size > settings.MAX_UPLOAD_SIZE:
+        return Response({'success': False, 'message': f'Uploads are limited to {settings.MAX_UPLOAD_SIZE} bytes.',
+                         'data': None}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Grow the parts if needed to stay within the part count limit
+    part_size = min(max(part_size, math.ceil(size / MULTIPART_MAX_PARTS)), MULTIPART_MAX_PART_SIZE)
+    part_count = math.ceil(size / part_size)
+
+    bucket_name = route_upload(R2Service.normalize_key(object_key), file_type, request.user.id)
+    try:
+        upload_id, unique_object_key, content_type = R2Service.create_multipart_upload(
+            object_key, file_type, request.data.get('content_type'), bucket_name
+        )
+    except Exception as e:
+        logger.error("Error creating multipart upload for %s: %s", object_key, e)
+        return Response({'success': False, 'message': 'An error occurred while creating the upload session.',
+                         'data': None}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    session = UploadSession.objects.create(
+        upload_id=upload_id,
+        bucket_name=bucket_name,
+        object_key=unique_object_key,
+        content_type=content_type,
+        size=size,
+        part_size=part_size,
+        part_count=part_count,
+        user=request.user,
+        expires_datetime=timezone.now() + MULTIPART_SESSION_TTL
+    )
+
+    return Response({
+        'success': True,
+        'message': 'Upload session created successfully.',
+        'data': {
+            'session_id': session.session_id,
+            'original_object_key': object_key,
+            'unique_object_key': session.object_key,
+            'bucket_name': session.bucket_name,
+            'content_type': session.content_type,
+            'part_size': session.part_size,
+            'part_count': session.part_count,
+            'expires_datetime': session.expires_datetime,
+        }
+    }, status=status.HTTP_201_CREATED)
+
+
+@api_view(['POST'])
+@permission_classes([IsGuestUserOrReadOnly])
+def get_multipart_part_urls(request, session_id):
+    """
+    Presign upload URLs for several parts of a session in one call.
+    Expects `part_numbers` (1-based); defaults to every part of the session. Clients retrying
+    failed parts only request URLs for those.
+    """
+    session = get_open_upload_session(request, session_id)
+    part_numbers = request.data.get('part_numbers') or list(range(1, session.part_count + 1))
+
+    if (not isinstance(part_numbers, list) or len(part_numbers) > MULTIPART_MAX_PART_URLS
+            or not all(isinstance(n, int) and 1 <= n <= session.part_count for n in part_numbers)):
+        return Response({'success': False, 'data': None,
+                         'message': f'part_numbers must be at most {MULTIPART_MAX_PART_URLS} part numbers '
+                                    f'between 1 and {session.part_count}.'},
+                        status=status.HTTP_400_BAD_REQUEST)
+
+    expiration = max(60, int((session.expires_datetime - timezone.now()).total_seconds()))
+    try:
+        part_urls = R2Service.get_pre_signed_part_urls(
+            session.object_key, session.upload_id, part_numbers, min(expiration, 3600), session.bucket_name
+        )
+    except Exception as e:
+        logger.error("Error presigning parts of upload session %s: %s", session.session_id, e)
+        return Response({'success': False, 'message': 'An error occurred while generating part URLs.',
+                         'data': None}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    return Response({'success': True, 'message': 'Part URLs generated successfully.', 'data': part_urls},
+                    status=status.HTTP_200_OK)
+
+
+@api_view(['POST'])
+@permission_classes([IsGuestUserOrReadOnly])
+def complete_multipart_upload(request, session_id):
+    """
+    Complete a session once every part is uploaded. Expects `parts`: a list of {part_number, etag}.
+    """
+    session = get_open_upload_session(request, session_id)
+    parts = request.data.get('parts')
+
+    if (not isinstance(parts, list) or len(parts) != session.part_count
+            or not all(isinstance(part, dict) and isinstance(part.get('part_number'), int)
+                       and isinstance(part.get('etag'), str) for part in parts)
+            or sorted(part['part_number'] for part in parts) != list(range(1, session.part_count + 1))):
+        return Response({'success': False, 'message': 'Every part must be listed once with its etag.',
+                         'data': None}, status=status.HTTP_400_BAD_REQUEST)
+
+    try:
+        R2Service.complete_multipart_upload(session.object_key, session.upload_id, parts, session.bucket_name)
+    except Exception as e:
+        logger.error("Error completing upload session %s: %s", session.session_id, e)
+        return Response({'success': False, 'message': 'An error occurred while completing the upload.',
+                         'data': None}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    session.status = UploadSession.Status.COMPLETED
+    session.save(update_fields=['status'])
+    return Response({'success': True, 'message': 'Upload completed successfully.',
+                     'data': {'unique_object_key': session.object_key}}, status=status.HTTP_200_OK)
+
+
+@api_view(['DELETE'])
+@permission_classes([IsGuestUserOrReadOnly])
+def abort_multipart_upload(request, session_id):
+    """
+    Abort a session, releasing the parts uploaded so far.
+    """
+    session = get_open_upload_session(request, session_id)
+    try:
+        R2Service.abort_multipart_upload(session.object_key, session.upload_id, session.bucket_name)
+    except Exception as e:
+        logger.error("Error aborting upload session %s: %s", session.session_id, e)
+        return Response({'success': False, 'message': 'An error occurred while aborting the upload.',
+                         'data': None}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    session.status = UploadSession.Status.ABORTED
+    session.save(update_fields=['status'])
+    return Response({'success': True, 'message': 'Upload aborted.', 'data': None}, status=status.HTTP_200_OK)
+
+
+# Seconds between keep-alive comments on idle event streams, below common proxy idle timeouts
+EVENT_STREAM_HEARTBEAT = 15
+
+
+def authenticate_token(raw_token):
+    """Resolve a JWT access token to its user, or None if it is missing or invalid."""
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
+
+    if not raw_token:
+        return None
+    authentication = JWTAuthentication()
+    try:
+        return authentication.get_user(authentication.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+async def file_events(request):
+    """
+    Server-sent event stream of gallery changes, e.g. /api/v1/file-events/?token=<access token>
+
+    Events are compact JSON objects: `file.created`, `file.deleted`, `file.enriched`, `interaction.like` and
+    `interaction.comment` (with a +1/-1 `delta`), and `resync` when events were lost and the client should
+    refetch. EventSource cannot send headers, hence the token query parameter. Requires the ASGI server
+    (`uvicorn clipping.asgi:application`): WSGI servers would buffer the endless stream instead of sending it.
+    """
+    if not is_asgi_request(request):
+        return JsonResponse({'detail': 'Event streams are only served by the ASGI application.'}, status=501)
+    user = await sync_to_async(authenticate_token)(request.GET.get('token'))
+    if user is None:
+        return JsonResponse({'detail': 'A valid access token is required.'}, status=401)
+
+    async def stream():
+        subscriber = event_service.broker.subscribe()
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscriber.queue.get(), EVENT_STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f"id: {event['id']}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+        finally:
+            event_service.broker.unsubscribe(subscriber)
+
+    response = StreamingHttpResponse(stream(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Disable proxy buffering (nginx)
+    return response
+
+
+@csrf_exempt
+def local_storage_object(request, bucket_name, object_key):
+    """
+    Objects of the local storage backend, reached through the presigned URLs it issues: PUT stores an object
+    (or a part of a multipart upload), GET and HEAD serve it with Range support. Full reads are handed to
+    the server as a file under WSGI, so they can be sent with sendfile. Only the media types accepted for uploads are
+    served inline; anything else (e.g. HTML or SVG, which would run scripts on the API origin) is a download.
+    """
+    backend = get_storage_backend()
+    if not isinstance(backend, LocalBackend):
+        raise Http404
+    method = 'GET' if request.method == 'HEAD' else request.method
+    if method not in ('GET', 'PUT'):
+        return HttpResponseNotAllowed(['GET', 'HEAD', 'PUT'])
+    if not verify_local_url(method, bucket_name, object_key, request.GET):
+        return HttpResponseForbidden("Invalid or expired signature.")
+    try:
+        path = backend.path(bucket_name, object_key)
+    except ValueError:
+        raise Http404
+
+    if method == 'PUT':
+        upload_id = request.GET.get('uploadId')
+        try:
+            if upload_id:
+                etag = backend.write_part(bucket_name, object_key, upload_id, int(request.GET['partNumber']), request)
+            else:
+                etag = backend.write(path, iter_chunks(request), request.GET.get('sha256'))
+        except ChecksumMismatch as e:
+            return HttpResponseBadRequest(f"BadDigest: {e}")
+        except (FileNotFoundError, ValueError):
+            raise Http404
+        response = HttpResponse(status=status.HTTP_200_OK)
+        response['ETag'] = f'"{etag}"'
+        return response
+
+    if not path.is_file():
+        raise Http404
+    size = path.stat().st_size
+    content_type = backend.content_type(object_key)
+    inline = content_type in R2Service.ALLOWED_CONTENT_TYPES
+    if not inline:
+        content_type = 'application/octet-stream'
+    try:
+        byte_range = parse_range(request.headers['Range'], size) if 'Range' in request.headers else None
+    except ValueError:
+        response = HttpResponse(status=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range is None and not is_asgi_request(request):
+        response = FileResponse(open(path, 'rb'), content_type=content_type)
+    else:
+        # Under ASGI, file responses would be read whole into memory: stream the range from an async iterator
+        start, end = byte_range or (0, size - 1)
+        response = streaming_response(request, iter_file_range(path, start, end - start + 1),
+                                      content_type=content_type,
+                                      status=status.HTTP_206_PARTIAL_CONTENT if byte_range else status.HTTP_200_OK)
+        if byte_range:
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    response['X-Content-Type-Options'] = 'nosniff'
+    if not inline:
+        response['Content-Disposition'] = 'attachment'
+    return response
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class UmsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ums'
+
+    def ready(self):
+        # Register the signal receivers
+        from . import signals  # noqa: F401
@@ -9,6 +9,19 @@ class UserProfileSerializer(serializers.ModelSerializer):
         fields = ['mobile', 'is_guest']
 
 
+class UserReadSerializer(serializers.ModelSerializer):
+    """
+    Compact representation of a user. Leaves out the password hash and the groups / permissions
+    relations, so a page of users is read with a single query (with `select_related('profile')`).
+    """
+    profile = UserProfileSerializer(read_only=True, default=None)
+
+    class Meta:
+        model = User
+        fields = ['id', 'username', 'email', 'first_name', 'last_name', 'date_joined', 'profile']
+        read_only_fields = fields
+
+
 class UserSerializer(serializers.ModelSerializer):
     profile = UserProfileSerializer()
     password = serializers.CharField(write_only=True, required=False)  # Make password optional
@@ -18,6 +31,10 @@ class UserSerializer(serializers.ModelSerializer):
         fields = '__all__'
         # fields = ['id', 'username', 'password', 'email', 'first_name', 'last_name', 'profile']
 
+    def to_representation(self, instance):
+        # Responses to writes use the compact read representation too
+        return UserReadSerializer(instance, context=self.context).data
+
     def create(self, validated_data):
         profile_data = validated_data.pop('profile', None)
         password = validated_data.pop('password', None)  # Make password optional in creation
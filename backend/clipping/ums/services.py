@@ -0,0 +1,31 @@
+import logging
+from typing import Iterable, Optional
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+
+logger = logging.getLogger('my_logger')
+
+# Usernames rarely change and are invalidated on every user save, so entries may live long
+USER_ID_TIMEOUT = 24 * 60 * 60
+
+
+def user_id_key(username: str) -> str:
+    return f'ums:user_id:{username}'
+
+
+def resolve_user_id(username: str) -> Optional[int]:
+    """ID of the user with the given username, cached. Returns None if there is no such user."""
+    key = user_id_key(username)
+    user_id = cache.get(key)
+    if user_id is None:
+        user_id = User.objects.filter(username=username).values_list('id', flat=True).first()
+        if user_id is not None:
+            cache.set(key, user_id, timeout=USER_ID_TIMEOUT)
+    return user_id
+
+
+def forget_usernames(usernames: Iterable[str]) -> None:
+    keys = [user_id_key(username) for username in set(usernames) if username]
+    if keys:
+        cache.delete_many(keys)
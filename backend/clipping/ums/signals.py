@@ -0,0 +1,22 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .services import forget_usernames
+
+
+@receiver(post_init, sender=User, dispatch_uid='ums_snapshot_username')
+def snapshot_username(sender, instance, **kwargs):
+    # Remember the username as loaded, so a rename also invalidates the old one
+    instance._loaded_username = instance.__dict__.get('username')
+
+
+@receiver(post_save, sender=User, dispatch_uid='ums_forget_saved_username')
+@receiver(post_delete, sender=User, dispatch_uid='ums_forget_deleted_username')
+def forget_cached_user_id(sender, instance, **kwargs):
+    usernames = [instance.username, getattr(instance, '_loaded_username', None)]
+    instance._loaded_username = instance.username
+    # Drop now and again after commit, so a concurrent lookup cannot re-cache the old row
+    forget_usernames(usernames)
+    transaction.on_commit(lambda: forget_usernames(usernames))
@@ -1,7 +1,11 @@
 from django.test import TestCase
 from django.contrib.auth.models import User
+from django.core.cache import cache
 from django.db.utils import IntegrityError
 
+from .serializers import UserReadSerializer
+from .services import resolve_user_id
+
 
 class UserCRUDTestCase(TestCase):
 
@@ -79,3 +83,29 @@ class UserCRUDTestCase(TestCase):
         for user in users:
             print(
                 f'Username: {user.username}, Email: {user.email}, First name: {user.first_name}, Last name: {user.last_name}')
+
+
+class UserIdResolverTestCase(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='resolved', password='password123')
+
+    def test_resolve_is_cached(self):
+        self.assertEqual(resolve_user_id('resolved'), self.user.id)
+        with self.assertNumQueries(0):
+            self.assertEqual(resolve_user_id('resolved'), self.user.id)
+        self.assertIsNone(resolve_user_id('missing'), "Unknown usernames should resolve to None")
+
+    def test_rename_invalidates(self):
+        resolve_user_id('resolved')
+        self.user.username = 'renamed'
+        self.user.save()
+        self.assertIsNone(resolve_user_id('resolved'), "The old username should no longer resolve")
+        self.assertEqual(resolve_user_id('renamed'), self.user.id)
+
+    def test_read_serializer_hides_credentials(self):
+        data = UserReadSerializer(User.objects.select_related('profile').get(pk=self.user.pk)).data
+        self.assertNotIn('password', data)
+        self.assertNotIn('groups', data)
+        self.assertIsNone(data['profile'], "Users without a profile should serialize a null profile")
@@ -3,27 +3,35 @@ from rest_framework.permissions import IsAuthenticated
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from django.contrib.auth.models import User
-from django.shortcuts import get_object_or_404
-from .serializers import UserSerializer
+from django.http import Http404
+from .serializers import UserReadSerializer, UserSerializer
+from .services import resolve_user_id
 
 
 class UserViewSet(viewsets.ModelViewSet):
-    queryset = User.objects.all()
+    # The profile is joined in; the read serializer touches no many-to-many relation
+    queryset = User.objects.select_related('profile').order_by('id')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
 
+    def get_serializer_class(self):
+        if self.action in ('list', 'retrieve'):
+            return UserReadSerializer
+        return UserSerializer
+
     @action(detail=False, methods=['get'])
     def get_user_id(self, request):
         """
         Custom action to get the user ID by username.
         """
         username = request.query_params.get('username')  # Retrieve 'username' from query parameters
-        print(username, '----------')
         if not username:
             return Response({'error': 'Username parameter is required'}, status=400)
 
-        # Fetch the user or return a 404 if not found
-        user = get_object_or_404(User, username=username)
+        # Resolve through the cache, or return a 404 if not found
+        user_id = resolve_user_id(username)
+        if user_id is None:
+            raise Http404
 
         # Return only the user_id in the response
-        return Response({'user_id': user.id})
+        return Response({'user_id': user_id})
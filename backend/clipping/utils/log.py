@@ -0,0 +1,125 @@
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import weakref
+from functools import partial
+from logging.handlers import QueueHandler, QueueListener
+
+# Request ID of the request being handled by the current thread / task, set by RequestIdMiddleware
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+# Attributes every LogRecord has; anything else was passed with `extra=` and is emitted as a field
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request_id'}
+
+
+class RequestIdFilter(logging.Filter):
+    """
+    Stamps records with the current request ID. Must run on the logging thread (attach it to the handler),
+    since the ID lives in a context variable.
+    """
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a `rate` fraction of the records at or below `max_level`, e.g. to sample the DEBUG events
+    of a high-volume logger. Records above `max_level` always pass.
+    """
+
+    def __init__(self, rate=1.0, max_level='DEBUG'):
+        super().__init__()
+        self.rate = float(rate)
+        self.max_level = logging.getLevelName(max_level) if isinstance(max_level, str) else max_level
+
+    def filter(self, record):
+        return record.levelno > self.max_level or random.random() < self.rate
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats records as one JSON object per line, including the request ID and any `extra` fields."""
+
+    def format(self, record):
+        payload = {
+            'timestamp': self.formatTime(record, '%Y-%m-%dT%H:%M:%S%z'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'module': record.module,
+            'line': record.lineno,
+        }
+        payload.update({key: value for key, value in vars(record).items() if key not in _RECORD_ATTRIBUTES})
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class NonBlockingStreamHandler(QueueHandler):
+    """
+    Logging handler that never blocks the calling thread: records are put on a bounded in-memory queue and
+    written to the stream by a QueueListener thread. Formatting also happens on the listener thread.
+    When the queue is full, records are dropped and counted instead of waiting.
+
+    The listener is stopped (and the queue drained) by close(), which logging.shutdown calls at exit.
+    Forked processes, e.g. preloaded gunicorn workers, get their own queue and listener.
+    """
+
+    def __init__(self, stream=None, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.queue_size = queue_size
+        self.dropped = 0
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.listener = None
+        self.start_listener()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=partial(_restart_in_child, weakref.ref(self)))
+
+    def start_listener(self):
+        self.listener = QueueListener(self.queue, self.target, respect_handler_level=True)
+        self.listener.start()
+
+    def setFormatter(self, fmt):
+        # The formatter configured for this handler is applied by the target handler, on the listener thread
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        # Resolve the message now (its arguments may change later) but leave the formatting to the listener
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        # Closing twice (e.g. by dictConfig and again by logging.shutdown) must not stop the listener twice
+        self.acquire()
+        try:
+            listener, self.listener = self.listener, None
+        finally:
+            self.release()
+        if listener is not None:
+            listener.stop()
+        self.target.close()
+        super().close()
+
+
+def _restart_in_child(handler_ref):
+    """
+    After a fork, only the forking thread exists in the child: the listener thread is gone, and the queue's
+    lock may have been held by it. Give the child a fresh queue and listener, unless the handler is closed.
+    """
+    handler = handler_ref()
+    if handler is not None and handler.listener is not None:
+        handler.queue = queue.Queue(handler.queue_size)
+        handler.start_listener()
@@ -0,0 +1,32 @@
+import re
+import uuid
+
+from .log import request_id_var
+
+# Accept client supplied request IDs only if they look like IDs
+REQUEST_ID_PATTERN = re.compile(r'^[A-Za-z0-9._-]{1,64}$')
+
+
+class RequestIdMiddleware:
+    """
+    Assigns every request an ID (the incoming X-Request-ID header if valid, a new UUID otherwise),
+    exposes it to log records through `request_id_var` and returns it in the X-Request-ID response header.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_id = request.headers.get('X-Request-ID', '')
+        if not REQUEST_ID_PATTERN.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        request.request_id = request_id
+        token = request_id_var.set(request_id)
+        try:
+            response = self.get_response(request)
+        finally:
+            request_id_var.reset(token)
+
+        response['X-Request-ID'] = request_id
+        return response
@@ -0,0 +1,92 @@
+import io
+import json
+import logging
+import os
+import sys
+import tempfile
+import unittest
+
+from django.test import SimpleTestCase
+
+from .log import JsonFormatter, NonBlockingStreamHandler, RequestIdFilter, SamplingFilter, request_id_var
+
+
+def make_record(level=logging.INFO, msg='Deleted %d files', args=(3,), **extra):
+    record = logging.LogRecord('my_logger', level, __file__, 10, msg, args, None)
+    record.__dict__.update(extra)
+    return record
+
+
+class LogFiltersTestCase(SimpleTestCase):
+
+    def test_request_id_filter(self):
+        token = request_id_var.set('abc123')
+        try:
+            record = make_record()
+            self.assertTrue(RequestIdFilter().filter(record))
+        finally:
+            request_id_var.reset(token)
+        self.assertEqual(record.request_id, 'abc123')
+        RequestIdFilter().filter(record)
+        self.assertIsNone(record.request_id, "Records logged outside a request should have no ID")
+
+    def test_sampling_filter(self):
+        dropping = SamplingFilter(rate=0)
+        self.assertFalse(dropping.filter(make_record(logging.DEBUG)))
+        self.assertTrue(dropping.filter(make_record(logging.INFO)), "Records above max_level should always pass")
+        self.assertTrue(SamplingFilter(rate=1, max_level='INFO').filter(make_record(logging.INFO)))
+
+
+class JsonFormatterTestCase(SimpleTestCase):
+
+    def test_format(self):
+        payload = json.loads(JsonFormatter().format(make_record(request_id='abc123', file_id=7)))
+        self.assertEqual((payload['message'], payload['level'], payload['logger']),
+                         ('Deleted 3 files', 'INFO', 'my_logger'))
+        self.assertEqual((payload['request_id'], payload['file_id']), ('abc123', 7),
+                         "The request ID and `extra` fields should be emitted")
+        self.assertNotIn('args', payload)
+
+    def test_format_exception(self):
+        try:
+            raise ValueError('boom')
+        except ValueError:
+            record = make_record(exc_info=sys.exc_info())
+        self.assertIn('ValueError: boom', json.loads(JsonFormatter().format(record))['exc_info'])
+
+
+class NonBlockingStreamHandlerTestCase(SimpleTestCase):
+
+    def test_close_flushes_and_is_idempotent(self):
+        stream = io.StringIO()
+        handler = NonBlockingStreamHandler(stream)
+        handler.setFormatter(logging.Formatter('%(levelname)s %(message)s'))
+        handler.handle(make_record())
+        handler.close()
+        handler.close()
+        self.assertEqual(stream.getvalue(), 'INFO Deleted 3 files\n', "Closing should drain the queue")
+
+    def test_drops_when_full(self):
+        handler = NonBlockingStreamHandler(io.StringIO(), queue_size=1)
+        handler.close()
+        handler.handle(make_record())
+        handler.handle(make_record())
+        self.assertEqual(handler.dropped, 1, "Records should be dropped rather than block on a full queue")
+
+    @unittest.skipUnless(hasattr(os, 'fork'), "Requires fork()")
+    def test_restarts_after_fork(self):
+        with tempfile.TemporaryFile('w+') as stream:
+            handler = NonBlockingStreamHandler(stream)
+            handler.setFormatter(logging.Formatter('%(process)d %(message)s'))
+            pid = os.fork()
+            if pid == 0:
+                try:
+                    handler.handle(make_record(msg='from the child', args=None))
+                    handler.close()
+                finally:
+                    os._exit(0)
+            os.waitpid(pid, 0)
+            handler.close()
+            stream.seek(0)
+            self.assertEqual(stream.read(), f'{pid} from the child\n',
+                             "The forked process should write its records with its own listener")
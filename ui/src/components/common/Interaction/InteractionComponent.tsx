@@ -128,13 +128,17 @@ const CommentsSection: React.FC<{
 
 // Main InteractionComponent
 const InteractionComponent: React.FC<{ file: Item }> = ({file}) => {
-    const [totalLikes, setTotalLikes] = useState<number>(0);
-    const [userLiked, setUserLiked] = useState<boolean>(false);
-    const [comments, setComments] = useState<FileComment[]>(file.file_interactions?.comments || []);
+    // Seed the state from the batched summary fetched with the gallery page, if available
+    const initialSummary = file.file_interactions;
+    const [totalLikes, setTotalLikes] = useState<number>(initialSummary?.total_likes ?? 0);
+    const [userLiked, setUserLiked] = useState<boolean>(
+        initialSummary?.likes.some((like) => like.user_id === parseInt(getUserID() || "-1", 10)) ?? false
+    );
+    const [comments, setComments] = useState<FileComment[]>(initialSummary?.comments || []);
     const [newComment, setNewComment] = useState<string>("");
     const [fileInteractionsSummary, setFileInteractionsSummary] =
-        useState<FileInteractionsSummary>();
-    const [loading, setLoading] = useState<boolean>(true);
+        useState<FileInteractionsSummary | undefined>(initialSummary);
+    const [loading, setLoading] = useState<boolean>(!initialSummary);
 
     // Fetch `isGuestUser` from Redux Store
     const isGuestUser = useSelector((state: RootState) => state.user.isGuestUser);
@@ -156,9 +160,20 @@ const InteractionComponent: React.FC<{ file: Item }> = ({file}) => {
         }
     }, [file.file_id]);
 
+    // Follow like counts patched into the gallery state by the event stream
     useEffect(() => {
+        if (initialSummary) {
+            setTotalLikes(initialSummary.total_likes);
+        }
+    }, [initialSummary?.total_likes]);
+
+    useEffect(() => {
+        // The batched summary only carries the latest comments; fetch the full list only when some are missing
+        if (initialSummary && (initialSummary.total_comments ?? 0) <= initialSummary.comments.length) {
+            return;
+        }
         fetchAllInteractions();
-    }, [fetchAllInteractions]);
+    }, [fetchAllInteractions, initialSummary]);
 
     const handleLikeToggle = async () => {
         const updatedLikedState = !userLiked;
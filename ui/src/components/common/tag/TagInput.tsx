@@ -1,6 +1,7 @@
-import React, { useState } from "react";
-import { Input, Tag, Button } from "antd";
+import React, { useEffect, useRef, useState } from "react";
+import { AutoComplete, Input, Tag, Button } from "antd";
 import { PlusOutlined } from "@ant-design/icons";
+import { autocompleteTags } from "@/services/services.ts";
 
 interface TagInputProps {
     tags: string[];
@@ -8,18 +9,47 @@ interface TagInputProps {
     onTagRemove: (tag: string) => void;
 }
 
+// Delay before fetching suggestions, so typing a word sends one request
+const SUGGESTION_DELAY_MS = 200;
+
 const TagInput: React.FC<TagInputProps> = ({ tags, onTagAdd, onTagRemove }) => {
     const [currentTag, setCurrentTag] = useState<string>("");
+    const [suggestions, setSuggestions] = useState<{ value: string, label: string }[]>([]);
+    const latestQuery = useRef<string>("");
 
-    const handleAddTag = () => {
-        if (currentTag && currentTag.length <= 50 && !tags.includes(currentTag)) {
-            onTagAdd(currentTag);
+    useEffect(() => {
+        const query = currentTag.trim();
+        latestQuery.current = query;
+        if (!query) {
+            setSuggestions([]);
+            return;
+        }
+        const timer = setTimeout(async () => {
+            try {
+                const results = await autocompleteTags(query);
+                // Ignore responses to queries the user has already typed past
+                if (latestQuery.current === query) {
+                    setSuggestions(results
+                        .filter(({ tag }) => !tags.includes(tag))
+                        .map(({ tag, count }) => ({ value: tag, label: `${tag} (${count})` })));
+                }
+            } catch (error) {
+                console.error('Error fetching tag suggestions:', error);
+            }
+        }, SUGGESTION_DELAY_MS);
+        return () => clearTimeout(timer);
+    }, [currentTag, tags]);
+
+    const addTag = (tag: string) => {
+        if (tag && tag.length <= 50 && !tags.includes(tag)) {
+            onTagAdd(tag);
             setCurrentTag("");
+            setSuggestions([]);
         }
     };
 
-    const handleInputChange = (e: React.ChangeEvent<HTMLInputElement>) => {
-        setCurrentTag(e.target.value);
+    const handleAddTag = () => {
+        addTag(currentTag);
     };
 
     const handleKeyPress = (e: React.KeyboardEvent<HTMLInputElement>) => {
@@ -40,17 +70,22 @@ const TagInput: React.FC<TagInputProps> = ({ tags, onTagAdd, onTagRemove }) => {
                     {tag}
                 </Tag>
             ))}
-            <Input
-                type="text"
+            <AutoComplete
                 value={currentTag}
-                onChange={handleInputChange}
-                onKeyDown={handleKeyPress}
+                options={suggestions}
+                onChange={setCurrentTag}
+                onSelect={addTag}
                 style={{ width: 200, marginRight: 8, marginBottom: 8 }}
-                placeholder="New tag"
-                suffix={<Button icon={<PlusOutlined />} onClick={handleAddTag} />}
-            />
+            >
+                <Input
+                    type="text"
+                    onKeyDown={handleKeyPress}
+                    placeholder="New tag"
+                    suffix={<Button icon={<PlusOutlined />} onClick={handleAddTag} />}
+                />
+            </AutoComplete>
         </div>
     );
 };
 
-export default TagInput;
\ No newline at end of file
+export default TagInput;
@@ -1,7 +1,13 @@
 import React, { useEffect, useCallback } from "react";
 import { useDispatch, useSelector } from "react-redux";
 import { AppDispatch, RootState } from "@/store/store.ts";
-import { deleteMediaItem, fetchGalleryItems, fetchMoreGalleryItems } from "@/store/slices/gallerySlice.ts";
+import {
+    applyFileEvent,
+    deleteMediaItem,
+    fetchGalleryItems,
+    fetchMoreGalleryItems,
+} from "@/store/slices/gallerySlice.ts";
+import { subscribeToFileEvents } from "@/services/events.ts";
 import Masonry from "@/components/common/masonry/Masonry.tsx";
 import { Button, message, Modal, Spin } from "antd";
 import "./GalleryTab.less";
@@ -25,6 +31,9 @@ const GalleryTab: React.FC = () => {
         dispatch(fetchGalleryItems());
     }, [dispatch]);
 
+    // Patch the gallery live with other users' uploads, deletions, likes and comments
+    useEffect(() => subscribeToFileEvents((event) => dispatch(applyFileEvent(event))), [dispatch]);
+
     // ✅ Filter media items dynamically from Redux state based on `searchTerm`
     const filteredMediaItems = mediaItems.filter((item) => {
         if (!searchTerm.trim()) return true;
@@ -4,7 +4,9 @@ import Masonry from "@/components/common/masonry/Masonry";
 import {Item, MediaItem} from "@/components/types/types";
 import {Input, Button} from "antd";
 import {CloseCircleOutlined} from '@ant-design/icons';
-import {getPreSignedUrls, postUploadedItems} from "@/services/services";
+import {
+    bulkUpdateFiles, getPreSignedUrls, hashFile, MULTIPART_THRESHOLD, postUploadedItems, uploadMultipart
+} from "@/services/services";
 import {PresignedUrl, UploadStatus} from "@/services/types";
 import axios from "axios";
 import TagInput from "@/components/common/tag/TagInput.tsx";
@@ -131,17 +133,61 @@ const UploadFileTab: React.FC<UploadFileTabProps> = ({
 
     const handleSubmit = async () => {
         try {
-            // Fetch pre-signed URLs for all items
-            const preSignedUrls: PresignedUrl[] = await getPreSignedUrls(items);
+            // Large files are uploaded in parts, the others with a single pre-signed PUT
+            const isLarge = (item: Item) => item.raw instanceof File && item.raw.size > MULTIPART_THRESHOLD;
+            // Hash the small items so the backend can answer with content it already stores.
+            // Large files are not hashed, reading them whole into memory would be too costly.
+            const smallItems = await Promise.all(items.filter(item => !isLarge(item)).map(async item => ({
+                ...item,
+                content_sha256: item.raw instanceof File ? await hashFile(item.raw) : undefined,
+            })));
+            const uploadQueue = [...smallItems, ...items.filter(isLarge)];
+
+            // Fetch pre-signed URLs for all small items
+            const preSignedUrls: PresignedUrl[] = smallItems.length ? await getPreSignedUrls(smallItems) : [];
 
             // Validate received pre-signed URLs
-            if (!preSignedUrls.length) {
+            if (smallItems.length && !preSignedUrls.length) {
                 console.error("No pre-signed URLs received. Upload cannot continue.");
                 return;
             }
 
+            // Function to upload a large item with a multipart upload session
+            const uploadLargeItem = async (item: Item): Promise<UploadStatus> => {
+                setItems(prevItems =>
+                    prevItems.map(i => (i.title === item.title ? { ...i, status: 'uploading' } : i))
+                );
+
+                try {
+                    const {objectKey, bucketName} = await uploadMultipart(item.raw as File, item);
+                    console.log(`Item "${item.title}" uploaded successfully in parts.`);
+                    setItems(prevItems => prevItems.filter(i => i.title !== item.title));
+                    return {
+                        object_key: objectKey,
+                        status: 'success',
+                        uploaded_file: {
+                            ...item,
+                            object_key: objectKey,
+                            bucket_name: bucketName,
+                            size_bytes: (item.raw as File).size,
+                        },
+                    };
+                } catch (error) {
+                    console.error(`Error uploading item "${item.title}" in parts:`, error);
+                    return {
+                        object_key: item.title,
+                        status: 'error',
+                        errorMessage: error instanceof Error ? error.message : 'Unknown error occurred',
+                    };
+                }
+            };
+
             // Function to upload a single item
             const uploadItem = async (item: Item): Promise<UploadStatus> => {
+                if (isLarge(item)) {
+                    return uploadLargeItem(item);
+                }
+
                 const preSignedUrl = preSignedUrls.find(url => url.original_object_key === item.title);
 
                 if (!preSignedUrl) {
@@ -149,15 +195,35 @@ const UploadFileTab: React.FC<UploadFileTabProps> = ({
                     return { object_key: item.title, status: 'error', errorMessage: 'Pre-signed URL not found' };
                 }
 
+                // The user already stores identical content: nothing to upload, add the tags and
+                // description to the existing file instead
+                if (preSignedUrl.already_stored || !preSignedUrl.pre_signed_url) {
+                    console.log(`Item "${item.title}" is already stored as "${preSignedUrl.unique_object_key}".`);
+                    if (preSignedUrl.file_id !== undefined && (item.tags?.length || item.description)) {
+                        try {
+                            await bulkUpdateFiles([{
+                                file_id: preSignedUrl.file_id,
+                                add_tags: item.tags ?? [],
+                                ...(item.description ? {description: item.description} : {}),
+                            }]);
+                        } catch (error) {
+                            console.error(`Error adding the tags of "${item.title}" to the stored file:`, error);
+                        }
+                    }
+                    setItems(prevItems => prevItems.filter(i => i.title !== item.title));
+                    return { object_key: preSignedUrl.unique_object_key, status: 'skipped' };
+                }
+
                 // Mark item as uploading
                 setItems(prevItems =>
                     prevItems.map(i => (i.title === item.title ? { ...i, status: 'uploading' } : i))
                 );
 
                 try {
-                    // Upload file
+                    // Upload file. URLs bound to the content's digest need its checksum header, which the
+                    // bucket CORS policy must allow.
                     const response = await axios.put(preSignedUrl.pre_signed_url, item.raw, {
-                        headers: { 'Content-Type': preSignedUrl.content_type },
+                        headers: preSignedUrl.upload_headers ?? { 'Content-Type': preSignedUrl.content_type },
                         timeout: 360000,
                     });
 
@@ -169,7 +235,13 @@ const UploadFileTab: React.FC<UploadFileTabProps> = ({
                     return {
                         object_key: preSignedUrl.unique_object_key,
                         status: 'success',
-                        uploaded_file: { ...item, object_key: preSignedUrl.unique_object_key },
+                        uploaded_file: {
+                            ...item,
+                            object_key: preSignedUrl.unique_object_key,
+                            bucket_name: preSignedUrl.bucket_name,
+                            size_bytes: item.raw instanceof File ? item.raw.size : undefined,
+                            content_token: preSignedUrl.content_token,
+                        },
                         httpStatusCode: response.status,
                         responseMessage: response.statusText,
                     };
@@ -187,7 +259,7 @@ const UploadFileTab: React.FC<UploadFileTabProps> = ({
             };
 
             // Upload all items in parallel
-            const uploadResults = await Promise.allSettled(items.map(uploadItem));
+            const uploadResults = await Promise.allSettled(uploadQueue.map(uploadItem));
 
             // Separate successful and failed uploads
             const successfulUploads = uploadResults
@@ -198,8 +270,12 @@ const UploadFileTab: React.FC<UploadFileTabProps> = ({
                 .filter(result => result.status === 'fulfilled' && result.value.status === 'error')
                 .map(result => (result as PromiseFulfilledResult<UploadStatus>).value);
 
+            const skippedUploads = uploadResults
+                .filter(result => result.status === 'fulfilled' && result.value.status === 'skipped')
+                .map(result => (result as PromiseFulfilledResult<UploadStatus>).value);
+
             // Update upload status in state
-            setUploadStatuses([...successfulUploads, ...failedUploads]);
+            setUploadStatuses([...successfulUploads, ...skippedUploads, ...failedUploads]);
 
             // Post successful uploads to backend
             if (successfulUploads.length) {
@@ -14,6 +14,7 @@ export interface FileInteractionsSummary {
     total_likes: number; // Total number of likes
     likes: FileInteraction[];
     comments: FileComment[]; // Array of comment interactions
+    total_comments?: number; // Total number of comments, may be larger than comments.length for batched summaries
 }
 
 export interface Item {
@@ -32,6 +33,14 @@ export interface Item {
     file_interactions?: FileInteractionsSummary; // Summary of file interactions, e.g., likes, dislikes, and comments
     status?: "idle" | "uploading" | "success" | "error"; // Add status property
     user_id?: number;
+    size_bytes?: number; // Size of the raw file, counted in the owner's storage stats
+    content_sha256?: string; // Hex SHA-256 of the raw file, lets the backend skip content the user already stores
+    content_token?: string; // Issued with the upload URL, proves content_sha256 to the backend
+    bucket_name?: string; // Bucket the file was uploaded to, chosen by the backend storage router
+    taken_datetime?: string | null; // Capture time read from the EXIF data of images
+    camera?: string | null; // Camera make and model from the EXIF data
+    dominant_colors?: string[]; // Names of the dominant colors of images, most present first
+    color_palette?: string[]; // Hex values of the dominant colors of images
 }
 
 export interface MediaItem extends Item {
@@ -0,0 +1,47 @@
+import {getAccessToken} from '@/services/setup.ts';
+import {FileEvent} from '@/services/types.ts';
+
+const EVENT_TYPES: FileEvent['type'][] = [
+    'file.created',
+    'file.deleted',
+    'file.enriched',
+    'file.updated',
+    'interaction.like',
+    'interaction.comment',
+    'resync',
+];
+
+/**
+ * Function to subscribe to the server-sent event stream of gallery changes.
+ * EventSource reconnects by itself; a `resync` event is emitted after a reconnection,
+ * since events sent while disconnected are lost.
+ * @param onEvent - Called with every event.
+ * @returns A function closing the stream.
+ */
+export const subscribeToFileEvents = (onEvent: (event: FileEvent) => void): (() => void) => {
+    const token = getAccessToken();
+    if (!token) {
+        return () => undefined;
+    }
+
+    const source = new EventSource(`/api/v1/file-events/?token=${encodeURIComponent(token)}`);
+    let connectedBefore = false;
+
+    source.onopen = () => {
+        if (connectedBefore) {
+            onEvent({type: 'resync'});
+        }
+        connectedBefore = true;
+    };
+
+    const handleMessage = (message: MessageEvent<string>) => {
+        try {
+            onEvent(JSON.parse(message.data) as FileEvent);
+        } catch (error) {
+            console.error('Invalid file event:', message.data, error);
+        }
+    };
+    EVENT_TYPES.forEach(type => source.addEventListener(type, handleMessage as EventListener));
+
+    return () => source.close();
+};
@@ -1,13 +1,19 @@
-import {apiRequest} from '@/services/setup.ts';
+import {apiRequest, getUserID, getUsername} from '@/services/setup.ts';
 import {
     FileApiResponse,
     FileApiResponseItem,
+    FileInteractionsPage,
+    FileInteractionsSummaryItem,
+    MultipartPartUrl,
+    MultipartUploadSession,
     PostObject,
     PresignedUrl,
     PresignedUrlResponse,
+    UploadApiResponse,
+    UploadedPart,
     UploadStatus
 } from '@/services/types.ts';
-import {FileInteraction, FileInteractionsSummary, Item} from "@/components/types/types.ts"
+import {FileComment, FileInteraction, FileInteractionsSummary, Item} from "@/components/types/types.ts"
 import axios, {AxiosResponse} from 'axios';
 
 /**
@@ -17,7 +23,12 @@ import axios, {AxiosResponse} from 'axios';
  */
 export const getPreSignedUrls = async (items: Item[]): Promise<PresignedUrl[]> => {
     // Map the MediaItems to PostObjects using the title as the id
-    const postObjects: PostObject[] = items.map(item => ({object_key: item.title, file_type: item.file_type}));
+    const postObjects: PostObject[] = items.map(item => ({
+        object_key: item.title,
+        file_type: item.file_type,
+        content_type: item.raw instanceof File ? item.raw.type : undefined,
+        sha256: item.content_sha256,
+    }));
 
     // Send the request to the backend
     const response = await apiRequest<PresignedUrlResponse>('get-pre-signed-urls/', {
@@ -33,6 +44,101 @@ export const getPreSignedUrls = async (items: Item[]): Promise<PresignedUrl[]> =
 };
 
 
+/**
+ * Function to compute the hex SHA-256 of a file, used to skip uploading content the backend already stores.
+ * @param file - The file to hash.
+ * @returns The digest, or undefined where WebCrypto is unavailable (non-secure contexts).
+ */
+export const hashFile = async (file: File): Promise<string | undefined> => {
+    if (!globalThis.crypto?.subtle) {
+        return undefined;
+    }
+    const digest = await crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest), byte => byte.toString(16).padStart(2, '0')).join('');
+};
+
+// Files larger than this are uploaded in parts
+export const MULTIPART_THRESHOLD = 64 * 1024 * 1024;
+
+/**
+ * Function to upload a large file with a multipart upload session: parts are uploaded concurrently
+ * straight to storage, and only the parts that failed are retried.
+ * @param file - The file to upload.
+ * @param item - The item the file belongs to, used for the object key and file type.
+ * @param options - Part concurrency, retries per part and an optional progress callback (0..1).
+ * @returns The unique object key of the uploaded file and the bucket it was uploaded to.
+ */
+export const uploadMultipart = async (
+    file: File,
+    item: Item,
+    options: { concurrency?: number; maxRetries?: number; onProgress?: (progress: number) => void } = {}
+): Promise<{ objectKey: string, bucketName: string }> => {
+    const {concurrency = 4, maxRetries = 3, onProgress} = options;
+
+    const sessionResponse = await apiRequest<UploadApiResponse<MultipartUploadSession>>('multipart-uploads/', {
+        method: 'POST',
+        data: {object_key: item.title, file_type: item.file_type, content_type: file.type, size: file.size},
+    });
+    const session = sessionResponse.data.data;
+
+    const requestPartUrls = async (partNumbers: number[]): Promise<Map<number, string>> => {
+        const response = await apiRequest<UploadApiResponse<MultipartPartUrl[]>>(
+            `multipart-uploads/${session.session_id}/parts/`,
+            {method: 'POST', data: {part_numbers: partNumbers}}
+        );
+        return new Map(response.data.data.map(part => [part.part_number, part.pre_signed_url]));
+    };
+
+    const uploadedParts = new Map<number, string>();
+    const uploadPart = async (partNumber: number, url: string): Promise<void> => {
+        const start = (partNumber - 1) * session.part_size;
+        const response = await axios.put(url, file.slice(start, start + session.part_size), {timeout: 360000});
+        // Requires the bucket CORS policy to expose the ETag header
+        uploadedParts.set(partNumber, response.headers['etag']);
+        onProgress?.(uploadedParts.size / session.part_count);
+    };
+
+    try {
+        let pending = Array.from({length: session.part_count}, (_, i) => i + 1);
+        for (let attempt = 0; pending.length > 0; attempt++) {
+            if (attempt > maxRetries) {
+                throw new Error(`Parts ${pending.join(', ')} failed after ${maxRetries} retries.`);
+            }
+
+            // Presign URLs for the pending parts only, at most 1000 per request
+            const urls = new Map<number, string>();
+            for (let i = 0; i < pending.length; i += 1000) {
+                (await requestPartUrls(pending.slice(i, i + 1000))).forEach((url, part) => urls.set(part, url));
+            }
+
+            // Upload with a fixed number of concurrent workers
+            const queue = [...pending];
+            const failed: number[] = [];
+            const worker = async () => {
+                for (let partNumber = queue.shift(); partNumber !== undefined; partNumber = queue.shift()) {
+                    try {
+                        await uploadPart(partNumber, urls.get(partNumber)!);
+                    } catch (error) {
+                        console.error(`Part ${partNumber} of "${item.title}" failed:`, error);
+                        failed.push(partNumber);
+                    }
+                }
+            };
+            await Promise.all(Array.from({length: Math.min(concurrency, queue.length)}, worker));
+            pending = failed.sort((a, b) => a - b);
+        }
+
+        const parts: UploadedPart[] = Array.from(uploadedParts, ([part_number, etag]) => ({part_number, etag}));
+        await apiRequest(`multipart-uploads/${session.session_id}/complete/`, {method: 'POST', data: {parts}});
+        return {objectKey: session.unique_object_key, bucketName: session.bucket_name};
+    } catch (error) {
+        // Release the uploaded parts; expired sessions are also cleaned up by the server sweeper
+        await apiRequest(`multipart-uploads/${session.session_id}/`, {method: 'DELETE'}).catch(() => undefined);
+        throw error;
+    }
+};
+
+
 /**
  * Function to post successfully uploaded items to the backend.
  * @param uploadStatuses - List of upload statuses after uploading items.
@@ -58,6 +164,40 @@ export const postUploadedItems = async (uploadStatuses: UploadStatus[]): Promise
     }
 };
 
+/**
+ * Helper function to transform a file returned by the API into an Item.
+ * @param item - The file as returned by the API.
+ * @returns The corresponding Item.
+ */
+const mapFileApiItem = (item: FileApiResponseItem): Item => ({
+    file_id: item.file_id,
+    object_key: item.object_key,
+    file_type: mapFileType(item.file_type),
+    height: item.height,
+    width: item.width,
+    title: removeEndingSuffix(item.object_key),
+    description: item.description,
+    file_caption: item.file_caption,
+    created_datetime: item.created_datetime,
+    tags: item.tags,
+    src: item.url,
+    user_id: item.user_id,
+    taken_datetime: item.taken_datetime,
+    camera: item.camera,
+    dominant_colors: item.dominant_colors,
+    color_palette: item.color_palette,
+});
+
+/**
+ * Function to fetch a single file item, e.g. one announced by the event stream.
+ * @param fileId - The ID of the file to fetch.
+ * @returns The file as an Item.
+ */
+export const fetchItem = async (fileId: number): Promise<Item> => {
+    const response = await apiRequest<FileApiResponseItem>(`file/${fileId}/`, { method: 'GET' });
+    return mapFileApiItem(response.data);
+};
+
 /**
  * Helper function to fetch file items from the given URL.
  * @param url - The API endpoint to fetch items from.
@@ -69,20 +209,21 @@ const fetchItemsFromApi = async (url: string): Promise<{ items: Item[], next: st
         const response = await apiRequest<FileApiResponse>(url, { method: 'GET' });
 
         // Transform the response data into Item objects
-        const items: Item[] = response.data.results.map((item: FileApiResponseItem) => ({
-            file_id: item.file_id,
-            object_key: item.object_key,
-            file_type: mapFileType(item.file_type),
-            height: item.height,
-            width: item.width,
-            title: removeEndingSuffix(item.object_key),
-            description: item.description,
-            file_caption: item.file_caption,
-            created_datetime: item.created_datetime,
-            tags: item.tags,
-            src: item.url,
-            user_id: item.user_id,
-        }));
+        const items: Item[] = response.data.results.map(mapFileApiItem);
+
+        // Attach interaction summaries for the whole page with a single request
+        try {
+            const summaries = await fetchInteractionsSummaries(
+                items.map(item => item.file_id).filter((id): id is number => id !== undefined)
+            );
+            items.forEach(item => {
+                if (item.file_id !== undefined) {
+                    item.file_interactions = summaries[item.file_id];
+                }
+            });
+        } catch (error) {
+            console.error('Error fetching interaction summaries:', error);
+        }
 
         return { items, next: response.data.next };
     } catch (error) {
@@ -115,6 +256,42 @@ export const fetchMoreItems = async (nextUrl: string | null): Promise<{ items: I
 };
 
 
+/**
+ * Function to fetch the most used tags starting with the given text.
+ * @param query - The text typed so far.
+ * @param limit - Maximum number of suggestions.
+ * @returns Suggested tags with their usage counts, most used first.
+ */
+export const autocompleteTags = async (query: string, limit = 10): Promise<{ tag: string, count: number }[]> => {
+    const response = await apiRequest<{ tags: { tag: string, count: number }[] }>(
+        `file/tags/autocomplete/?q=${encodeURIComponent(query)}&limit=${limit}`,
+        { method: 'GET' }
+    );
+    return response.data.tags;
+};
+
+export interface BulkFileOperation {
+    file_id: number;
+    add_tags?: string[];
+    remove_tags?: string[];
+    description?: string | null;
+}
+
+/**
+ * Function to edit the tags and descriptions of many files in a single request.
+ * @param operations - One operation per file, at most 500; every file must belong to the user.
+ * @returns The files that changed, and the number of operations that changed nothing.
+ */
+export const bulkUpdateFiles = async (
+    operations: BulkFileOperation[]
+): Promise<{ updated: { file_id: number, tags: string[], description: string | null }[], unchanged: number }> => {
+    const response = await apiRequest<{
+        updated: { file_id: number, tags: string[], description: string | null }[],
+        unchanged: number
+    }>('file/bulk/', { method: 'PATCH', data: operations });
+    return response.data;
+};
+
 /**
  * Helper function to map numeric file_type to string representation.
  * @param fileType - Numeric file_type from the backend.
@@ -147,41 +324,36 @@ const removeEndingSuffix = (objectKey: string): string => {
 
 /**
  * Function to fetch interactions (likes, dislikes, and comments) for a specific file.
+ * Counts and the current user's like come from the summary endpoint, the comments from the
+ * keyset-paginated interactions endpoint (latest page only).
  * @param fileId - The ID of the file for which to fetch interactions. Must be a valid number.
+ * @param commentLimit - Maximum number of latest comments to fetch.
  * @returns A summary of file interactions including total likes/dislikes and an array of comments.
  */
 export const fetchInteractions = async (
-    fileId: number | undefined
+    fileId: number | undefined,
+    commentLimit: number = 50
 ): Promise<FileInteractionsSummary> => {
     try {
         // Check if the fileId is undefined and promptly remind the user
         if (fileId === undefined) {
             console.error("File ID is undefined. Please provide a valid file ID.");
+            throw new Error("File ID is undefined.");
         }
 
-        // Make a GET request to the endpoint for fetching interactions for the given file
-        const response = await apiRequest<FileInteraction[]>(`file/${fileId}/interactions/`, {
-            method: "GET",
-        });
+        const [summaries, commentsResponse] = await Promise.all([
+            fetchInteractionsSummaries([fileId], 0),
+            apiRequest<FileInteractionsPage>(
+                `file/${fileId}/interactions/?interaction_type=comment&order=desc&limit=${commentLimit}`,
+                {method: "GET"}
+            ),
+        ]);
 
-        // Extract data
-        const fileInteractions: FileInteraction[] = response.data;
-
-        // Summarize interactions into likes, dislikes, and comments
-        const total_likes = fileInteractions.filter(
-            (interaction) => interaction.interaction_type === "like"
-        ).length;
-        const likes = fileInteractions.filter(
-            (interaction) => interaction.interaction_type === "like"
-        );
-        const comments = fileInteractions.filter(
-            (interaction) => interaction.interaction_type === "comment"
-        );
+        // Comments are fetched newest first, display them in chronological order
+        const comments: FileComment[] = [...commentsResponse.data.results].reverse();
 
-        // Construct the summary using the FileInteractionsSummary interface
         return {
-            total_likes: total_likes,
-            likes: likes,
+            ...summaries[fileId],
             comments: comments,
         };
     } catch (error) {
@@ -191,6 +363,54 @@ export const fetchInteractions = async (
 };
 
 
+/**
+ * Function to fetch interaction summaries (counts, the current user's like and the latest comments)
+ * for a page of files with a single request.
+ * @param fileIds - The IDs of the files to summarize.
+ * @param latest - Number of latest likes/comments to include per file.
+ * @returns A map of file ID to its interaction summary.
+ */
+export const fetchInteractionsSummaries = async (
+    fileIds: number[],
+    latest: number = 3
+): Promise<Record<number, FileInteractionsSummary>> => {
+    if (fileIds.length === 0) {
+        return {};
+    }
+
+    const response = await apiRequest<FileInteractionsSummaryItem[]>(
+        `file/interactions_summary/?file_ids=${fileIds.join(',')}&latest=${latest}`,
+        {method: "GET"}
+    );
+
+    const userID = parseInt(getUserID() || "-1", 10);
+    const summaries: Record<number, FileInteractionsSummary> = {};
+    response.data.forEach((summary) => {
+        const likes: FileInteraction[] = [...summary.latest_likes];
+
+        // Make sure the current user's like is present so it can be found (and removed) by user_id
+        if (summary.my_like_id !== null && !likes.some(like => like.interaction_id === summary.my_like_id)) {
+            likes.push({
+                interaction_id: summary.my_like_id,
+                interaction_type: "like",
+                user_id: userID,
+                username: getUsername() || "",
+                created_datetime: "",
+            });
+        }
+
+        summaries[summary.file_id] = {
+            total_likes: summary.like_count,
+            likes: likes,
+            comments: summary.latest_comments,
+            total_comments: summary.comment_count,
+        };
+    });
+
+    return summaries;
+};
+
+
 /**
  * Function to interact with a file (like or comment).
  * @param fileId - The ID of the file to interact with.
@@ -1,9 +1,12 @@
 // Interface for the POST object with an ID
-import {Item} from "@/components/types/types.ts";
+import {FileComment, FileInteraction, Item} from "@/components/types/types.ts";
 import {AxiosResponse} from "axios";
 
 export interface PostObject {
     object_key: string; // Object ID that will be sent to the backend
+    file_type?: string;
+    content_type?: string; // MIME type reported by the browser
+    sha256?: string; // Hex SHA-256 of the content, answered with the existing key if already stored
 }
 
 /**
@@ -36,6 +39,11 @@ export interface FileApiResponseItem {
     file_caption?: string;
     user_id: number;
     url: string;
+    taken_datetime?: string | null;
+    camera?: string | null;
+    has_gps?: boolean | null;
+    dominant_colors?: string[];
+    color_palette?: string[];
 }
 
 // Define the structure of the API response
@@ -50,8 +58,13 @@ export interface FileApiResponse {
 export interface PresignedUrl {
     original_object_key: string;
     unique_object_key: string;
-    pre_signed_url: string;
-    content_type: string;
+    pre_signed_url: string | null; // null when the content is already stored
+    content_type?: string;
+    upload_headers?: Record<string, string>; // Headers to send with the PUT, e.g. the checksum of the content
+    content_token?: string; // Sent back with the file row to record its content_sha256
+    bucket_name: string; // Bucket the URL uploads to
+    file_id?: number; // The user's file already storing the content
+    already_stored: boolean;
 }
 
 // Interface for the pre-signed URL response
@@ -63,10 +76,64 @@ export interface PresignedUrlResponse {
 
 export interface UploadStatus {
     object_key: string;
-    status: 'success' | 'error';
+    status: 'success' | 'skipped' | 'error';  // skipped: the content is already stored
     uploaded_file?: Item  // Optional list of items, for successful upload, will be used to update file table
     httpStatusCode?: number;  // Optional HTTP status code
     responseMessage?: string;  // Optional response message
     errorMessage?: string;  // Optional for errors
     errorCode?: string; // Optional error code
-}
\ No newline at end of file
+}
+
+// Per-file entry of the batched interaction summary endpoint (file/interactions_summary/)
+export interface FileInteractionsSummaryItem {
+    file_id: number;
+    like_count: number;
+    comment_count: number;
+    my_like_id: number | null;
+    latest_likes: FileInteraction[];
+    latest_comments: FileComment[];
+}
+
+// One keyset-paginated page of file/{id}/interactions/
+export interface FileInteractionsPage {
+    results: FileComment[];
+    next_cursor: string | null;
+}
+
+// Multipart upload session returned by multipart-uploads/
+export interface MultipartUploadSession {
+    session_id: number;
+    original_object_key: string;
+    unique_object_key: string;
+    bucket_name: string;
+    content_type: string;
+    part_size: number;
+    part_count: number;
+    expires_datetime: string;
+}
+
+export interface MultipartPartUrl {
+    part_number: number;
+    pre_signed_url: string;
+}
+
+export interface UploadedPart {
+    part_number: number;
+    etag: string;
+}
+
+// Envelope shared by the upload endpoints
+export interface UploadApiResponse<T> {
+    success: boolean;
+    message: string;
+    data: T;
+}
+
+// Events of the file-events/ stream
+export type FileEvent =
+    | { type: 'file.created'; file_id: number; user_id: number | null }
+    | { type: 'file.deleted'; file_ids: number[] }
+    | { type: 'file.enriched'; file_id: number; tags: string[] }
+    | { type: 'file.updated'; file_id: number; tags: string[]; description: string | null }
+    | { type: 'interaction.like' | 'interaction.comment'; file_id: number; interaction_id: number; user_id: number; delta: number }
+    | { type: 'resync' };
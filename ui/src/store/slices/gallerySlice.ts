@@ -1,5 +1,6 @@
 import {createAsyncThunk, createSlice, PayloadAction} from "@reduxjs/toolkit";
-import { deleteFile, fetchItems, fetchMoreItems } from "@/services/services.ts";
+import { deleteFile, fetchItem, fetchItems, fetchMoreItems } from "@/services/services.ts";
+import { FileEvent } from "@/services/types.ts";
 import { Item, MediaItem } from "@/components/types/types.ts";
 
 interface GalleryState {
@@ -85,6 +86,51 @@ export const fetchMoreGalleryItems = createAsyncThunk(
     }
 );
 
+// Fetch a file announced by the event stream
+export const fetchCreatedMediaItem = createAsyncThunk(
+    "gallery/fetchCreatedMediaItem",
+    async (fileId: number, { rejectWithValue }) => {
+        try {
+            return validateMediaItems([await fetchItem(fileId)]);
+        } catch (error: unknown) {
+            return rejectWithValue(handleApiError(error));
+        }
+    }
+);
+
+// Patch the gallery with an event of the file-events stream instead of refetching it
+export const applyFileEvent = createAsyncThunk(
+    "gallery/applyFileEvent",
+    async (event: FileEvent, { dispatch }) => {
+        switch (event.type) {
+            case "file.created":
+                await dispatch(fetchCreatedMediaItem(event.file_id));
+                break;
+            case "file.deleted":
+                dispatch(removeMediaItems(event.file_ids));
+                break;
+            case "file.enriched":
+                dispatch(updateMediaItemTags({ fileId: event.file_id, tags: event.tags }));
+                break;
+            case "file.updated":
+                dispatch(updateMediaItemTags({
+                    fileId: event.file_id,
+                    tags: event.tags,
+                    description: event.description ?? "",
+                }));
+                break;
+            case "interaction.like":
+            case "interaction.comment":
+                dispatch(applyInteractionDelta(event));
+                break;
+            case "resync":
+                dispatch(resetGallery());
+                await dispatch(fetchGalleryItems());
+                break;
+        }
+    }
+);
+
 // ✅ Slice Definition
 const gallerySlice = createSlice({
     name: "gallery",
@@ -97,6 +143,46 @@ const gallerySlice = createSlice({
         setSearchTerm(state, action: PayloadAction<string>) {
             state.searchTerm = action.payload;
         },
+        resetGallery(state) {
+            state.mediaItems = [];
+            state.nextUrl = null;
+            state.isEndOfList = false;
+        },
+        removeMediaItems(state, action: PayloadAction<number[]>) {
+            const fileIds = new Set(action.payload);
+            state.mediaItems = state.mediaItems.filter((item) => !fileIds.has(item.file_id ?? -1));
+        },
+        updateMediaItemTags(state, action: PayloadAction<{ fileId: number; tags: string[]; description?: string }>) {
+            const item = state.mediaItems.find((item) => item.file_id === action.payload.fileId);
+            if (item) {
+                item.tags = action.payload.tags;
+                if (action.payload.description !== undefined) {
+                    item.description = action.payload.description;
+                }
+            }
+        },
+        applyInteractionDelta(
+            state,
+            action: PayloadAction<Extract<FileEvent, { type: "interaction.like" | "interaction.comment" }>>
+        ) {
+            const { file_id, interaction_id, delta } = action.payload;
+            const summary = state.mediaItems.find((item) => item.file_id === file_id)?.file_interactions;
+            if (!summary || delta === 0) {
+                return;
+            }
+            if (action.payload.type === "interaction.like") {
+                summary.total_likes = Math.max(0, summary.total_likes + delta);
+                if (delta < 0) {
+                    summary.likes = summary.likes.filter((like) => like.interaction_id !== interaction_id);
+                }
+            } else {
+                // A higher total than the loaded comments makes the card fetch the new comments
+                summary.total_comments = Math.max(0, (summary.total_comments ?? summary.comments.length) + delta);
+                if (delta < 0) {
+                    summary.comments = summary.comments.filter((comment) => comment.interaction_id !== interaction_id);
+                }
+            }
+        },
     },
     extraReducers: (builder) => {
         builder
@@ -141,10 +227,23 @@ const gallerySlice = createSlice({
             })
             .addCase(deleteMediaItem.rejected, (state, action) => {
                 state.error = action.payload as string;
+            })
+            .addCase(fetchCreatedMediaItem.fulfilled, (state, action) => {
+                const newItems = action.payload.filter(
+                    (item) => !state.mediaItems.some((existing) => existing.file_id === item.file_id)
+                );
+                state.mediaItems.unshift(...newItems);
             });
     },
 });
 
 // ✅ Export the `setSearchTerm` action
-export const { clearError, setSearchTerm } = gallerySlice.actions;
+export const {
+    clearError,
+    setSearchTerm,
+    resetGallery,
+    removeMediaItems,
+    updateMediaItemTags,
+    applyInteractionDelta,
+} = gallerySlice.actions;
 export default gallerySlice.reducer;
\ No newline at end of file